@@ -2,6 +2,9 @@
 ASGI config for AJAXX_Privacy_web project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Long-lived async views (e.g. the Optery task progress stream at
+data/optery/data-scans/events/) should be served through this entry point,
+e.g. ``uvicorn AJAXX_Privacy_web.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
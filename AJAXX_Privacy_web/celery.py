@@ -14,10 +14,8 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # ✅ এই configuration গুলো add করুন
 app.conf.update(
-    # Result backend configuration
-    result_backend='django-db',  # Django DB তে save হবে
-    result_extended=True,  # Extended result info save করবে
-    result_expires=3600 * 24 * 7,  # 7 days
+    # Result backend (result_backend / result_extended / result_expires) comes from
+    # CELERY_RESULT_* in settings.py
     
     # Task tracking
     task_track_started=True,  # Task start হলে track করবে
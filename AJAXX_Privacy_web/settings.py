@@ -107,11 +107,12 @@ INSTALLED_APPS = [
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')  # ✅ Changed from 'django-db' to Redis
 
-# ==================== CELERY CONFIGURATION (Database Backend) ====================
-CELERY_RESULT_BACKEND = 'django-db'
+# ==================== CELERY CONFIGURATION ====================
+# Results live in Redis with a TTL; set CELERY_RESULT_BACKEND=django-db to go back to the DB table
+CELERY_RESULT_EXPIRES = env.int('CELERY_RESULT_EXPIRES', default=24 * 3600)
 CELERY_CACHE_BACKEND = 'django-cache' 
 CELERY_TASK_SEND_SENT_EVENT = True
-CELERY_RESULT_EXTENDED = True
+CELERY_RESULT_EXTENDED = env.bool('CELERY_RESULT_EXTENDED', default=False)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -124,6 +125,22 @@ CELERY_TASK_TIME_LIMIT = 18 * 60  # 18 minutes (hard limit)
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 50
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Periodic tasks (run `celery -A AJAXX_Privacy_web beat`); the django_celery_beat
+# DatabaseScheduler picks these up as well
+CELERY_BEAT_SCHEDULE = {
+    'optery-schedule-syncs': {
+        'task': 'privacy_app.tasks.schedule_optery_syncs',
+        'schedule': env.int('OPTERY_SYNC_TICK_SECONDS', default=300),
+    },
+    'optery-refresh-hot-custom-removals': {
+        'task': 'privacy_app.tasks.refresh_hot_custom_removals',
+        'schedule': env.int('OPTERY_CUSTOM_REMOVALS_REFRESH_SECONDS', default=240),
+    },
+    'optery-archive-scan-history': {
+        'task': 'privacy_app.tasks.archive_scan_history',
+        'schedule': env.int('OPTERY_HISTORY_RETENTION_SECONDS', default=3600),
+    },
+}
 # Redis Cache
 CACHES = {
     'default': {
@@ -283,5 +300,166 @@ OPTERY_INTEGRATION_UUID = env('OPTERY_INTEGRATION_UUID')
 # Optery API Configuration
 OPTERY_BASE_URL = os.getenv('OPTERY_BASE_URL')
 OPTERY_API_KEY = os.getenv('OPTERY_API_TOKEN')
+
+# Optery HTTP client (pooled keep-alive session, see privacy_app/optery_client.py)
+OPTERY_HTTP_POOL_SIZE = env.int('OPTERY_HTTP_POOL_SIZE', default=10)
+OPTERY_HTTP_KEEPALIVE = env.bool('OPTERY_HTTP_KEEPALIVE', default=True)
+OPTERY_HTTP_KEEPALIVE_IDLE = env.int('OPTERY_HTTP_KEEPALIVE_IDLE', default=60)
+OPTERY_HTTP_TIMEOUTS = {
+    # endpoint: (connect, read) seconds
+    'members': (5, 30),
+    'get-scans': (5, 30),
+    'screenshots': (5, 30),
+    'custom-removals': (5, 30),
+    'custom-removals-create': (5, 60),
+}
+
+# CreateOpteryMember: 'sync' calls Optery in the request, 'async' queues it to Celery (202 + job_id).
+# Idempotency-Key headers are remembered for OPTERY_IDEMPOTENCY_TTL seconds.
+OPTERY_CREATE_MEMBER_MODE = env('OPTERY_CREATE_MEMBER_MODE', default='sync')
+OPTERY_IDEMPOTENCY_TTL = env.int('OPTERY_IDEMPOTENCY_TTL', default=24 * 3600)
+
+# Bulk member onboarding (optery/members/bulk/ and the onboard_optery_members command):
+# rows are validated, sent to Optery (CONCURRENCY calls in flight) and saved per BATCH_SIZE.
+# The admin-only endpoint takes at most MAX_ROWS per request, larger imports use the command
+OPTERY_BULK_MEMBER_CONCURRENCY = env.int('OPTERY_BULK_MEMBER_CONCURRENCY', default=4)
+OPTERY_BULK_MEMBER_BATCH_SIZE = env.int('OPTERY_BULK_MEMBER_BATCH_SIZE', default=100)
+OPTERY_BULK_MEMBER_MAX_ROWS = env.int('OPTERY_BULK_MEMBER_MAX_ROWS', default=500)
+
+# Screenshot fan-out: 'threads' (ThreadPoolExecutor) or 'async' (httpx + asyncio)
+OPTERY_FETCH_MODE = env('OPTERY_FETCH_MODE', default='threads')
+OPTERY_FETCH_THREADS = env.int('OPTERY_FETCH_THREADS', default=3)
+# Requests in flight per member in async mode; the cap across workers is OPTERY_INFLIGHT_LIMITS
+OPTERY_ASYNC_MEMBER_CONCURRENCY = env.int('OPTERY_ASYNC_MEMBER_CONCURRENCY', default=10)
+
+# Only fetch screenshots for scans not already stored (or whose scan item changed)
+OPTERY_INCREMENTAL_SYNC = env.bool('OPTERY_INCREMENTAL_SYNC', default=True)
+
+# Read-through cache of fetch_optery_scans_background results (CACHES['default'])
+OPTERY_RESULT_CACHE_TTL = env.int('OPTERY_RESULT_CACHE_TTL', default=300)
+# Redis used for Optery coordination (single-flight leases, metrics, progress events)
+OPTERY_REDIS_URL = env('OPTERY_REDIS_URL', default=CACHES['default']['LOCATION'])
+# Single-flight lease per member_uuid: TTL while queued, and heartbeat TTL while running
+OPTERY_LEASE_QUEUED_TTL = env.int('OPTERY_LEASE_QUEUED_TTL', default=600)
+OPTERY_LEASE_TTL = env.int('OPTERY_LEASE_TTL', default=90)
+
+# Progress events for fetch tasks (Redis pub/sub, streamed by data/optery/data-scans/events/)
+OPTERY_PROGRESS_TTL = env.int('OPTERY_PROGRESS_TTL', default=3600)
+OPTERY_PROGRESS_STREAM_TIMEOUT = env.int('OPTERY_PROGRESS_STREAM_TIMEOUT', default=300)
+OPTERY_PROGRESS_KEEPALIVE = env.int('OPTERY_PROGRESS_KEEPALIVE', default=15)
+# Publish per-scan results while a fetch runs, so status polls can return them early
+OPTERY_PARTIAL_RESULTS = env.bool('OPTERY_PARTIAL_RESULTS', default=True)
+
+# Member directory (member_uuid / email -> OpteryMember): per-process LRU in front of Redis,
+# invalidated by OpteryMember save/delete signals
+OPTERY_MEMBER_CACHE_TTL = env.int('OPTERY_MEMBER_CACHE_TTL', default=3600)
+OPTERY_MEMBER_NEGATIVE_TTL = env.int('OPTERY_MEMBER_NEGATIVE_TTL', default=60)
+OPTERY_MEMBER_LRU_SIZE = env.int('OPTERY_MEMBER_LRU_SIZE', default=1024)
+OPTERY_MEMBER_LRU_TTL = env.int('OPTERY_MEMBER_LRU_TTL', default=30)
+
+# Checkpointed retries: per-scan attempts and exponential backoff (base * 2^n, capped)
+OPTERY_CHECKPOINT_TTL = env.int('OPTERY_CHECKPOINT_TTL', default=6 * 3600)
+OPTERY_SCAN_MAX_ATTEMPTS = env.int('OPTERY_SCAN_MAX_ATTEMPTS', default=3)
+OPTERY_SCAN_RETRY_BASE_DELAY = env.int('OPTERY_SCAN_RETRY_BASE_DELAY', default=30)
+OPTERY_SCAN_RETRY_MAX_DELAY = env.int('OPTERY_SCAN_RETRY_MAX_DELAY', default=600)
+
+# Token bucket per Optery endpoint class, shared by every process through OPTERY_REDIS_URL.
+# Workers wait for a token (up to OPTERY_RATE_LIMIT_MAX_WAIT seconds), views answer 429 right away.
+OPTERY_RATE_LIMIT_ENABLED = env.bool('OPTERY_RATE_LIMIT_ENABLED', default=True)
+OPTERY_RATE_LIMITS = {
+    # class: (tokens per second, burst)
+    'members': (2, 5),
+    'get-scans': (5, 10),
+    'screenshots': (10, 20),
+    'custom-removals': (2, 5),
+}
+OPTERY_RATE_LIMIT_MAX_WAIT = env.int('OPTERY_RATE_LIMIT_MAX_WAIT', default=60)
+# Block used after a 429 without a usable Retry-After header
+OPTERY_RATE_LIMIT_DEFAULT_BACKOFF = env.int('OPTERY_RATE_LIMIT_DEFAULT_BACKOFF', default=5)
+
+# Requests in flight per rate limit class, shared by every process (Redis counting semaphore).
+# Workers wait for a slot (up to MAX_WAIT seconds), views answer 429 right away; a slot left by
+# a crashed worker frees itself after SLOT_TTL seconds. Classes not listed are not capped.
+OPTERY_INFLIGHT_ENABLED = env.bool('OPTERY_INFLIGHT_ENABLED', default=True)
+OPTERY_INFLIGHT_LIMITS = {
+    'screenshots': env.int('OPTERY_INFLIGHT_SCREENSHOTS', default=20),
+}
+OPTERY_INFLIGHT_MAX_WAIT = env.int('OPTERY_INFLIGHT_MAX_WAIT', default=60)
+OPTERY_INFLIGHT_SLOT_TTL = env.int('OPTERY_INFLIGHT_SLOT_TTL', default=120)
+
+# Shared circuit breaker (state in OPTERY_REDIS_URL): opens after THRESHOLD failures (timeouts,
+# connection errors, 5xx) within WINDOW seconds, half-opens after RESET_TIMEOUT for one probe call.
+# While open, scans are served from OpteryScanHistory and custom removals from the last good list.
+OPTERY_CIRCUIT_ENABLED = env.bool('OPTERY_CIRCUIT_ENABLED', default=True)
+OPTERY_CIRCUIT_FAILURE_THRESHOLD = env.int('OPTERY_CIRCUIT_FAILURE_THRESHOLD', default=5)
+OPTERY_CIRCUIT_FAILURE_WINDOW = env.int('OPTERY_CIRCUIT_FAILURE_WINDOW', default=60)
+OPTERY_CIRCUIT_RESET_TIMEOUT = env.int('OPTERY_CIRCUIT_RESET_TIMEOUT', default=30)
+OPTERY_CIRCUIT_PROBE_TIMEOUT = env.int('OPTERY_CIRCUIT_PROBE_TIMEOUT', default=40)
+OPTERY_CUSTOM_REMOVALS_FALLBACK_TTL = env.int('OPTERY_CUSTOM_REMOVALS_FALLBACK_TTL', default=7 * 24 * 3600)
+
+# CustomRemovalListView cache: served as-is for FRESH_TTL seconds, then for STALE_TTL more
+# while a background refresh runs; our own successful creates invalidate it.
+# The HOT_MEMBERS most-read members are refreshed by a beat task.
+OPTERY_CUSTOM_REMOVALS_FRESH_TTL = env.int('OPTERY_CUSTOM_REMOVALS_FRESH_TTL', default=300)
+OPTERY_CUSTOM_REMOVALS_STALE_TTL = env.int('OPTERY_CUSTOM_REMOVALS_STALE_TTL', default=3600)
+OPTERY_CUSTOM_REMOVALS_HOT_MEMBERS = env.int('OPTERY_CUSTOM_REMOVALS_HOT_MEMBERS', default=50)
+
+# CustomRemovalCreateView proof uploads: 'stream' (spool to a temp file, stream the multipart
+# body to Optery), 'async' (stash in default storage, upload from a Celery task, 202 + task_id)
+# or 'memory' (read the whole file, old behaviour)
+OPTERY_CUSTOM_REMOVAL_UPLOAD_MODE = env('OPTERY_CUSTOM_REMOVAL_UPLOAD_MODE', default='stream')
+OPTERY_UPLOAD_CHUNK_SIZE = env.int('OPTERY_UPLOAD_CHUNK_SIZE', default=64 * 1024)
+
+# Scheduled background syncs (schedule_optery_syncs beat task, see CELERY_BEAT_SCHEDULE).
+# Interval in hours per plan (lowercase plan name), else OPTERY_SYNC_DEFAULT_INTERVAL.
+# A new member's first sync waits postpone_scan minutes after creation.
+OPTERY_SYNC_TICK_SECONDS = env.int('OPTERY_SYNC_TICK_SECONDS', default=300)
+OPTERY_SYNC_MAX_PER_TICK = env.int('OPTERY_SYNC_MAX_PER_TICK', default=100)
+OPTERY_SYNC_BATCH_SIZE = env.int('OPTERY_SYNC_BATCH_SIZE', default=200)
+OPTERY_SYNC_DEFAULT_INTERVAL = env.int('OPTERY_SYNC_DEFAULT_INTERVAL', default=24)
+OPTERY_SYNC_INTERVALS = {
+    # plan: hours
+}
+# Local-time hour range for scheduled syncs, e.g. '22-6' for off-peak only; empty = always
+OPTERY_SYNC_ACTIVE_HOURS = env('OPTERY_SYNC_ACTIVE_HOURS', default='')
+
+# Members with at least OPTERY_CHORD_THRESHOLD scans to fetch are split into chunk subtasks
+# (a Celery chord any worker can pick up); 0 disables the fan-out
+OPTERY_CHORD_THRESHOLD = env.int('OPTERY_CHORD_THRESHOLD', default=100)
+OPTERY_CHORD_CHUNK_SIZE = env.int('OPTERY_CHORD_CHUNK_SIZE', default=25)
+
+# 'pointer': fetch task results only reference OpteryScanHistory rows (assembled on read)
+# 'full': results carry every scan/screenshot payload (old behaviour)
+OPTERY_TASK_RESULT_MODE = env('OPTERY_TASK_RESULT_MODE', default='pointer')
+
+# OpteryHistoryListView keyset pagination / streaming export
+OPTERY_HISTORY_PAGE_SIZE = env.int('OPTERY_HISTORY_PAGE_SIZE', default=50)
+OPTERY_HISTORY_MAX_PAGE_SIZE = env.int('OPTERY_HISTORY_MAX_PAGE_SIZE', default=500)
+OPTERY_HISTORY_STREAM_CHUNK_SIZE = env.int('OPTERY_HISTORY_STREAM_CHUNK_SIZE', default=200)
+
+# Exposure status -> 'removed' / 'pending' for OpteryExposureSummary counts, on top of the
+# defaults in privacy_app/summaries.py; other statuses count as still exposed
+OPTERY_EXPOSURE_STATUSES = {
+    # status (lowercase): bucket
+}
+
+# Retention (archive_scan_history beat task): the newest KEEP rows per member stay in
+# OpteryScanHistory, older ones are moved BATCH_SIZE at a time (at most MAX_BATCHES per run)
+# to gzip NDJSON files partitioned by day (<PREFIX>/YYYY/MM/DD/), in OPTERY_HISTORY_ARCHIVE_DIR
+# if set, else default storage (MEDIA_ROOT). Syncs read unchanged archived scans back from
+# those files; restore_scan_history puts rows back.
+OPTERY_HISTORY_RETENTION_ENABLED = env.bool('OPTERY_HISTORY_RETENTION_ENABLED', default=True)
+OPTERY_HISTORY_RETENTION_KEEP = env.int('OPTERY_HISTORY_RETENTION_KEEP', default=20)
+OPTERY_HISTORY_RETENTION_BATCH_SIZE = env.int('OPTERY_HISTORY_RETENTION_BATCH_SIZE', default=500)
+OPTERY_HISTORY_RETENTION_MAX_BATCHES = env.int('OPTERY_HISTORY_RETENTION_MAX_BATCHES', default=20)
+OPTERY_HISTORY_ARCHIVE_DIR = env('OPTERY_HISTORY_ARCHIVE_DIR', default='')
+OPTERY_HISTORY_ARCHIVE_PREFIX = env('OPTERY_HISTORY_ARCHIVE_PREFIX', default='optery_history_archive')
+
+# Rows per bulk INSERT of OpteryScanHistory, by database vendor
+OPTERY_HISTORY_BATCH_SIZES = {
+    'sqlite': 150,
+    'postgresql': 1000,
+    'mysql': 500,
+}
  
 GOOGLE_CLIENT_ID= env("GOOGLE_CLIENT_ID")
@@ -2,6 +2,9 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import OpteryScanHistory, OpteryMember
+from .models import OpteryArchivedScan, OpteryExposureChange, OpteryExposureSummary, OpteryScanHistory, OpteryMember
 admin.site.register(OpteryScanHistory)
 admin.site.register(OpteryMember)
+admin.site.register(OpteryExposureSummary)
+admin.site.register(OpteryExposureChange)
+admin.site.register(OpteryArchivedScan)
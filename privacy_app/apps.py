@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PrivacyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'privacy_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,99 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter: base * 2^(attempt-1), capped, +/-20%"""
+    base = getattr(settings, "OPTERY_SCAN_RETRY_BASE_DELAY", 30)
+    cap = getattr(settings, "OPTERY_SCAN_RETRY_MAX_DELAY", 600)
+    delay = min(base * 2 ** max(attempt - 1, 0), cap)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class ScanCheckpoint:
+    """
+    Per-task progress of fetch_optery_scans_background, kept in a Redis hash so
+    a retry (same task_id) resumes instead of starting from scratch:
+    the get-scans list, scans already saved, and per-scan failure attempts / next retry time.
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.key = f"optery:checkpoint:{task_id}"
+        self.scans = None
+        self.done = set()
+        self.attempts = {}
+        self.next_at = {}
+
+    def _write(self, mapping):
+        if not self.task_id:
+            return
+        try:
+            pipe = get_redis().pipeline()
+            pipe.hset(self.key, mapping=mapping)
+            pipe.expire(self.key, getattr(settings, "OPTERY_CHECKPOINT_TTL", 6 * 3600))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Checkpoint write failed for task {self.task_id}: {str(e)}")
+
+    def load(self):
+        if not self.task_id:
+            return self
+        try:
+            data = get_redis().hgetall(self.key)
+        except Exception as e:
+            logger.warning(f"Checkpoint read failed for task {self.task_id}: {str(e)}")
+            return self
+
+        for field, value in data.items():
+            if field == "scans":
+                self.scans = json.loads(value)
+            elif field.startswith("done:"):
+                self.done.add(field[5:])
+            elif field.startswith("attempts:"):
+                self.attempts[field[9:]] = int(value)
+            elif field.startswith("next_at:"):
+                self.next_at[field[8:]] = float(value)
+        return self
+
+    def save_scans(self, scan_res):
+        self.scans = scan_res
+        self._write({"scans": json.dumps(scan_res, default=str)})
+
+    def mark_done(self, scan_ids):
+        scan_ids = list(scan_ids)
+        if scan_ids:
+            self.done.update(scan_ids)
+            self._write({f"done:{scan_id}": 1 for scan_id in scan_ids})
+
+    def mark_failed(self, scan_id):
+        """Record a failed attempt and schedule this scan's next try; returns the attempt count"""
+        attempts = self.attempts.get(scan_id, 0) + 1
+        self.attempts[scan_id] = attempts
+        self.next_at[scan_id] = time.time() + backoff_delay(attempts)
+        self._write({f"attempts:{scan_id}": attempts, f"next_at:{scan_id}": self.next_at[scan_id]})
+        return attempts
+
+    def is_due(self, scan_id):
+        return self.next_at.get(scan_id, 0) <= time.time()
+
+    def retry_delay(self, scan_ids):
+        """Seconds until the earliest of these scans may be retried"""
+        now = time.time()
+        return max(1, int(min(self.next_at.get(scan_id, now) for scan_id in scan_ids) - now))
+
+    def clear(self):
+        if not self.task_id:
+            return
+        try:
+            get_redis().delete(self.key)
+        except Exception as e:
+            logger.warning(f"Checkpoint delete failed for task {self.task_id}: {str(e)}")
@@ -0,0 +1,171 @@
+import logging
+import time
+
+from django.conf import settings
+
+from .metrics import incr_metric
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_KEY = "optery:circuit"
+
+# Returns {allowed, state, retry_after_ms}. Once the reset timeout has passed an
+# open circuit goes half-open and lets a single probe through at a time.
+# ARGV: now (ms), reset timeout (ms), probe timeout (ms)
+ALLOW_SCRIPT = """
+local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {1, state, 0}
+end
+local now = tonumber(ARGV[1])
+if state == 'open' then
+    local reopen_at = tonumber(redis.call('hget', KEYS[1], 'opened_at') or '0') + tonumber(ARGV[2])
+    if now < reopen_at then
+        return {0, state, reopen_at - now}
+    end
+    redis.call('hset', KEYS[1], 'state', 'half_open', 'probe_until', now + tonumber(ARGV[3]))
+    return {1, 'half_open', 0}
+end
+local probe_until = tonumber(redis.call('hget', KEYS[1], 'probe_until') or '0')
+if now >= probe_until then
+    -- the previous probe never reported back
+    redis.call('hset', KEYS[1], 'probe_until', now + tonumber(ARGV[3]))
+    return {1, state, 0}
+end
+return {0, state, probe_until - now}
+"""
+
+# Returns 'opened' when this failure opens the circuit, else the current state.
+# ARGV: now (ms), failure threshold, failure window (ms)
+FAILURE_SCRIPT = """
+local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+local now = tonumber(ARGV[1])
+if state == 'open' then
+    return state
+end
+if state == 'half_open' then
+    redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now, 'failures', 0)
+    return 'opened'
+end
+local failures
+if now - tonumber(redis.call('hget', KEYS[1], 'window_start') or '0') > tonumber(ARGV[3]) then
+    redis.call('hset', KEYS[1], 'window_start', now, 'failures', 1)
+    failures = 1
+else
+    failures = redis.call('hincrby', KEYS[1], 'failures', 1)
+end
+if failures >= tonumber(ARGV[2]) then
+    redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', now, 'failures', 0)
+    return 'opened'
+end
+return state
+"""
+
+# Returns the previous state. A success only closes a half-open circuit.
+SUCCESS_SCRIPT = """
+local state = redis.call('hget', KEYS[1], 'state') or 'closed'
+if state == 'half_open' then
+    redis.call('hset', KEYS[1], 'state', 'closed', 'failures', 0)
+elseif state == 'closed' then
+    redis.call('hset', KEYS[1], 'failures', 0)
+end
+return state
+"""
+
+
+class OpteryCircuitOpen(Exception):
+    """Raised instead of calling Optery while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Optery circuit is open, retry after {retry_after:.1f}s")
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def check_circuit():
+    """
+    Raise OpteryCircuitOpen if Optery calls are currently short-circuited.
+    In half-open state only one probe request is let through.
+    Fails open (allows the call) if Redis is unavailable.
+    """
+    if not getattr(settings, "OPTERY_CIRCUIT_ENABLED", True):
+        return
+    try:
+        allowed, state, retry_after_ms = get_redis().eval(
+            ALLOW_SCRIPT, 1, CIRCUIT_KEY,
+            _now_ms(),
+            getattr(settings, "OPTERY_CIRCUIT_RESET_TIMEOUT", 30) * 1000,
+            getattr(settings, "OPTERY_CIRCUIT_PROBE_TIMEOUT", 40) * 1000,
+        )
+    except Exception as e:
+        logger.warning(f"Circuit breaker unavailable, allowing Optery call: {str(e)}")
+        return
+
+    if not allowed:
+        incr_metric("circuit.rejected")
+        raise OpteryCircuitOpen(retry_after_ms / 1000)
+    if state == "half_open":
+        logger.info("Optery circuit half-open, sending probe request")
+
+
+def circuit_is_open():
+    """True while calls would be rejected; unlike check_circuit this never claims the probe"""
+    if not getattr(settings, "OPTERY_CIRCUIT_ENABLED", True):
+        return False
+    try:
+        state = get_circuit_state()
+    except Exception as e:
+        logger.warning(f"Circuit breaker state read failed: {str(e)}")
+        return False
+    if state["state"] == "open":
+        reset_timeout = getattr(settings, "OPTERY_CIRCUIT_RESET_TIMEOUT", 30) * 1000
+        return _now_ms() < state["opened_at"] + reset_timeout
+    if state["state"] == "half_open":
+        return _now_ms() < state["probe_until"]
+    return False
+
+
+def record_failure():
+    """Count an upstream failure (connection error, timeout, 5xx)"""
+    if not getattr(settings, "OPTERY_CIRCUIT_ENABLED", True):
+        return
+    try:
+        state = get_redis().eval(
+            FAILURE_SCRIPT, 1, CIRCUIT_KEY,
+            _now_ms(),
+            getattr(settings, "OPTERY_CIRCUIT_FAILURE_THRESHOLD", 5),
+            getattr(settings, "OPTERY_CIRCUIT_FAILURE_WINDOW", 60) * 1000,
+        )
+    except Exception as e:
+        logger.warning(f"Circuit breaker failure update failed: {str(e)}")
+        return
+    if state == "opened":
+        logger.error("Optery circuit opened, failing fast until it half-opens")
+        incr_metric("circuit.opened")
+
+
+def record_success():
+    if not getattr(settings, "OPTERY_CIRCUIT_ENABLED", True):
+        return
+    try:
+        previous = get_redis().eval(SUCCESS_SCRIPT, 1, CIRCUIT_KEY)
+    except Exception as e:
+        logger.warning(f"Circuit breaker success update failed: {str(e)}")
+        return
+    if previous == "half_open":
+        logger.info("Optery circuit closed after successful probe")
+        incr_metric("circuit.closed")
+
+
+def get_circuit_state():
+    data = get_redis().hgetall(CIRCUIT_KEY)
+    return {
+        "state": data.get("state", "closed"),
+        "failures": int(data.get("failures", 0)),
+        "opened_at": int(data.get("opened_at", 0)),
+        "probe_until": int(data.get("probe_until", 0)),
+    }
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .optery_client import optery_get
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HOT_MEMBERS_KEY = "optery:custom-removals-hot"
+
+
+def _entry_key(member_uuid):
+    return f"optery:custom-removals:{member_uuid}"
+
+
+def _refresh_key(member_uuid):
+    return f"optery:custom-removals-refresh:{member_uuid}"
+
+
+def make_etag(data):
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return '"' + hashlib.sha256(payload.encode()).hexdigest()[:32] + '"'
+
+
+def get_entry(member_uuid):
+    """
+    Cached list for a member: {"data", "etag", "last_modified", "fetched_at"}, or None.
+    Entries are kept for OPTERY_CUSTOM_REMOVALS_FALLBACK_TTL so an old copy can
+    still be served while Optery is down.
+    """
+    try:
+        return cache.get(_entry_key(member_uuid))
+    except Exception as e:
+        logger.warning(f"Custom removals cache read failed for {member_uuid}: {str(e)}")
+        return None
+
+
+def store_entry(member_uuid, data):
+    """Cache a freshly fetched list; Last-Modified only moves when the content changes"""
+    now = time.time()
+    etag = make_etag(data)
+    previous = get_entry(member_uuid)
+    last_modified = previous["last_modified"] if previous and previous["etag"] == etag else now
+    entry = {"data": data, "etag": etag, "last_modified": last_modified, "fetched_at": now}
+    try:
+        cache.set(
+            _entry_key(member_uuid),
+            entry,
+            timeout=getattr(settings, "OPTERY_CUSTOM_REMOVALS_FALLBACK_TTL", 7 * 24 * 3600)
+        )
+    except Exception as e:
+        logger.warning(f"Custom removals cache write failed for {member_uuid}: {str(e)}")
+    return entry
+
+
+def invalidate(member_uuid):
+    """
+    After our own create succeeds: the next read refetches, but the old list
+    stays available as a fallback if Optery is unreachable.
+    """
+    entry = get_entry(member_uuid)
+    if entry is None:
+        return
+    entry["fetched_at"] = 0
+    try:
+        cache.set(
+            _entry_key(member_uuid),
+            entry,
+            timeout=getattr(settings, "OPTERY_CUSTOM_REMOVALS_FALLBACK_TTL", 7 * 24 * 3600)
+        )
+    except Exception as e:
+        logger.warning(f"Custom removals cache invalidate failed for {member_uuid}: {str(e)}")
+
+
+def entry_age(entry):
+    return time.time() - entry["fetched_at"]
+
+
+def is_fresh(entry):
+    return entry_age(entry) < getattr(settings, "OPTERY_CUSTOM_REMOVALS_FRESH_TTL", 300)
+
+
+def is_revalidatable(entry):
+    """Stale but still within the stale-while-revalidate window (and not invalidated)"""
+    if not entry["fetched_at"]:
+        return False
+    fresh = getattr(settings, "OPTERY_CUSTOM_REMOVALS_FRESH_TTL", 300)
+    stale = getattr(settings, "OPTERY_CUSTOM_REMOVALS_STALE_TTL", 3600)
+    return entry_age(entry) < fresh + stale
+
+
+def fetch_custom_removals(member_uuid, wait_for_token=True):
+    """
+    Call Optery for a member's custom removals; a 200 list is cached.
+    Returns (response, data, entry), entry being None unless the list was cached.
+    """
+    response = optery_get(
+        "custom-removals",
+        f"v1/optouts/{member_uuid}/custom-removals",
+        wait_for_token=wait_for_token
+    )
+    try:
+        data = json.loads(response.text) if response.text.strip() else {}
+    except ValueError:
+        logger.warning(f"Custom removals response for {member_uuid} is not JSON")
+        data = {}
+    entry = store_entry(member_uuid, data) if response.status_code == 200 else None
+    return response, data, entry
+
+
+def mark_hot(member_uuid):
+    """Count a read; the most-read members are kept warm by refresh_hot_custom_removals"""
+    try:
+        get_redis().zincrby(HOT_MEMBERS_KEY, 1, member_uuid)
+    except Exception as e:
+        logger.warning(f"Hot member tracking failed for {member_uuid}: {str(e)}")
+
+
+def pop_hot_members(limit):
+    """The `limit` most-read members since the last call (counts are reset)"""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zrevrange(HOT_MEMBERS_KEY, 0, limit - 1)
+        pipe.delete(HOT_MEMBERS_KEY)
+        return pipe.execute()[0]
+    except Exception as e:
+        logger.warning(f"Hot member read failed: {str(e)}")
+        return []
+
+
+def claim_refresh(member_uuid):
+    """True if the caller should enqueue a background refresh (one in flight per member)"""
+    try:
+        return bool(get_redis().set(_refresh_key(member_uuid), 1, nx=True, ex=60))
+    except Exception as e:
+        logger.warning(f"Refresh claim failed for {member_uuid}: {str(e)}")
+        return False
+
+
+def release_refresh(member_uuid):
+    try:
+        get_redis().delete(_refresh_key(member_uuid))
+    except Exception as e:
+        logger.warning(f"Refresh release failed for {member_uuid}: {str(e)}")
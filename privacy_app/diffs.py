@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+
+from .history import get_batch_size, is_fetch_error
+from .models import OpteryExposureChange, OpteryExposureRecord
+from .summaries import BROKER_KEYS, exposure_items, first_value
+
+logger = logging.getLogger(__name__)
+
+# Fields that identify a listing on a broker; everything else may change between scans
+IDENTITY_KEYS = ("url", "listing_url", "profile_url", "link", "record_id", "listing_id", "id")
+SCAN_DATE_KEYS = ("created_at", "scanned_at", "completed_at", "date")
+
+CHANGE_FIELDS = ["id", "scan_id", "previous_scan_id", "change_type", "record_key", "record", "previous_record", "created_at"]
+
+
+def _hash(value):
+    payload = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def record_key(item):
+    """
+    Stable key for one exposure: broker + listing identity. Records without
+    any identity field are keyed by their full content.
+    """
+    broker = first_value(item, BROKER_KEYS)
+    identity = first_value(item, IDENTITY_KEYS)
+    if identity is None:
+        return _hash(item)
+    return _hash([str(broker or "").lower(), str(identity)])
+
+
+def latest_scan_id(scan_res):
+    """Newest scan of a get-scans list: by scan date, then numeric scan_id, then list position"""
+    best = None
+    for position, item in enumerate(scan_res if isinstance(scan_res, list) else []):
+        if not isinstance(item, dict) or not item.get("scan_id"):
+            continue
+        scan_id = str(item["scan_id"])
+        sort_key = (
+            str(first_value(item, SCAN_DATE_KEYS) or ""),
+            int(scan_id) if scan_id.isdigit() else -1,
+            position,
+        )
+        if best is None or sort_key > best[0]:
+            best = (sort_key, scan_id)
+    return best[1] if best else None
+
+
+def diff_records(previous, current):
+    """
+    previous / current: {record_key: (content_hash, record)}.
+    Returns [(change_type, record_key, record, previous_record)].
+    """
+    changes = []
+    for key, (content_hash, record) in current.items():
+        if key not in previous:
+            changes.append((OpteryExposureChange.NEW, key, record, None))
+        elif previous[key][0] != content_hash:
+            changes.append((OpteryExposureChange.CHANGED, key, record, previous[key][1]))
+    for key, (_, record) in previous.items():
+        if key not in current:
+            changes.append((OpteryExposureChange.REMOVED, key, record, None))
+    return changes
+
+
+def record_exposure_changes(member_uuid, member_id, scan_id, screenshot_data):
+    """
+    Diff one scan's exposures against the member's stored exposure set (their
+    previous diffed scan), store the delta as OpteryExposureChange rows and
+    make this scan the new baseline. Re-running for the same data adds nothing.
+    Returns the number of changes.
+    """
+    if scan_id is None or screenshot_data is None or is_fetch_error(screenshot_data):
+        return 0
+
+    current = {}
+    for item in exposure_items(screenshot_data):
+        current[record_key(item)] = (_hash(item), item)
+
+    stored = {
+        record.record_key: record
+        for record in OpteryExposureRecord.objects.filter(member_uuid=member_uuid).only(
+            "record_key", "content_hash", "scan_id", "record"
+        )
+    }
+    previous = {key: (record.content_hash, record.record) for key, record in stored.items()}
+    previous_scan_id = next(iter(stored.values())).scan_id if stored else ""
+
+    changes = diff_records(previous, current)
+    if not changes and previous_scan_id == scan_id:
+        return 0
+
+    batch_size = get_batch_size()
+    with transaction.atomic():
+        OpteryExposureChange.objects.bulk_create([
+            OpteryExposureChange(
+                member_uuid=member_uuid,
+                member_id=member_id,
+                scan_id=scan_id,
+                previous_scan_id=previous_scan_id,
+                record_key=key,
+                change_type=change_type,
+                record=record,
+                previous_record=previous_record,
+            )
+            for change_type, key, record, previous_record in changes
+        ], batch_size=batch_size)
+
+        removed = [key for key in previous if key not in current]
+        if removed:
+            OpteryExposureRecord.objects.filter(member_uuid=member_uuid, record_key__in=removed).delete()
+        # Every current record moves to this scan, changed or not
+        OpteryExposureRecord.objects.bulk_create(
+            [
+                OpteryExposureRecord(
+                    member_uuid=member_uuid, record_key=key, content_hash=content_hash, scan_id=scan_id, record=record
+                )
+                for key, (content_hash, record) in current.items()
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["member_uuid", "record_key"],
+            update_fields=["content_hash", "scan_id", "record", "updated_at"],
+        )
+
+    if changes:
+        logger.info(f"Exposure diff for {member_uuid} scan {scan_id} vs {previous_scan_id or 'nothing'}: {len(changes)} changes")
+    return len(changes)
+
+
+def serialize_change(change):
+    return {field: getattr(change, field) for field in CHANGE_FIELDS}
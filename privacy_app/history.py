@@ -0,0 +1,358 @@
+import base64
+import hashlib
+import json
+import logging
+import zlib
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import OpteryPayloadBlob, OpteryScanHistory
+from .summaries import build_exposure_summary, save_exposure_summaries
+
+logger = logging.getLogger(__name__)
+
+
+# Rows per INSERT statement, per database vendor (overridable via settings.OPTERY_HISTORY_BATCH_SIZES)
+DEFAULT_BATCH_SIZES = {
+    "sqlite": 150,
+    "postgresql": 1000,
+    "mysql": 500,
+    "oracle": 500,
+}
+
+
+def get_batch_size():
+    """Batch size for the current database backend"""
+    sizes = dict(DEFAULT_BATCH_SIZES)
+    sizes.update(getattr(settings, "OPTERY_HISTORY_BATCH_SIZES", {}))
+    return sizes.get(connection.vendor, 500)
+
+
+def scan_fingerprint(scan_item):
+    """Stable hash of a single get-scans item"""
+    payload = json.dumps(scan_item, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def make_blob(payload):
+    """Build an (unsaved) compressed blob for a JSON payload, keyed by content hash"""
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+    return OpteryPayloadBlob(
+        hash=hashlib.sha256(raw).hexdigest(),
+        data=zlib.compress(raw, 6),
+        size=len(raw),
+    )
+
+
+def load_payloads(hashes):
+    """Decoded payloads for the given blob hashes, in one query: {hash: payload}"""
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return {}
+    blobs = OpteryPayloadBlob.objects.filter(hash__in=hashes).values_list("hash", "data")
+    return {h: json.loads(zlib.decompress(bytes(data))) for h, data in blobs}
+
+
+def history_payloads(histories):
+    """
+    Yield (history, scan_data, screenshot_data) for history rows.
+    Blob payloads are loaded in one query and decoded once per hash;
+    legacy rows fall back to their raw_* columns.
+    """
+    histories = list(histories)
+    payloads = load_payloads(
+        [h.scan_blob_id for h in histories] + [h.screenshot_blob_id for h in histories]
+    )
+    for h in histories:
+        scan_data = payloads.get(h.scan_blob_id) if h.scan_blob_id else h.raw_scan_data
+        screenshot_data = payloads.get(h.screenshot_blob_id) if h.screenshot_blob_id else h.raw_screenshot_data
+        yield h, scan_data, screenshot_data
+
+
+# Fields OpteryHistoryListView can return (fields= projection)
+HISTORY_FIELDS = ["id", "member_uuid", "email", "scan_id", "raw_scan_data", "raw_screenshot_data", "created_at"]
+PAYLOAD_FIELDS = {"raw_scan_data", "raw_screenshot_data"}
+# Opt-in fields read from the linked OpteryMember (one JOIN via select_related)
+MEMBER_FIELDS = {"plan", "group_tag"}
+
+
+def encode_cursor(history):
+    """Opaque keyset cursor for (created_at, id)"""
+    raw = json.dumps([history.created_at.isoformat(), history.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor, raises ValueError if it is invalid"""
+    try:
+        created_at, history_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if created_at is None or not isinstance(history_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, history_id
+
+
+def history_page_queryset(email, fields, cursor=None):
+    """
+    History rows for an email, newest first, ordered by (created_at, id) so it
+    can be keyset-paginated on the (email, created_at) index. Only the columns
+    needed for `fields` are loaded.
+    """
+    queryset = OpteryScanHistory.objects.filter(email=email).order_by("-created_at", "-id")
+
+    if cursor:
+        created_at, history_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=history_id)
+        )
+
+    columns = {"id", "created_at"} | {f for f in fields if f not in PAYLOAD_FIELDS | MEMBER_FIELDS}
+    if PAYLOAD_FIELDS & set(fields):
+        columns |= {"raw_scan_data", "raw_screenshot_data", "scan_blob", "screenshot_blob"}
+    if MEMBER_FIELDS & set(fields):
+        queryset = queryset.select_related("member")
+        columns |= {"member"} | {f"member__{f}" for f in MEMBER_FIELDS & set(fields)}
+    return queryset.only(*columns)
+
+
+def serialize_history(histories, fields):
+    """Yield history dicts limited to `fields` (payloads decoded only when requested)"""
+    histories = list(histories)
+    if PAYLOAD_FIELDS & set(fields):
+        rows = history_payloads(histories)
+    else:
+        rows = ((h, None, None) for h in histories)
+
+    for h, scan_data, screenshot_data in rows:
+        values = {
+            "raw_scan_data": scan_data,
+            "raw_screenshot_data": screenshot_data,
+        }
+        if MEMBER_FIELDS & set(fields):
+            values.update({f: getattr(h.member, f) if h.member_id else None for f in MEMBER_FIELDS})
+        yield {
+            field: values[field] if field in values else getattr(h, field)
+            for field in fields
+        }
+
+
+def is_fetch_error(screenshot_data):
+    """True if the stored screenshot payload is one of our own fetch error markers"""
+    return isinstance(screenshot_data, dict) and "error" in screenshot_data
+
+
+def load_stored_scans(member_uuid, scan_ids):
+    """
+    Stored fingerprint and screenshots for the given scans, in one query
+    on the (member_uuid, scan_id) unique index.
+    Returns {scan_id: (scan_fingerprint, raw_screenshot_data)}.
+    """
+    rows = list(OpteryScanHistory.objects.filter(
+        member_uuid=member_uuid,
+        scan_id__in=scan_ids
+    ).values_list("scan_id", "scan_fingerprint", "raw_screenshot_data", "screenshot_blob_id"))
+    payloads = load_payloads(blob_id for _, _, _, blob_id in rows)
+    return {
+        scan_id: (fingerprint, payloads.get(blob_id) if blob_id else screenshots)
+        for scan_id, fingerprint, screenshots, blob_id in rows
+    }
+
+
+def _upsert(rows):
+    return OpteryScanHistory.objects.bulk_create(
+        rows,
+        batch_size=get_batch_size(),
+        update_conflicts=True,
+        unique_fields=["member_uuid", "scan_id"],
+        update_fields=[
+            "member", "email", "raw_scan_data", "raw_screenshot_data", "scan_blob",
+            "screenshot_blob", "scan_fingerprint", "updated_at",
+        ],
+    )
+
+
+def _move_payloads_to_blobs(row, blobs):
+    """Replace the row's raw_* JSON with blob references, collecting new blobs by hash"""
+    for raw_field, blob_field in (("raw_scan_data", "scan_blob_id"), ("raw_screenshot_data", "screenshot_blob_id")):
+        payload = getattr(row, raw_field)
+        if payload is None:
+            continue
+        blob = make_blob(payload)
+        blobs.setdefault(blob.hash, blob)
+        setattr(row, blob_field, blob.hash)
+        setattr(row, raw_field, None)
+
+
+def _insert_blobs(blobs):
+    OpteryPayloadBlob.objects.bulk_create(blobs, batch_size=get_batch_size(), ignore_conflicts=True)
+
+
+def save_scan_history(rows):
+    """
+    Upsert unsaved OpteryScanHistory rows (one per member_uuid/scan_id) with a
+    single bulk_create in one transaction. raw_* payloads are moved into
+    content-addressed OpteryPayloadBlob rows, so identical JSON is stored once.
+    If the batch fails, rows are retried one by one (each in its own savepoint)
+    so a single bad row is reported instead of sinking the whole batch.
+    The rows' OpteryExposureSummary entries are upserted in the same transaction
+    (rows holding a fetch error marker keep their previous summary).
+    Returns (saved_rows, errors) where errors maps scan_id -> error message.
+    """
+    if not rows:
+        return [], {}
+
+    errors = {}
+    blobs = {}
+    ready = []
+    summaries = {}
+    for row in rows:
+        try:
+            if not is_fetch_error(row.raw_screenshot_data):
+                summaries[row.scan_id] = build_exposure_summary(row, row.raw_scan_data, row.raw_screenshot_data)
+            _move_payloads_to_blobs(row, blobs)
+            ready.append(row)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Payload encoding failed for scan {row.scan_id}: {str(e)}")
+            errors[row.scan_id] = str(e)
+
+    try:
+        with transaction.atomic():
+            _insert_blobs(list(blobs.values()))
+            saved = _upsert(ready) if ready else []
+            save_exposure_summaries(
+                [summaries[row.scan_id] for row in ready if row.scan_id in summaries],
+                batch_size=get_batch_size()
+            )
+        return saved, errors
+    except DatabaseError as e:
+        logger.warning(f"Bulk insert of {len(ready)} scan history rows failed, retrying per row: {str(e)}")
+
+    saved = []
+    with transaction.atomic():
+        for row in ready:
+            row.pk = None
+            try:
+                with transaction.atomic():
+                    _insert_blobs([blobs[h] for h in {row.scan_blob_id, row.screenshot_blob_id} if h])
+                    _upsert([row])
+                    if row.scan_id in summaries:
+                        summaries[row.scan_id].pk = None
+                        save_exposure_summaries([summaries[row.scan_id]])
+                saved.append(row)
+            except DatabaseError as e:
+                logger.error(f"DB save failed for scan {row.scan_id}: {str(e)}")
+                errors[row.scan_id] = str(e)
+
+    return saved, errors
+
+
+def compact_history_rows(rows):
+    """Move legacy raw_* JSON of saved history rows into blobs, in one transaction"""
+    blobs = {}
+    for row in rows:
+        _move_payloads_to_blobs(row, blobs)
+
+    with transaction.atomic():
+        _insert_blobs(list(blobs.values()))
+        OpteryScanHistory.objects.bulk_update(
+            rows,
+            ["raw_scan_data", "raw_screenshot_data", "scan_blob", "screenshot_blob"],
+            batch_size=get_batch_size(),
+        )
+    return len(blobs)
+
+
+def build_result_pointer(member_uuid, email, scan_res, scan_ids, screenshots):
+    """
+    Compact task result for OPTERY_TASK_RESULT_MODE='pointer': the scan list is
+    stored as a blob and screenshots are read back from OpteryScanHistory by
+    (member_uuid, scan_id). Entries that failed to save are kept inline.
+    """
+    scans_blob = make_blob(scan_res)
+    _insert_blobs([scans_blob])
+    return {
+        "result_type": "pointer",
+        "member_uuid": member_uuid,
+        "email": email,
+        "scans_blob": scans_blob.hash,
+        "scan_ids": scan_ids,
+        "unsaved": [entry for entry in screenshots if "save_error" in entry],
+        "message": "Data fetched successfully"
+    }
+
+
+def expand_result(result):
+    """Rebuild the full task response from a pointer result (other results pass through)"""
+    if not isinstance(result, dict) or result.get("result_type") != "pointer":
+        return result
+
+    member_uuid = result["member_uuid"]
+    histories = OpteryScanHistory.objects.filter(
+        member_uuid=member_uuid,
+        scan_id__in=result["scan_ids"]
+    ).only("scan_id", "raw_scan_data", "raw_screenshot_data", "scan_blob", "screenshot_blob")
+    stored = {h.scan_id: screenshot_data for h, _, screenshot_data in history_payloads(histories)}
+    unsaved = {entry["scan_id"]: entry for entry in result.get("unsaved", [])}
+    archived = [scan_id for scan_id in result["scan_ids"] if scan_id not in stored and scan_id not in unsaved]
+    if archived:
+        # Moved out of OpteryScanHistory by the retention job since the sync
+        from .retention import load_archived_scans
+        stored.update({scan_id: data for scan_id, (_, data) in load_archived_scans(member_uuid, archived).items()})
+    scans = load_payloads([result["scans_blob"]]).get(result["scans_blob"], [])
+
+    screenshots = []
+    for scan_id in result["scan_ids"]:
+        if scan_id in unsaved:
+            screenshots.append(unsaved[scan_id])
+        else:
+            screenshots.append({"scan_id": scan_id, "screenshots": stored.get(scan_id)})
+
+    return {
+        "member_uuid": member_uuid,
+        "email": result["email"],
+        "scans": scans,
+        "screenshots": screenshots,
+        "message": result["message"]
+    }
+
+
+def build_history_fallback(member_uuid, email=None):
+    """
+    Last known good response for a member, assembled from OpteryScanHistory
+    (used while Optery is unavailable). The scan list comes from the newest
+    row by created_at. Returns None if nothing is stored.
+    """
+    histories = OpteryScanHistory.objects.filter(member_uuid=member_uuid).order_by("-created_at", "-id").only(
+        "email", "scan_id", "raw_scan_data", "raw_screenshot_data", "scan_blob", "screenshot_blob", "created_at",
+        "updated_at"
+    )
+    decoded = list(history_payloads(histories))
+    if not decoded:
+        return None
+
+    latest, scans, _ = decoded[0]
+    stored = {}
+    for h, _, screenshot_data in decoded:
+        stored.setdefault(h.scan_id, screenshot_data)
+
+    scan_ids = [
+        str(item.get("scan_id")) for item in scans or []
+        if isinstance(item, dict) and item.get("scan_id")
+    ] or list(stored)
+    return {
+        "member_uuid": member_uuid,
+        "email": email or latest.email,
+        "scans": scans,
+        "screenshots": [
+            {"scan_id": scan_id, "screenshots": stored[scan_id]}
+            for scan_id in dict.fromkeys(scan_ids) if scan_id in stored
+        ],
+        "message": "Optery is temporarily unavailable, showing last stored scan data",
+        "stale": True,
+        "stale_as_of": latest.updated_at.isoformat(),
+    }
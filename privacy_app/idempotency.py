@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Returns nil if the key was free (and is now claimed for ARGV[1]),
+# else the existing {job_id, fingerprint, status_code, response}.
+# ARGV: job_id, request fingerprint, ttl (s)
+CLAIM_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('hmget', KEYS[1], 'job_id', 'fingerprint', 'status_code', 'response')
+end
+redis.call('hset', KEYS[1], 'job_id', ARGV[1], 'fingerprint', ARGV[2])
+redis.call('expire', KEYS[1], ARGV[3])
+return false
+"""
+
+# Only the job that claimed the key may store a response or release it
+STORE_SCRIPT = """
+if redis.call('hget', KEYS[1], 'job_id') == ARGV[1] then
+    redis.call('hset', KEYS[1], 'status_code', ARGV[2], 'response', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('hget', KEYS[1], 'job_id') == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotencyKeyReused(Exception):
+    """The Idempotency-Key was already used for a different request body"""
+
+
+def _key(scope):
+    return f"optery:idempotency:{scope}"
+
+
+def request_fingerprint(data):
+    payload = JSONEncoder(sort_keys=True, separators=(',', ':')).encode(data)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim_idempotency_key(scope, job_id, fingerprint):
+    """
+    Reserve `scope` (e.g. "members:<user>:<Idempotency-Key>") for job_id.
+    Returns None for a new key, else the earlier submission as
+    {"job_id", "status_code", "response"} (status_code None while it runs).
+    Raises IdempotencyKeyReused if the key came with a different body.
+    Fails open (treats the key as new) if Redis is unavailable.
+    """
+    try:
+        existing = get_redis().eval(
+            CLAIM_SCRIPT, 1, _key(scope),
+            job_id, fingerprint, getattr(settings, "OPTERY_IDEMPOTENCY_TTL", 24 * 3600)
+        )
+    except Exception as e:
+        logger.warning(f"Idempotency key claim failed for {scope}: {str(e)}")
+        return None
+    if existing is None:
+        return None
+
+    existing_job_id, existing_fingerprint, status_code, response = existing
+    if existing_fingerprint != fingerprint:
+        raise IdempotencyKeyReused(scope)
+    return {
+        "job_id": existing_job_id,
+        "status_code": int(status_code) if status_code else None,
+        "response": json.loads(response) if response else None,
+    }
+
+
+def store_idempotent_response(scope, job_id, status_code, response):
+    """Remember the final response so repeats with the same key get it back"""
+    try:
+        get_redis().eval(STORE_SCRIPT, 1, _key(scope), job_id, status_code, JSONEncoder().encode(response))
+    except Exception as e:
+        logger.warning(f"Idempotent response store failed for {scope}: {str(e)}")
+
+
+def release_idempotency_key(scope, job_id):
+    """Forget a claim whose request never reached Optery, so the client can retry"""
+    try:
+        get_redis().eval(RELEASE_SCRIPT, 1, _key(scope), job_id)
+    except Exception as e:
+        logger.warning(f"Idempotency key release failed for {scope}: {str(e)}")
@@ -0,0 +1,94 @@
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+
+from .metrics import incr_metric
+from .ratelimit import ENDPOINT_CLASSES, OpteryRateLimited
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Counting semaphore: a sorted set of slot tokens scored by their expiry (ms).
+# Expired slots (crashed holders) are dropped before counting.
+# KEYS[1] slot set; ARGV now (ms), limit, slot expiry (ms), token, set TTL (ms)
+ACQUIRE_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], '-inf', ARGV[1])
+if redis.call('zcard', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('zadd', KEYS[1], ARGV[3], ARGV[4])
+    redis.call('pexpire', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+# Poll interval while every slot is taken
+POLL_INTERVAL = 0.05
+
+
+class OpteryBusy(OpteryRateLimited):
+    """Raised when every in-flight slot of an endpoint class stays taken (fail-fast or too long a wait)"""
+
+    def __init__(self, limit_class, retry_after):
+        self.limit_class = limit_class
+        self.retry_after = retry_after
+        Exception.__init__(self, f"Too many Optery {limit_class} requests in flight, retry after {retry_after:.1f}s")
+
+
+def _slot_key(limit_class):
+    return f"optery:inflight:{limit_class}"
+
+
+def acquire_slot(endpoint, wait=True, max_wait=None):
+    """
+    Take one of the endpoint class's OPTERY_INFLIGHT_LIMITS slots, shared by
+    every worker through Redis. wait=True polls until a slot frees up, up to
+    OPTERY_INFLIGHT_MAX_WAIT; wait=False raises OpteryBusy right away.
+    Returns the slot token for release_slot (None when unlimited or Redis
+    is unavailable, the call then goes ahead).
+    """
+    if not getattr(settings, "OPTERY_INFLIGHT_ENABLED", True):
+        return None
+    limit_class = ENDPOINT_CLASSES.get(endpoint, endpoint)
+    limit = getattr(settings, "OPTERY_INFLIGHT_LIMITS", {}).get(limit_class)
+    if not limit:
+        return None
+    if max_wait is None:
+        max_wait = getattr(settings, "OPTERY_INFLIGHT_MAX_WAIT", 60)
+
+    # A slot outlives its request by far; the expiry only frees slots of crashed holders
+    slot_ttl = int(getattr(settings, "OPTERY_INFLIGHT_SLOT_TTL", 120) * 1000)
+    token = uuid.uuid4().hex
+    waited = 0.0
+    while True:
+        now = int(time.time() * 1000)
+        try:
+            if get_redis().eval(ACQUIRE_SCRIPT, 1, _slot_key(limit_class), now, limit, now + slot_ttl, token, slot_ttl):
+                if waited:
+                    incr_metric(f"inflight.{limit_class}.waits")
+                    incr_metric(f"inflight.{limit_class}.wait_seconds", round(waited, 3))
+                return token
+        except Exception as e:
+            logger.warning(f"In-flight limiter unavailable, allowing {limit_class} call: {str(e)}")
+            return None
+
+        if not wait or waited + POLL_INTERVAL > max_wait:
+            incr_metric(f"inflight.{limit_class}.rejected")
+            raise OpteryBusy(limit_class, POLL_INTERVAL)
+
+        delay = POLL_INTERVAL * random.uniform(1.0, 1.5)
+        time.sleep(delay)
+        waited += delay
+
+
+def release_slot(endpoint, token):
+    if token is None:
+        return
+    limit_class = ENDPOINT_CLASSES.get(endpoint, endpoint)
+    try:
+        get_redis().zrem(_slot_key(limit_class), token)
+    except Exception as e:
+        logger.warning(f"In-flight slot release failed for {limit_class}: {str(e)}")
@@ -0,0 +1,115 @@
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+
+from .metrics import incr_metric
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Only touch the lease if it still belongs to the caller's task_id
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_key(member_uuid):
+    return f"optery:lease:{member_uuid}"
+
+
+def _ttl(name, default):
+    return getattr(settings, name, default)
+
+
+def claim_fetch(member_uuid):
+    """
+    Reserve the single-flight lease for a new fetch of this member.
+    Returns (task_id, is_new); when a fetch is already queued or running its
+    task_id is returned with is_new=False so the caller can coalesce onto it.
+    The lease starts with OPTERY_LEASE_QUEUED_TTL so it outlives the queue wait.
+    """
+    task_id = str(uuid.uuid4())
+    key = _lease_key(member_uuid)
+    queued_ttl = _ttl("OPTERY_LEASE_QUEUED_TTL", 600)
+    incr_metric("singleflight.submissions")
+    try:
+        client = get_redis()
+        for _ in range(2):
+            if client.set(key, task_id, nx=True, ex=queued_ttl):
+                return task_id, True
+            holder = client.get(key)
+            if holder:
+                incr_metric("singleflight.absorbed")
+                return holder, False
+            # Lease expired between SET and GET, try once more
+    except Exception as e:
+        logger.warning(f"Lease lookup failed for {member_uuid}: {str(e)}")
+    return task_id, True
+
+
+def renew_lease(member_uuid, task_id, ttl=None, takeover=True):
+    """
+    Extend the lease if task_id still holds it. With takeover an expired lease
+    is taken again; heartbeats pass takeover=False so they never re-acquire a
+    lease their task has lost or released.
+    """
+    ttl = ttl or _ttl("OPTERY_LEASE_TTL", 90)
+    key = _lease_key(member_uuid)
+    try:
+        client = get_redis()
+        if client.eval(RENEW_SCRIPT, 1, key, task_id, int(ttl * 1000)):
+            return True
+        if takeover and client.set(key, task_id, nx=True, ex=ttl):
+            return True
+        logger.warning(f"Lease for {member_uuid} is held by another task, {task_id} continues without it")
+        incr_metric("singleflight.lease_lost")
+    except Exception as e:
+        logger.warning(f"Lease renew failed for {member_uuid}: {str(e)}")
+    return False
+
+
+def release_lease(member_uuid, task_id):
+    try:
+        get_redis().eval(RELEASE_SCRIPT, 1, _lease_key(member_uuid), task_id)
+    except Exception as e:
+        logger.warning(f"Lease release failed for {member_uuid}: {str(e)}")
+
+
+class LeaseHeartbeat:
+    """
+    Keeps a running task's lease alive with a short TTL. If the worker dies the
+    heartbeat stops and the lease expires within OPTERY_LEASE_TTL seconds.
+    """
+
+    def __init__(self, member_uuid, task_id):
+        self.member_uuid = member_uuid
+        self.task_id = task_id
+        self.ttl = _ttl("OPTERY_LEASE_TTL", 90)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        renew_lease(self.member_uuid, self.task_id, self.ttl)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            renew_lease(self.member_uuid, self.task_id, self.ttl, takeover=False)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
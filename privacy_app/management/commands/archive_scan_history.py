@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from privacy_app.retention import archive_batch, archive_storage
+
+
+class Command(BaseCommand):
+    help = "Move OpteryScanHistory rows beyond the newest --keep per member into compressed NDJSON archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, default=getattr(settings, "OPTERY_HISTORY_RETENTION_KEEP", 20))
+        parser.add_argument("--batch-size", type=int, default=getattr(settings, "OPTERY_HISTORY_RETENTION_BATCH_SIZE", 500))
+        parser.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches (0 = until done)")
+
+    def handle(self, *args, **options):
+        storage = archive_storage()
+        batch_size = options["batch_size"]
+        batches = 0
+        rows_done = 0
+        while True:
+            count = archive_batch(options["keep"], batch_size, storage)
+            rows_done += count
+            batches += 1
+            if count:
+                self.stdout.write(f"Archived {rows_done} rows")
+            if count < batch_size or (options["max_batches"] and batches >= options["max_batches"]):
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rows_done} rows archived, keeping {options['keep']} per member"
+        ))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from privacy_app.members import canonical_uuid
+from privacy_app.models import OpteryMember, OpteryScanHistory
+
+
+class Command(BaseCommand):
+    help = "Link OpteryScanHistory rows to their OpteryMember (member FK) in small id-ordered batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        unlinked = OpteryScanHistory.objects.filter(member__isnull=True).order_by("id")
+
+        last_id = 0
+        rows_seen = 0
+        rows_linked = 0
+        while True:
+            batch = list(unlinked.filter(id__gt=last_id).values_list("id", "member_uuid")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            rows_seen += len(batch)
+
+            # member_uuid is free-form text: canonicalize before matching the UUID column
+            ids_by_uuid = {}
+            for history_id, member_uuid in batch:
+                canonical = canonical_uuid(member_uuid)
+                if canonical:
+                    ids_by_uuid.setdefault(canonical, []).append(history_id)
+            members = OpteryMember.objects.filter(uuid__in=list(ids_by_uuid)).values_list("uuid", "id")
+
+            # One short transaction per batch, so no long-held locks
+            with transaction.atomic():
+                for member_uuid, member_id in members:
+                    rows_linked += OpteryScanHistory.objects.filter(
+                        id__in=ids_by_uuid[str(member_uuid)]
+                    ).update(member_id=member_id)
+
+            self.stdout.write(f"Checked {rows_seen} rows (up to id {last_id}), linked {rows_linked}")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rows_linked} of {rows_seen} unlinked rows linked to a member"
+        ))
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from privacy_app import optery_client
+from privacy_app.optery_async import gather_screenshots
+from privacy_app.tasks import fetch_screenshots
+
+
+class FakeOpteryHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Optery screenshots endpoint"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.2
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({"path": self.path, "screenshots": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOpteryServer(ThreadingHTTPServer):
+    """The stock backlog (5) overflows with many concurrent connections and adds ~1s SYN retries"""
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    help = "Compare thread-pool vs asyncio screenshot fetching against a local fake Optery server"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scans", type=int, default=40, help="Scans per member")
+        parser.add_argument("--members", type=int, default=1, help="Members fetched in one run")
+        parser.add_argument("--latency", type=float, default=0.2, help="Fake server latency in seconds")
+        parser.add_argument("--member-limit", type=int, default=None)
+
+    def handle(self, *args, **options):
+        handler = type("Handler", (FakeOpteryHandler,), {"latency": options["latency"]})
+        server = FakeOpteryServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        jobs = [
+            (f"bench-member-{m}", [str(i) for i in range(options["scans"])])
+            for m in range(options["members"])
+        ]
+        fake_settings = {
+            "OPTERY_BASE_URL": f"http://127.0.0.1:{server.server_port}/",
+            "OPTERY_API_KEY": "benchmark",
+            # Keep benchmark traffic out of production's shared limiter, in-flight and breaker keys
+            "OPTERY_RATE_LIMIT_ENABLED": False,
+            "OPTERY_INFLIGHT_ENABLED": False,
+            "OPTERY_CIRCUIT_ENABLED": False,
+        }
+
+        try:
+            with override_settings(**fake_settings):
+                optery_client.reset_session()
+
+                started = time.perf_counter()
+                thread_results = [fetch_screenshots(member_uuid, scan_ids) for member_uuid, scan_ids in jobs]
+                thread_time = time.perf_counter() - started
+                stats = optery_client.get_connection_stats()
+
+                started = time.perf_counter()
+                async_results = asyncio.run(gather_screenshots(jobs, member_limit=options["member_limit"]))
+                async_time = time.perf_counter() - started
+
+                optery_client.reset_session()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        total = options["scans"] * options["members"]
+        self.stdout.write(f"Requests: {total} ({options['members']} member(s) x {options['scans']} scans, {options['latency']}s latency)")
+        self.stdout.write(f"threads: {thread_time:.2f}s  (connections opened: {stats['connections_opened']})")
+        self.stdout.write(f"async:   {async_time:.2f}s")
+        if async_time:
+            self.stdout.write(f"speedup: {thread_time / async_time:.1f}x")
+
+        if thread_results != async_results:
+            self.stderr.write(self.style.ERROR("Result mismatch between threads and async paths"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Results identical and in the same order"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from privacy_app.history import compact_history_rows
+from privacy_app.models import OpteryScanHistory
+
+
+class Command(BaseCommand):
+    help = "Move legacy raw_scan_data / raw_screenshot_data JSON into deduplicated payload blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        legacy = OpteryScanHistory.objects.filter(
+            Q(raw_scan_data__isnull=False) | Q(raw_screenshot_data__isnull=False)
+        ).order_by("id")
+
+        last_id = 0
+        rows_done = 0
+        blobs_written = 0
+        while True:
+            batch = list(legacy.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            blobs_written += compact_history_rows(batch)
+            rows_done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Compacted {rows_done} rows (up to id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rows_done} rows compacted, {blobs_written} blob references written"
+        ))
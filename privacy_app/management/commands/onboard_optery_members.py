@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.utils.encoders import JSONEncoder
+
+from privacy_app.onboarding import onboard_members, parse_member_rows
+
+
+class Command(BaseCommand):
+    help = "Create Optery members in bulk from a CSV or JSON file; prints one NDJSON report line per row"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (header row = member fields) or JSON file, '-' for stdin")
+        parser.add_argument("--format", choices=["csv", "json"], help="Default: from the file extension or content")
+        parser.add_argument("--group-tag", help="group_tag for rows that don't have one")
+        parser.add_argument("--concurrency", type=int, help="Optery calls in flight (OPTERY_BULK_MEMBER_CONCURRENCY)")
+        parser.add_argument("--batch-size", type=int, help="Rows per validate/bulk_create batch (OPTERY_BULK_MEMBER_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"]
+        if not fmt and path.lower().endswith((".csv", ".json")):
+            fmt = path.lower().rsplit(".", 1)[1]
+
+        try:
+            if path == "-":
+                content = sys.stdin.read()
+            else:
+                with open(path, encoding="utf-8-sig") as f:
+                    content = f.read()
+            rows = parse_member_rows(content, fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {str(e)}")
+
+        encoder = JSONEncoder()
+        for report in onboard_members(
+            rows,
+            group_tag=options["group_tag"],
+            concurrency=options["concurrency"],
+            batch_size=options["batch_size"],
+        ):
+            if "summary" in report:
+                self.stdout.write(self.style.SUCCESS(f"Done: {json.dumps(report['summary'])}"))
+            else:
+                self.stdout.write(encoder.encode(report))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from privacy_app.history import get_batch_size, history_payloads, is_fetch_error
+from privacy_app.models import OpteryScanHistory
+from privacy_app.summaries import build_exposure_summary, save_exposure_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild OpteryExposureSummary rows from stored OpteryScanHistory (e.g. for rows synced before it existed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--member-uuid", help="Only this member")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        histories = OpteryScanHistory.objects.order_by("id").only(
+            "member_uuid", "member", "scan_id", "raw_scan_data", "raw_screenshot_data", "scan_blob", "screenshot_blob"
+        )
+        if options["member_uuid"]:
+            histories = histories.filter(member_uuid=options["member_uuid"])
+
+        last_id = 0
+        rows_done = 0
+        summaries_written = 0
+        while True:
+            batch = list(histories.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            summaries = [
+                build_exposure_summary(h, scan_data, screenshot_data)
+                for h, scan_data, screenshot_data in history_payloads(batch)
+                if not is_fetch_error(screenshot_data)
+            ]
+            with transaction.atomic():
+                save_exposure_summaries(summaries, batch_size=get_batch_size())
+            summaries_written += len(summaries)
+            rows_done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Summarized {rows_done} rows (up to id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rows_done} history rows read, {summaries_written} summaries written"
+        ))
@@ -0,0 +1,49 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from privacy_app.retention import archive_storage, read_archive, restore_rows
+
+
+class Command(BaseCommand):
+    help = "Restore archived OpteryScanHistory rows from .ndjson.gz archives (by file name or by day)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Archive names in the archive storage")
+        parser.add_argument("--date", help="Restore every archive of a day (YYYY-MM-DD)")
+        parser.add_argument("--member-uuid", help="Only rows of this member")
+
+    def _day_archives(self, storage, value):
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid --date '{value}', expected YYYY-MM-DD")
+        prefix = getattr(settings, "OPTERY_HISTORY_ARCHIVE_PREFIX", "optery_history_archive")
+        directory = f"{prefix}/{day:%Y/%m/%d}"
+        try:
+            _, files = storage.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [f"{directory}/{name}" for name in sorted(files) if name.endswith(".ndjson.gz")]
+
+    def handle(self, *args, **options):
+        storage = archive_storage()
+        names = list(options["names"])
+        if options["date"]:
+            names += self._day_archives(storage, options["date"])
+        if not names:
+            raise CommandError("Nothing to restore: pass archive names or --date")
+
+        restored = skipped = 0
+        for name in names:
+            if not storage.exists(name):
+                raise CommandError(f"Archive not found: {name}")
+            done, already = restore_rows(list(read_archive(name, storage)), options["member_uuid"])
+            restored += done
+            skipped += already
+            self.stdout.write(f"{name}: {done} restored, {already} skipped")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {restored} rows restored, {skipped} skipped (already live or filtered out)"
+        ))
@@ -0,0 +1,140 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import OpteryMember
+from .redis_client import get_redis
+from .serializers import OpteryMemberSerializer
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def canonical_uuid(value):
+    """Lowercase hyphenated form of a member UUID (any accepted input format), or None"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    try:
+        return str(uuid.UUID(str(value).strip()))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class _LocalLRU:
+    """Small per-process LRU with per-entry expiry, in front of Redis"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        max_size = getattr(settings, "OPTERY_MEMBER_LRU_SIZE", 1024)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = _LocalLRU()
+
+
+def _key(kind, value):
+    return f"optery:member:{kind}:{value}"
+
+
+def _serialize(member):
+    if member is None:
+        return None
+    return {"id": member.pk, **OpteryMemberSerializer(member).data}
+
+
+def _lookup(key, query):
+    """LRU -> Redis -> one DB query; misses are cached briefly too"""
+    value = _local.get(key)
+    if value is not _MISSING:
+        return value
+
+    local_ttl = getattr(settings, "OPTERY_MEMBER_LRU_TTL", 30)
+    try:
+        raw = get_redis().get(key)
+    except Exception as e:
+        logger.warning(f"Member directory read failed for {key}: {str(e)}")
+        raw = None
+    if raw is not None:
+        value = json.loads(raw)
+        _local.set(key, value, local_ttl)
+        return value
+
+    value = _serialize(query())
+    ttl = getattr(settings, "OPTERY_MEMBER_CACHE_TTL", 3600) if value else getattr(
+        settings, "OPTERY_MEMBER_NEGATIVE_TTL", 60
+    )
+    try:
+        get_redis().set(key, json.dumps(value, default=str), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Member directory write failed for {key}: {str(e)}")
+    _local.set(key, value, min(local_ttl, ttl))
+    return value
+
+
+def get_member_by_uuid(member_uuid):
+    """Serialized OpteryMember (plus 'id') for a member UUID in any format, or None"""
+    canonical = canonical_uuid(member_uuid)
+    if canonical is None:
+        return None
+    return _lookup(_key("uuid", canonical), lambda: OpteryMember.objects.filter(uuid=canonical).first())
+
+
+def get_member_by_email(email):
+    """Serialized OpteryMember (plus 'id') for an exact email (first created if several), or None"""
+    if not email:
+        return None
+    return _lookup(
+        _key("email", email),
+        lambda: OpteryMember.objects.filter(email__exact=email).order_by("pk").first()
+    )
+
+
+def invalidate_member(member_uuid=None, email=None):
+    """Drop directory entries (Redis and this process); other processes' LRUs expire within OPTERY_MEMBER_LRU_TTL"""
+    keys = []
+    canonical = canonical_uuid(member_uuid) if member_uuid else None
+    if canonical:
+        keys.append(_key("uuid", canonical))
+    if email:
+        keys.append(_key("email", email))
+    if not keys:
+        return
+    for key in keys:
+        _local.delete(key)
+    try:
+        get_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Member directory invalidation failed for {keys}: {str(e)}")
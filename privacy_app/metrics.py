@@ -0,0 +1,34 @@
+import logging
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "optery:metrics"
+
+
+def incr_metric(name, amount=1):
+    """Increment a shared counter (e.g. 'singleflight.absorbed'); never raises"""
+    try:
+        if isinstance(amount, float):
+            get_redis().hincrbyfloat(METRICS_KEY, name, amount)
+        else:
+            get_redis().hincrby(METRICS_KEY, name, amount)
+    except Exception as e:
+        logger.warning(f"Metric update failed for {name}: {str(e)}")
+
+
+def get_metrics(prefix=None):
+    """Counters as a dict, optionally limited to names starting with prefix"""
+    try:
+        values = get_redis().hgetall(METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Metrics read failed: {str(e)}")
+        return {}
+
+    metrics = {}
+    for name, value in values.items():
+        if prefix and not name.startswith(prefix):
+            continue
+        metrics[name] = float(value) if "." in value else int(value)
+    return metrics
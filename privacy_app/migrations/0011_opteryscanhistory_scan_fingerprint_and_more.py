@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:32
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_scans(apps, schema_editor):
+    """Keep only the newest row per (member_uuid, scan_id) before adding the unique constraint"""
+    OpteryScanHistory = apps.get_model('privacy_app', 'OpteryScanHistory')
+    duplicates = (
+        OpteryScanHistory.objects.values('member_uuid', 'scan_id')
+        .annotate(row_count=Count('id'), keep_id=Max('id'))
+        .filter(row_count__gt=1)
+    )
+    for dup in duplicates.iterator():
+        OpteryScanHistory.objects.filter(
+            member_uuid=dup['member_uuid'],
+            scan_id=dup['scan_id'],
+        ).exclude(id=dup['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0010_alter_opteryscanhistory_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opteryscanhistory',
+            name='scan_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='opteryscanhistory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(remove_duplicate_scans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='opteryscanhistory',
+            constraint=models.UniqueConstraint(fields=('member_uuid', 'scan_id'), name='unique_member_scan'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0011_opteryscanhistory_scan_fingerprint_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpteryPayloadBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'optery_payload_blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='opteryscanhistory',
+            name='raw_scan_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='opteryscanhistory',
+            name='raw_screenshot_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='opteryscanhistory',
+            name='scan_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='privacy_app.opterypayloadblob'),
+        ),
+        migrations.AddField(
+            model_name='opteryscanhistory',
+            name='screenshot_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='privacy_app.opterypayloadblob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0012_opterypayloadblob_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opterymember',
+            name='next_sync_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0013_opterymember_next_sync_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opteryscanhistory',
+            name='member',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scan_history', to='privacy_app.opterymember'),
+        ),
+    ]
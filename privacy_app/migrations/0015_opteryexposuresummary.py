@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0014_opteryscanhistory_member'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpteryExposureSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_uuid', models.CharField(db_index=True, max_length=255)),
+                ('scan_id', models.CharField(max_length=255)),
+                ('scan_status', models.CharField(blank=True, db_index=True, default='', max_length=50)),
+                ('brokers_total', models.PositiveIntegerField(default=0)),
+                ('exposures_total', models.PositiveIntegerField(default=0)),
+                ('exposures_found', models.PositiveIntegerField(default=0)),
+                ('exposures_pending', models.PositiveIntegerField(default=0)),
+                ('exposures_removed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exposure_summaries', to='privacy_app.opterymember')),
+            ],
+            options={
+                'db_table': 'optery_exposure_summaries',
+                'indexes': [models.Index(fields=['member_uuid', 'updated_at'], name='optery_expo_member__cc09fb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('member_uuid', 'scan_id'), name='unique_member_scan_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-17 23:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0015_opteryexposuresummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpteryExposureRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_uuid', models.CharField(db_index=True, max_length=255)),
+                ('record_key', models.CharField(max_length=64)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('scan_id', models.CharField(max_length=255)),
+                ('record', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'optery_exposure_records',
+                'constraints': [models.UniqueConstraint(fields=('member_uuid', 'record_key'), name='unique_member_exposure_record')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OpteryExposureChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_uuid', models.CharField(max_length=255)),
+                ('scan_id', models.CharField(max_length=255)),
+                ('previous_scan_id', models.CharField(blank=True, default='', max_length=255)),
+                ('record_key', models.CharField(max_length=64)),
+                ('change_type', models.CharField(choices=[('new', 'New'), ('removed', 'Removed'), ('changed', 'Changed')], max_length=10)),
+                ('record', models.JSONField()),
+                ('previous_record', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exposure_changes', to='privacy_app.opterymember')),
+            ],
+            options={
+                'db_table': 'optery_exposure_changes',
+                'indexes': [models.Index(fields=['member_uuid', 'id'], name='optery_expo_member__0e6c4a_idx'), models.Index(fields=['member_uuid', 'created_at'], name='optery_expo_member__6aac4f_idx')],
+            },
+        ),
+    ]
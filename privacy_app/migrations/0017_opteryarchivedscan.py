@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-17 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0016_exposure_records_and_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpteryArchivedScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_uuid', models.CharField(max_length=255)),
+                ('scan_id', models.CharField(max_length=255)),
+                ('scan_fingerprint', models.CharField(blank=True, default='', max_length=64)),
+                ('archive_path', models.CharField(max_length=500)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'optery_archived_scans',
+                'constraints': [models.UniqueConstraint(fields=('member_uuid', 'scan_id'), name='unique_member_archived_scan')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('privacy_app', '0017_opteryarchivedscan'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='opteryexposuresummary',
+            name='optery_expo_member__cc09fb_idx',
+        ),
+        migrations.AddIndex(
+            model_name='opteryexposuresummary',
+            index=models.Index(fields=['member_uuid', 'created_at'], name='optery_expo_member__6aab90_idx'),
+        ),
+    ]
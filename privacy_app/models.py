@@ -1,12 +1,46 @@
+import json
+import zlib
+
 from django.db import models
 
+
+class OpteryPayloadBlob(models.Model):
+    """Compressed JSON payload, stored once per content hash and shared by history rows"""
+    hash = models.CharField(max_length=64, primary_key=True)  # sha256 of the canonical JSON
+    data = models.BinaryField()  # zlib-compressed JSON
+    size = models.PositiveIntegerField(default=0)  # Uncompressed size in bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'optery_payload_blobs'
+
+    @property
+    def payload(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.size} bytes)"
+
+
 class OpteryScanHistory(models.Model):
     member_uuid = models.CharField(max_length=255, db_index=True)  # Index added
+    # Typed link for joins (plan, group_tag, ...); older rows are filled by backfill_history_members
+    member = models.ForeignKey(
+        'OpteryMember', on_delete=models.SET_NULL, related_name='scan_history', blank=True, null=True
+    )
     email = models.EmailField(max_length=255, db_index=True)  # Index added
     scan_id = models.CharField(max_length=255, db_index=True)  # Index added
-    raw_scan_data = models.JSONField()      
-    raw_screenshot_data = models.JSONField() 
+    raw_scan_data = models.JSONField(blank=True, null=True)  # Legacy rows only, new rows use scan_blob
+    raw_screenshot_data = models.JSONField(blank=True, null=True)  # Legacy rows only, new rows use screenshot_blob
+    scan_blob = models.ForeignKey(
+        OpteryPayloadBlob, on_delete=models.PROTECT, related_name='+', blank=True, null=True
+    )
+    screenshot_blob = models.ForeignKey(
+        OpteryPayloadBlob, on_delete=models.PROTECT, related_name='+', blank=True, null=True
+    )
+    scan_fingerprint = models.CharField(max_length=64, blank=True, default='')  # Hash of the scan item, used by incremental sync
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Index added
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -14,11 +48,117 @@ class OpteryScanHistory(models.Model):
             models.Index(fields=['member_uuid', 'email']),
             models.Index(fields=['email', 'created_at']),
         ]
+        constraints = [
+            # One row per (member, scan); re-syncs upsert into it
+            models.UniqueConstraint(fields=['member_uuid', 'scan_id'], name='unique_member_scan'),
+        ]
 
     def __str__(self):
         return f"{self.email} - {self.scan_id}"
 
 
+class OpteryArchivedScan(models.Model):
+    """
+    Tombstone for an OpteryScanHistory row moved to an archive by the retention
+    job; while the fingerprint matches, sync reads the scan's screenshots back
+    from the archive file instead of re-fetching them.
+    """
+    member_uuid = models.CharField(max_length=255)
+    scan_id = models.CharField(max_length=255)
+    scan_fingerprint = models.CharField(max_length=64, blank=True, default='')
+    archive_path = models.CharField(max_length=500)  # Storage name of the .ndjson.gz file
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'optery_archived_scans'
+        constraints = [
+            models.UniqueConstraint(fields=['member_uuid', 'scan_id'], name='unique_member_archived_scan'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_uuid} - {self.scan_id} ({self.archive_path})"
+
+
+class OpteryExposureSummary(models.Model):
+    """Per (member, scan) exposure counts, kept in step with OpteryScanHistory at ingest"""
+    member_uuid = models.CharField(max_length=255, db_index=True)
+    member = models.ForeignKey(
+        'OpteryMember', on_delete=models.SET_NULL, related_name='exposure_summaries', blank=True, null=True
+    )
+    scan_id = models.CharField(max_length=255)
+    scan_status = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    brokers_total = models.PositiveIntegerField(default=0)  # Distinct brokers with an exposure
+    exposures_total = models.PositiveIntegerField(default=0)
+    exposures_found = models.PositiveIntegerField(default=0)  # Still exposed, no removal yet
+    exposures_pending = models.PositiveIntegerField(default=0)  # Removal requested / in progress
+    exposures_removed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'optery_exposure_summaries'
+        indexes = [
+            # Newest scans first: (created_at, id), same order as the history list
+            models.Index(fields=['member_uuid', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['member_uuid', 'scan_id'], name='unique_member_scan_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_uuid} - {self.scan_id} ({self.exposures_found}/{self.exposures_total})"
+
+
+class OpteryExposureRecord(models.Model):
+    """A member's exposures as of their latest diffed scan, keyed by a hash of the record's identity"""
+    member_uuid = models.CharField(max_length=255, db_index=True)
+    record_key = models.CharField(max_length=64)  # sha256 of broker + listing identity
+    content_hash = models.CharField(max_length=64)  # sha256 of the whole record, detects changes
+    scan_id = models.CharField(max_length=255)  # Scan the record was last seen in
+    record = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'optery_exposure_records'
+        constraints = [
+            models.UniqueConstraint(fields=['member_uuid', 'record_key'], name='unique_member_exposure_record'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_uuid} - {self.record_key[:12]}"
+
+
+class OpteryExposureChange(models.Model):
+    """One new / removed / changed exposure between a member's consecutive scans"""
+    NEW = 'new'
+    REMOVED = 'removed'
+    CHANGED = 'changed'
+    CHANGE_TYPES = [(NEW, 'New'), (REMOVED, 'Removed'), (CHANGED, 'Changed')]
+
+    member_uuid = models.CharField(max_length=255)
+    member = models.ForeignKey(
+        'OpteryMember', on_delete=models.SET_NULL, related_name='exposure_changes', blank=True, null=True
+    )
+    scan_id = models.CharField(max_length=255)  # Scan the change was detected in
+    previous_scan_id = models.CharField(max_length=255, blank=True, default='')
+    record_key = models.CharField(max_length=64)
+    change_type = models.CharField(max_length=10, choices=CHANGE_TYPES)
+    record = models.JSONField()  # Current record (the last known one for removals)
+    previous_record = models.JSONField(blank=True, null=True)  # Before a change
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'optery_exposure_changes'
+        indexes = [
+            # since= reads: one member's changes after an id / time
+            models.Index(fields=['member_uuid', 'id']),
+            models.Index(fields=['member_uuid', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.member_uuid} - {self.change_type} {self.record_key[:12]}"
+
+
 class OpteryMember(models.Model):
     uuid = models.UUIDField(unique=True, db_index=True, blank=True, null=True)
     email = models.EmailField(db_index=True)  # Index added
@@ -42,6 +182,9 @@ class OpteryMember(models.Model):
     optery_response = models.JSONField(blank=True, null=True)
     status_code = models.IntegerField()
     is_success = models.BooleanField(default=False)
+
+    # Next scheduled background sync (set by the schedule_optery_syncs beat task)
+    next_sync_at = models.DateTimeField(blank=True, null=True, db_index=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
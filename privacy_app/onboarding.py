@@ -0,0 +1,217 @@
+import concurrent.futures
+import csv
+import io
+import json
+import logging
+
+import requests
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .circuit import OpteryCircuitOpen
+from .members import invalidate_member
+from .models import OpteryMember
+from .optery_client import optery_post
+from .ratelimit import OpteryRateLimited
+from .serializers import OpteryMemberSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def build_member(validated_data, response_data, status_code):
+    """Unsaved OpteryMember for a member Optery accepted"""
+    return OpteryMember(
+        uuid=response_data.get("uuid"),
+        email=validated_data["email"],
+        first_name=validated_data["first_name"],
+        last_name=validated_data["last_name"],
+        middle_name=validated_data.get("middle_name"),
+        city=validated_data.get("city"),
+        country=validated_data.get("country", "US"),
+        state=validated_data.get("state"),
+        birthday_day=validated_data.get("birthday_day"),
+        birthday_month=validated_data.get("birthday_month"),
+        birthday_year=validated_data.get("birthday_year"),
+        plan=validated_data["plan"],
+        postpone_scan=validated_data.get("postpone_scan", 45),
+        group_tag=validated_data.get("group_tag"),
+        address_line1=validated_data.get("address_line1"),
+        address_line2=validated_data.get("address_line2"),
+        zipcode=validated_data.get("zipcode"),
+        optery_response=response_data,
+        status_code=status_code,
+        is_success=True
+    )
+
+
+def create_member(validated_data, wait_for_token=True):
+    """
+    Create one member on Optery and save it if Optery accepted it.
+    Returns (status_code, body), body being CreateOpteryMember's response.
+    Limiter / breaker rejections and request errors are raised.
+    """
+    optery_response = optery_post("members", "v1/members", json=validated_data, wait_for_token=wait_for_token)
+    try:
+        response_data = optery_response.json()
+    except ValueError:
+        response_data = {}
+    is_success = optery_response.status_code in [200, 201]
+
+    # Only save to database if API call was successful
+    if is_success:
+        build_member(validated_data, response_data, optery_response.status_code).save()
+
+    return optery_response.status_code, {
+        "success": is_success,
+        "status_code": optery_response.status_code,
+        "optery_response": response_data,
+        "data": response_data
+    }
+
+
+def parse_member_rows(content, fmt=None):
+    """
+    Member rows from a CSV (header row = serializer field names) or JSON
+    document (a list, or {"members": [...]}). Empty CSV cells are left out.
+    """
+    content = content.lstrip("\ufeff")
+    if fmt is None:
+        fmt = "json" if content.lstrip()[:1] in ("[", "{") else "csv"
+
+    if fmt == "json":
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get("members")
+        if not isinstance(data, list):
+            raise ValueError("JSON input must be a list of members or {\"members\": [...]}")
+        return data
+
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        return [
+            {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+            for row in reader
+        ]
+
+    raise ValueError(f"Unsupported format '{fmt}', use csv or json")
+
+
+def _create_on_optery(validated_data):
+    """
+    One Optery member creation; returns (status_code, response_data, error, retryable).
+    Only failures where Optery cannot have created the member are retryable.
+    """
+    try:
+        response = optery_post("members", "v1/members", json=validated_data)
+    except (OpteryRateLimited, OpteryCircuitOpen) as e:
+        return None, None, str(e), True
+    except requests.exceptions.ConnectionError as e:
+        # Includes ConnectTimeout: the request never reached Optery
+        logger.error(f"Bulk onboarding: Optery unreachable: {str(e)}")
+        return None, None, f"Failed to reach Optery: {str(e)}", True
+    except requests.exceptions.Timeout:
+        # Optery may still have created the member, a blind retry could duplicate it
+        return None, None, "Request timeout, outcome unknown: check the member on Optery before retrying", False
+    except Exception as e:
+        logger.error(f"Bulk onboarding: Optery call failed: {str(e)}")
+        return None, None, str(e), False
+    try:
+        response_data = response.json()
+    except ValueError:
+        response_data = {}
+    return response.status_code, response_data, None, False
+
+
+def _save_members(members):
+    """
+    bulk_create the accepted members; on any database error fall back to
+    row-by-row inserts so one bad row doesn't drop the batch. Returns {index: error}.
+    """
+    errors = {}
+    try:
+        with transaction.atomic():
+            OpteryMember.objects.bulk_create(list(members.values()))
+    except DatabaseError as e:
+        logger.warning(f"Bulk onboarding: bulk insert failed, saving row by row: {str(e)}")
+        for index, member in members.items():
+            try:
+                with transaction.atomic():
+                    member.save()
+            except DatabaseError as e:
+                logger.error(f"Bulk onboarding: saving member {member.uuid} failed: {str(e)}")
+                errors[index] = str(e)
+
+    # bulk_create skips post_save, so drop any cached "not found" directory entries here
+    for index, member in members.items():
+        if index not in errors:
+            invalidate_member(member.uuid, member.email)
+    return errors
+
+
+def _process_batch(batch, serializer, executor):
+    """Validate, create on Optery and save one batch; yields one report per row, in order"""
+    reports = {}
+    valid = {}
+    for index, row in batch:
+        try:
+            valid[index] = serializer.run_validation(row)
+        except ValidationError as e:
+            reports[index] = {"status": "invalid", "errors": e.detail}
+
+    futures = {index: executor.submit(_create_on_optery, data) for index, data in valid.items()}
+    accepted = {}
+    for index, future in futures.items():
+        status_code, response_data, error, retryable = future.result()
+        if status_code in (200, 201):
+            accepted[index] = build_member(valid[index], response_data, status_code)
+        elif status_code is None:
+            reports[index] = {"status": "failed", "error": error, "retryable": retryable}
+        else:
+            reports[index] = {
+                "status": "failed",
+                "status_code": status_code,
+                "error": response_data,
+                "retryable": status_code == 429 or status_code >= 500,
+            }
+
+    save_errors = _save_members(accepted) if accepted else {}
+    for index, member in accepted.items():
+        if index in save_errors:
+            # Optery has the member, our copy failed: report the uuid so it can be reconciled
+            reports[index] = {"status": "failed", "uuid": member.uuid, "error": save_errors[index], "retryable": False}
+        else:
+            reports[index] = {"status": "created", "uuid": member.uuid}
+
+    for index, row in batch:
+        email = row.get("email") if isinstance(row, dict) else None
+        yield {"row": index, "email": email, **reports[index]}
+
+
+def onboard_members(rows, group_tag=None, concurrency=None, batch_size=None):
+    """
+    Create many members: each batch is validated with OpteryMemberSerializer,
+    sent to Optery with at most `concurrency` calls in flight (rate limiter
+    and circuit breaker still apply) and saved with bulk_create.
+    Yields a report per row (row numbers start at 1), then {"summary": {...}}.
+    """
+    concurrency = concurrency or getattr(settings, "OPTERY_BULK_MEMBER_CONCURRENCY", 4)
+    batch_size = batch_size or getattr(settings, "OPTERY_BULK_MEMBER_BATCH_SIZE", 100)
+    serializer = OpteryMemberSerializer()
+
+    counts = {"total": 0, "created": 0, "invalid": 0, "failed": 0}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for start in range(0, len(rows), batch_size):
+            batch = []
+            for index, row in enumerate(rows[start:start + batch_size], start=start + 1):
+                if isinstance(row, dict) and group_tag and not row.get("group_tag"):
+                    row = {**row, "group_tag": group_tag}
+                batch.append((index, row))
+
+            for report in _process_batch(batch, serializer, executor):
+                counts["total"] += 1
+                counts[report["status"]] += 1
+                yield report
+
+    logger.info(f"Bulk onboarding finished: {counts}")
+    yield {"summary": counts}
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+import httpx
+from django.conf import settings
+
+from .circuit import OpteryCircuitOpen, check_circuit, record_failure, record_success
+from .inflight import acquire_slot, release_slot
+from .optery_client import get_optery_config, get_timeout
+from .ratelimit import OpteryRateLimited, acquire_token, note_rate_limited
+
+logger = logging.getLogger(__name__)
+
+
+def _build_client(pool_size):
+    optery_base, optery_token = get_optery_config()
+    connect, read = get_timeout("screenshots")
+    return httpx.AsyncClient(
+        base_url=optery_base,
+        headers={
+            "Accept": "application/json",
+            "Authorization": f"Bearer {optery_token}",
+        },
+        timeout=httpx.Timeout(read, connect=connect),
+        # One pool for every member in this run
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+        ),
+    )
+
+
+async def _fetch_one(client, member_uuid, scan_id, member_sem, on_result=None):
+    from .tasks import safe_json_parse, screenshot_error
+
+    async with member_sem:
+        slot = None
+        try:
+            # Breaker and limiters talk to Redis (and may sleep), so keep them off the event loop
+            await asyncio.to_thread(check_circuit)
+            slot = await asyncio.to_thread(acquire_slot, "screenshots")
+            await asyncio.to_thread(acquire_token, "screenshots")
+            ss_response = await client.get(f"v1/optouts/{member_uuid}/get-screenshots-by-scan/{scan_id}")
+            await asyncio.to_thread(record_failure if ss_response.status_code >= 500 else record_success)
+            if ss_response.status_code == 200:
+                ss_res = safe_json_parse(ss_response.text, {})
+            else:
+                if ss_response.status_code == 429:
+                    note_rate_limited("screenshots", ss_response.headers.get("Retry-After"))
+                ss_res = screenshot_error(ss_response.status_code)
+        except OpteryRateLimited as e:
+            logger.warning(f"Screenshot fetch deferred for scan {scan_id}: {str(e)}")
+            ss_res = {"error": "Rate limited", "retryable": True}
+        except OpteryCircuitOpen as e:
+            logger.warning(f"Screenshot fetch skipped for scan {scan_id}: {str(e)}")
+            ss_res = {"error": "Optery temporarily unavailable", "retryable": True}
+        except httpx.HTTPError as e:
+            await asyncio.to_thread(record_failure)
+            logger.error(f"Screenshot fetch failed for scan {scan_id}: {str(e)}")
+            ss_res = {"error": "Failed to fetch screenshots", "retryable": True}
+        finally:
+            if slot is not None:
+                await asyncio.to_thread(release_slot, "screenshots", slot)
+
+    if on_result:
+        # Progress reporting makes blocking Redis calls
+        await asyncio.to_thread(on_result, scan_id, ss_res)
+    return ss_res
+
+
+async def gather_screenshots(jobs, member_limit=None, on_result=None):
+    """
+    Fetch screenshots for several members over one connection pool.
+    `jobs` is a list of (member_uuid, scan_ids); returns one result list per job,
+    each in scan_ids order (same as ThreadPoolExecutor.map).
+    on_result(scan_id, ss_res) is called as each scan completes.
+    At most member_limit requests per member run at once; the cap across
+    members, tasks and workers is the shared in-flight limit (OPTERY_INFLIGHT_LIMITS).
+    """
+    member_limit = member_limit or getattr(settings, "OPTERY_ASYNC_MEMBER_CONCURRENCY", 10)
+
+    async with _build_client(member_limit * max(len(jobs), 1)) as client:
+        job_coros = []
+        for member_uuid, scan_ids in jobs:
+            member_sem = asyncio.Semaphore(member_limit)
+            job_coros.append(asyncio.gather(*[
+                _fetch_one(client, member_uuid, scan_id, member_sem, on_result)
+                for scan_id in scan_ids
+            ]))
+        results = await asyncio.gather(*job_coros)
+
+    return [list(r) for r in results]
+
+
+def fetch_screenshots_async(member_uuid, scan_ids, on_result=None):
+    """Sync entry point used by the Celery task"""
+    return asyncio.run(gather_screenshots([(member_uuid, scan_ids)], on_result=on_result))[0]
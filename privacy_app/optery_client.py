@@ -0,0 +1,186 @@
+import logging
+import os
+import socket
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from .circuit import check_circuit, record_failure, record_success
+from .inflight import acquire_slot, release_slot
+from .ratelimit import acquire_token, note_rate_limited
+
+logger = logging.getLogger(__name__)
+
+
+# (connect, read) timeouts per Optery endpoint, overridable via settings.OPTERY_HTTP_TIMEOUTS
+DEFAULT_TIMEOUTS = {
+    "members": (5, 30),
+    "get-scans": (5, 30),
+    "screenshots": (5, 30),
+    "custom-removals": (5, 30),
+    "custom-removals-create": (5, 60),
+}
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_request_count = 0
+
+
+def get_optery_config():
+    """Get Optery configuration"""
+    base_url = settings.OPTERY_BASE_URL
+    api_token = settings.OPTERY_API_KEY
+
+    if not base_url or not api_token:
+        logger.error("Optery configuration missing. Check environment variables.")
+        raise ValueError("Optery API configuration not found")
+
+    if not base_url.endswith('/'):
+        base_url += '/'
+
+    return base_url, api_token
+
+
+def get_timeout(endpoint):
+    """Timeout tuple for an endpoint"""
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    timeouts.update(getattr(settings, "OPTERY_HTTP_TIMEOUTS", {}))
+    return timeouts.get(endpoint, (5, 30))
+
+
+class OpteryHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with optional TCP keep-alive on pooled sockets"""
+
+    def __init__(self, keepalive_idle=None, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive_idle:
+            options = list(HTTPConnection.default_socket_options)
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+            kwargs["socket_options"] = options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _build_session():
+    optery_base, optery_token = get_optery_config()
+    pool_size = getattr(settings, "OPTERY_HTTP_POOL_SIZE", 10)
+    keepalive = getattr(settings, "OPTERY_HTTP_KEEPALIVE", True)
+
+    session = requests.Session()
+    adapter = OpteryHTTPAdapter(
+        keepalive_idle=getattr(settings, "OPTERY_HTTP_KEEPALIVE_IDLE", 60) if keepalive else None,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # Auth headers are built once per process and shared by every call
+    session.headers.update({
+        "Accept": "application/json",
+        "Authorization": f"Bearer {optery_token}",
+    })
+    if not keepalive:
+        session.headers["Connection"] = "close"
+
+    session.optery_base = optery_base
+    logger.info(f"Optery HTTP session created (pid={os.getpid()}, pool_size={pool_size}, keepalive={keepalive})")
+    return session
+
+
+def get_session():
+    """Per-process pooled Optery session (rebuilt after a fork)"""
+    global _session, _session_pid, _request_count
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+                _request_count = 0
+    return _session
+
+
+def reset_session():
+    """Close and drop the current session (next call builds a new one)"""
+    global _session, _session_pid, _request_count
+
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+        _request_count = 0
+
+
+def optery_request(method, endpoint, path, timeout=None, wait_for_token=True, **kwargs):
+    """
+    Send a request to Optery through the pooled session.
+    `endpoint` picks the timeout and rate limit bucket, `path` is relative to OPTERY_BASE_URL.
+    wait_for_token=False raises OpteryRateLimited instead of waiting for the limiter
+    or an in-flight slot. Raises OpteryCircuitOpen without calling Optery while
+    the circuit breaker is open.
+    """
+    global _request_count
+
+    check_circuit()
+    slot = acquire_slot(endpoint, wait=wait_for_token)
+    try:
+        acquire_token(endpoint, wait=wait_for_token)
+        session = get_session()
+        url = session.optery_base + path.lstrip('/')
+        response = session.request(method, url, timeout=timeout or get_timeout(endpoint), **kwargs)
+    except requests.exceptions.RequestException:
+        record_failure()
+        raise
+    finally:
+        release_slot(endpoint, slot)
+    with _lock:
+        _request_count += 1
+
+    if response.status_code >= 500:
+        record_failure()
+    else:
+        record_success()
+    if response.status_code == 429:
+        note_rate_limited(endpoint, response.headers.get("Retry-After"))
+    return response
+
+
+def optery_get(endpoint, path, **kwargs):
+    return optery_request("GET", endpoint, path, **kwargs)
+
+
+def optery_post(endpoint, path, **kwargs):
+    return optery_request("POST", endpoint, path, **kwargs)
+
+
+def get_connection_stats():
+    """Connection reuse counters for the current process"""
+    opened = 0
+    if _session is not None and _session_pid == os.getpid():
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+
+    requests_sent = _request_count
+    reused = max(requests_sent - opened, 0)
+    return {
+        "pid": os.getpid(),
+        "requests": requests_sent,
+        "connections_opened": opened,
+        "connections_reused": reused,
+        "reuse_ratio": round(reused / requests_sent, 3) if requests_sent else 0.0,
+    }
@@ -0,0 +1,190 @@
+import json
+import logging
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Events after which a progress stream is closed
+TERMINAL_EVENTS = {"done", "failed"}
+
+
+def _channel(task_id):
+    return f"optery:progress:{task_id}"
+
+
+def _state_key(task_id):
+    return f"optery:progress-state:{task_id}"
+
+
+def publish_progress(task_id, event, **data):
+    """
+    Publish a progress event for a fetch task on Redis pub/sub.
+    The latest event is also kept under a key so late subscribers start from it.
+    """
+    if not task_id:
+        return
+    payload = json.dumps({"event": event, "task_id": task_id, **data}, default=str)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(_state_key(task_id), payload, ex=getattr(settings, "OPTERY_PROGRESS_TTL", 3600))
+        pipe.publish(_channel(task_id), payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Progress publish failed for task {task_id}: {str(e)}")
+
+
+def _sse(payload):
+    event = json.loads(payload).get("event", "message")
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def progress_event_stream(task_id):
+    """
+    Async generator of server-sent events for a task: the last known state,
+    then every published event until a terminal one (or OPTERY_PROGRESS_STREAM_TIMEOUT).
+    Runs on the ASGI event loop, so a waiting client does not hold a worker thread.
+    """
+    import asyncio
+    import redis.asyncio as aioredis
+
+    timeout = getattr(settings, "OPTERY_PROGRESS_STREAM_TIMEOUT", 300)
+    keepalive = getattr(settings, "OPTERY_PROGRESS_KEEPALIVE", 15)
+
+    client = aioredis.from_url(settings.OPTERY_REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the stored state so no event falls in between
+        await pubsub.subscribe(_channel(task_id))
+        last = await client.get(_state_key(task_id))
+        if last:
+            yield _sse(last)
+            if json.loads(last).get("event") in TERMINAL_EVENTS:
+                return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(message["data"])
+            if json.loads(message["data"]).get("event") in TERMINAL_EVENTS:
+                return
+        yield _sse(json.dumps({"event": "timeout", "task_id": task_id}))
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def _partial_key(task_id):
+    return f"optery:partial:{task_id}"
+
+
+def _partial_meta_key(task_id):
+    return f"optery:partial-meta:{task_id}"
+
+
+def _partial_scans_key(task_id):
+    return f"optery:partial-scans:{task_id}"
+
+
+def start_partial(task_id, scans, total, ready_entries=()):
+    """
+    Open the partial-result log for a task once scans are listed: stores the
+    scan list and total, plus entries already available (e.g. unchanged scans).
+    The log is append-only so client cursors stay valid: a retry of the task
+    keeps it and only adds entries for scans not logged yet.
+    """
+    if not task_id or not getattr(settings, "OPTERY_PARTIAL_RESULTS", True):
+        return
+    ttl = getattr(settings, "OPTERY_PROGRESS_TTL", 3600)
+    try:
+        client = get_redis()
+        logged = client.smembers(_partial_scans_key(task_id))
+        pipe = client.pipeline()
+        pipe.hset(_partial_meta_key(task_id), mapping={
+            "total": total,
+            "scans": json.dumps(scans, default=str),
+        })
+        pipe.expire(_partial_meta_key(task_id), ttl)
+        for entry in ready_entries:
+            if str(entry["scan_id"]) in logged:
+                continue
+            pipe.rpush(_partial_key(task_id), json.dumps(entry, default=str))
+            pipe.sadd(_partial_scans_key(task_id), entry["scan_id"])
+        pipe.expire(_partial_key(task_id), ttl)
+        pipe.expire(_partial_scans_key(task_id), ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Partial result init failed for task {task_id}: {str(e)}")
+
+
+def push_partial(task_id, entry):
+    """
+    Append one finished screenshots entry to the task's partial-result log.
+    A scan fetched again after a failed attempt is appended again, the later
+    entry replaces the earlier one.
+    """
+    if not task_id or not getattr(settings, "OPTERY_PARTIAL_RESULTS", True):
+        return
+    ttl = getattr(settings, "OPTERY_PROGRESS_TTL", 3600)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.rpush(_partial_key(task_id), json.dumps(entry, default=str))
+        pipe.sadd(_partial_scans_key(task_id), entry["scan_id"])
+        pipe.expire(_partial_key(task_id), ttl)
+        pipe.expire(_partial_scans_key(task_id), ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Partial result push failed for task {task_id}: {str(e)}")
+
+
+def incr_completed(task_id):
+    """
+    Shared completed-screenshots counter for a task whose scans are fetched by
+    several chunk subtasks on different workers. Returns the new count (None on error).
+    """
+    key = f"optery:progress-count:{task_id}"
+    try:
+        pipe = get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, getattr(settings, "OPTERY_PROGRESS_TTL", 3600))
+        return pipe.execute()[0]
+    except Exception as e:
+        logger.warning(f"Progress counter update failed for task {task_id}: {str(e)}")
+        return None
+
+
+def get_partial(task_id, cursor=0):
+    """
+    Screenshots finished so far, starting at `cursor` (number of items the
+    client already has). The scan list is only included on the first poll;
+    completed counts distinct scans.
+    """
+    try:
+        client = get_redis()
+        meta = client.hgetall(_partial_meta_key(task_id))
+        items = client.lrange(_partial_key(task_id), cursor, -1)
+        completed = client.scard(_partial_scans_key(task_id))
+    except Exception as e:
+        logger.warning(f"Partial result read failed for task {task_id}: {str(e)}")
+        return {}
+
+    if not meta:
+        return {}
+
+    partial = {
+        "completed": completed,
+        "total": int(meta.get("total", 0)),
+        "screenshots": [json.loads(item) for item in items],
+        "next_cursor": cursor + len(items),
+    }
+    if cursor == 0:
+        partial["scans"] = json.loads(meta.get("scans", "[]"))
+    return partial
@@ -0,0 +1,140 @@
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+from .metrics import incr_metric
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Optery endpoint -> rate limit class (one shared bucket per class)
+ENDPOINT_CLASSES = {
+    "members": "members",
+    "get-scans": "get-scans",
+    "screenshots": "screenshots",
+    "custom-removals": "custom-removals",
+    "custom-removals-create": "custom-removals",
+}
+
+# (tokens per second, burst), overridable via settings.OPTERY_RATE_LIMITS
+DEFAULT_RATE_LIMITS = {
+    "members": (2, 5),
+    "get-scans": (5, 10),
+    "screenshots": (10, 20),
+    "custom-removals": (2, 5),
+}
+
+# Returns 0 when a token was taken, otherwise milliseconds to wait.
+# KEYS[1] bucket hash, KEYS[2] Retry-After block key; ARGV rate/s, burst, now (ms)
+TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('pttl', KEYS[2])
+if blocked > 0 then
+    return blocked
+end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('pexpire', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class OpteryRateLimited(Exception):
+    """Raised when no Optery token is available (fail-fast) or the wait would be too long"""
+
+    def __init__(self, limit_class, retry_after):
+        self.limit_class = limit_class
+        self.retry_after = retry_after
+        super().__init__(f"Optery rate limit reached for {limit_class}, retry after {retry_after:.1f}s")
+
+
+def _limit_for(limit_class):
+    limits = dict(DEFAULT_RATE_LIMITS)
+    limits.update(getattr(settings, "OPTERY_RATE_LIMITS", {}))
+    return limits.get(limit_class)
+
+
+def acquire_token(endpoint, wait=True, max_wait=None):
+    """
+    Take one token from the endpoint class's shared bucket.
+    wait=True (task path) sleeps until a token is free, up to OPTERY_RATE_LIMIT_MAX_WAIT;
+    wait=False (views) raises OpteryRateLimited immediately.
+    Returns the seconds spent waiting. Fails open if Redis is unavailable.
+    """
+    if not getattr(settings, "OPTERY_RATE_LIMIT_ENABLED", True):
+        return 0.0
+
+    limit_class = ENDPOINT_CLASSES.get(endpoint, endpoint)
+    limit = _limit_for(limit_class)
+    if not limit:
+        return 0.0
+    rate, burst = limit
+    if max_wait is None:
+        max_wait = getattr(settings, "OPTERY_RATE_LIMIT_MAX_WAIT", 60)
+
+    keys = [f"optery:ratelimit:{limit_class}", f"optery:ratelimit-block:{limit_class}"]
+    waited = 0.0
+    while True:
+        try:
+            wait_ms = get_redis().eval(TOKEN_BUCKET_SCRIPT, 2, *keys, rate, burst, int(time.time() * 1000))
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing {limit_class} call: {str(e)}")
+            return waited
+
+        if not wait_ms:
+            if waited:
+                incr_metric(f"ratelimit.{limit_class}.waits")
+                incr_metric(f"ratelimit.{limit_class}.wait_seconds", round(waited, 3))
+            return waited
+
+        delay = wait_ms / 1000
+        if not wait or waited + delay > max_wait:
+            incr_metric(f"ratelimit.{limit_class}.rejected")
+            raise OpteryRateLimited(limit_class, delay)
+
+        # Small jitter so waiting workers don't all wake at once
+        delay *= random.uniform(1.0, 1.1)
+        time.sleep(delay)
+        waited += delay
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def note_rate_limited(endpoint, retry_after_header):
+    """On a 429 from Optery, block the whole endpoint class for Retry-After seconds"""
+    limit_class = ENDPOINT_CLASSES.get(endpoint, endpoint)
+    retry_after = parse_retry_after(retry_after_header)
+    if retry_after is None:
+        retry_after = getattr(settings, "OPTERY_RATE_LIMIT_DEFAULT_BACKOFF", 5)
+    incr_metric(f"ratelimit.{limit_class}.upstream_429")
+    try:
+        get_redis().set(f"optery:ratelimit-block:{limit_class}", 1, px=max(int(retry_after * 1000), 1))
+    except Exception as e:
+        logger.warning(f"Could not record Retry-After for {limit_class}: {str(e)}")
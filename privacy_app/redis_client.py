@@ -0,0 +1,16 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client for Optery coordination (leases, metrics, progress)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.OPTERY_REDIS_URL,
+            decode_responses=True,
+            socket_timeout=getattr(settings, "OPTERY_REDIS_SOCKET_TIMEOUT", 5),
+        )
+    return _client
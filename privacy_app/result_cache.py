@@ -0,0 +1,34 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _result_key(member_uuid):
+    return f"optery:result:{member_uuid}"
+
+
+def get_cached_result(member_uuid):
+    """Last successful fetch_optery_scans_background result for a member, or None"""
+    try:
+        return cache.get(_result_key(member_uuid))
+    except Exception as e:
+        logger.warning(f"Result cache read failed for {member_uuid}: {str(e)}")
+        return None
+
+
+def cache_result(member_uuid, result):
+    """Store a successful task result for OPTERY_RESULT_CACHE_TTL seconds"""
+    try:
+        cache.set(_result_key(member_uuid), result, timeout=getattr(settings, "OPTERY_RESULT_CACHE_TTL", 300))
+    except Exception as e:
+        logger.warning(f"Result cache write failed for {member_uuid}: {str(e)}")
+
+
+def invalidate_result(member_uuid):
+    try:
+        cache.delete(_result_key(member_uuid))
+    except Exception as e:
+        logger.warning(f"Result cache delete failed for {member_uuid}: {str(e)}")
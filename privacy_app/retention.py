@@ -0,0 +1,228 @@
+import gzip
+import json
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .history import get_batch_size, history_payloads, save_scan_history
+from .models import OpteryArchivedScan, OpteryMember, OpteryPayloadBlob, OpteryScanHistory
+
+logger = logging.getLogger(__name__)
+
+RETENTION_LOCK_KEY = "optery:retention-lock"
+ARCHIVE_FIELDS = ["id", "member_uuid", "member_id", "email", "scan_id", "scan_fingerprint", "created_at", "updated_at"]
+
+
+def archive_storage():
+    """OPTERY_HISTORY_ARCHIVE_DIR (local directory) if set, else default storage (MEDIA_ROOT or the configured backend)"""
+    location = getattr(settings, "OPTERY_HISTORY_ARCHIVE_DIR", "")
+    return FileSystemStorage(location=location) if location else default_storage
+
+
+def _archive_name(day):
+    prefix = getattr(settings, "OPTERY_HISTORY_ARCHIVE_PREFIX", "optery_history_archive")
+    stamp = timezone.now().strftime("%Y%m%dT%H%M%S")
+    return f"{prefix}/{day:%Y/%m/%d}/history-{stamp}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+
+
+def archive_candidate_ids(keep, limit):
+    """
+    Ids of up to `limit` history rows beyond each member's `keep` newest
+    (by created_at, id). Only members with more than `keep` rows are ranked.
+    """
+    over = (
+        OpteryScanHistory.objects.values("member_uuid")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=keep)
+        .values("member_uuid")
+    )
+    ranked = (
+        OpteryScanHistory.objects.filter(member_uuid__in=over)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F("member_uuid")],
+            order_by=[F("created_at").desc(), F("id").desc()],
+        ))
+        .filter(rank__gt=keep)
+        .order_by("id")
+    )
+    return list(ranked.values_list("id", flat=True)[:limit])
+
+
+def _archive_line(history, scan_data, screenshot_data):
+    line = {field: getattr(history, field) for field in ARCHIVE_FIELDS}
+    line["scan_data"] = scan_data
+    line["screenshot_data"] = screenshot_data
+    return json.dumps(line, separators=(',', ':'), default=str)
+
+
+def _write_archives(histories, storage):
+    """
+    Write rows (with decoded payloads, so archives are self-contained) as gzip
+    NDJSON, one file per created_at day. Returns {history_id: archive name}.
+    """
+    by_day = defaultdict(list)
+    for h, scan_data, screenshot_data in history_payloads(histories):
+        by_day[timezone.localtime(h.created_at).date()].append((h, _archive_line(h, scan_data, screenshot_data)))
+
+    written = {}
+    for day, entries in by_day.items():
+        data = gzip.compress("".join(line + "\n" for _, line in entries).encode())
+        name = storage.save(_archive_name(day), ContentFile(data))
+        written.update({h.id: name for h, _ in entries})
+    return written
+
+
+def _purge_orphan_blobs(hashes):
+    """
+    Delete payload blobs no history row references any more. Blobs newer than
+    CELERY_RESULT_EXPIRES are kept, pointer task results may still read them.
+    """
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return 0
+    referenced = set(OpteryScanHistory.objects.filter(
+        Q(scan_blob_id__in=hashes) | Q(screenshot_blob_id__in=hashes)
+    ).values_list("scan_blob_id", "screenshot_blob_id").distinct().iterator())
+    referenced = {h for pair in referenced for h in pair}
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "CELERY_RESULT_EXPIRES", 24 * 3600))
+    deleted, _ = OpteryPayloadBlob.objects.filter(
+        hash__in=hashes - referenced, created_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def archive_batch(keep, batch_size, storage=None):
+    """
+    Archive one batch of rows beyond the newest `keep` per member: write the
+    archive files first, then tombstone and delete the rows in one transaction
+    (a crash in between leaves rows archived twice, never lost).
+    Returns the number of rows archived.
+    """
+    storage = storage or archive_storage()
+    ids = archive_candidate_ids(keep, batch_size)
+    if not ids:
+        return 0
+
+    histories = list(OpteryScanHistory.objects.filter(id__in=ids).order_by("id"))
+    written = _write_archives(histories, storage)
+
+    with transaction.atomic():
+        OpteryArchivedScan.objects.bulk_create(
+            [
+                OpteryArchivedScan(
+                    member_uuid=h.member_uuid,
+                    scan_id=h.scan_id,
+                    scan_fingerprint=h.scan_fingerprint,
+                    archive_path=written[h.id],
+                )
+                for h in histories
+            ],
+            batch_size=get_batch_size(),
+            update_conflicts=True,
+            unique_fields=["member_uuid", "scan_id"],
+            update_fields=["scan_fingerprint", "archive_path", "archived_at"],
+        )
+        OpteryScanHistory.objects.filter(id__in=[h.id for h in histories]).delete()
+        _purge_orphan_blobs([h.scan_blob_id for h in histories] + [h.screenshot_blob_id for h in histories])
+
+    logger.info(f"Archived {len(histories)} scan history rows into {len(set(written.values()))} files")
+    return len(histories)
+
+
+def load_archived_scans(member_uuid, scan_ids, fingerprints=None, storage=None):
+    """
+    Archived scans of a member read back from their archive files (each file
+    read once): {scan_id: (scan_fingerprint, screenshot_data)}. With
+    `fingerprints` ({scan_id: current fingerprint}) only unchanged scans are
+    loaded. Scans whose archive can't be read are left out (fetched again).
+    """
+    wanted = defaultdict(dict)
+    for scan_id, fingerprint, archive_path in OpteryArchivedScan.objects.filter(
+        member_uuid=member_uuid,
+        scan_id__in=scan_ids
+    ).values_list("scan_id", "scan_fingerprint", "archive_path"):
+        if fingerprints is None or fingerprints.get(scan_id) == fingerprint:
+            wanted[archive_path][scan_id] = fingerprint
+
+    storage = storage or archive_storage()
+    found = {}
+    for archive_path, scans in wanted.items():
+        try:
+            for entry in read_archive(archive_path, storage):
+                if entry["member_uuid"] == member_uuid and entry["scan_id"] in scans:
+                    found[entry["scan_id"]] = (scans[entry["scan_id"]], entry["screenshot_data"])
+        except Exception as e:
+            logger.warning(f"Archive {archive_path} could not be read for {member_uuid}: {str(e)}")
+    return found
+
+
+def read_archive(name, storage=None):
+    """Yield the archived rows (dicts) of one .ndjson.gz file"""
+    storage = storage or archive_storage()
+    with storage.open(name, "rb") as f, gzip.open(f, "rt") as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore_rows(entries, member_uuid=None):
+    """
+    Put archived rows back into OpteryScanHistory with their original
+    created_at / updated_at. Rows whose scan was synced again since (a live
+    row exists) are skipped. Returns (restored, skipped).
+    """
+    entries = [e for e in entries if member_uuid is None or e["member_uuid"] == member_uuid]
+    if not entries:
+        return 0, 0
+
+    live = set(OpteryScanHistory.objects.filter(
+        member_uuid__in={e["member_uuid"] for e in entries},
+        scan_id__in={e["scan_id"] for e in entries}
+    ).values_list("member_uuid", "scan_id"))
+    # Newest copy wins if a row was archived more than once
+    latest = {}
+    for entry in entries:
+        key = (entry["member_uuid"], entry["scan_id"])
+        if key not in live and (key not in latest or entry["updated_at"] >= latest[key]["updated_at"]):
+            latest[key] = entry
+
+    # The member may have been deleted since
+    member_ids = set(OpteryMember.objects.filter(
+        id__in={e.get("member_id") for e in latest.values() if e.get("member_id")}
+    ).values_list("id", flat=True))
+    rows = [
+        OpteryScanHistory(
+            member_uuid=entry["member_uuid"],
+            member_id=entry.get("member_id") if entry.get("member_id") in member_ids else None,
+            email=entry["email"],
+            scan_id=entry["scan_id"],
+            raw_scan_data=entry["scan_data"],
+            raw_screenshot_data=entry["screenshot_data"],
+            scan_fingerprint=entry.get("scan_fingerprint") or "",
+        )
+        for entry in latest.values()
+    ]
+    with transaction.atomic():
+        saved, errors = save_scan_history(rows)
+        for key, entry in latest.items():
+            if key[1] in errors:
+                continue
+            # bulk_create stamped both with the restore time
+            OpteryScanHistory.objects.filter(member_uuid=key[0], scan_id=key[1]).update(
+                created_at=parse_datetime(entry["created_at"]),
+                updated_at=parse_datetime(entry["updated_at"]),
+            )
+            OpteryArchivedScan.objects.filter(member_uuid=key[0], scan_id=key[1]).delete()
+
+    return len(rows) - len(errors), len(entries) - len(rows) + len(errors)
@@ -0,0 +1,67 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def sync_interval(plan):
+    """Time between background syncs for a plan (OPTERY_SYNC_INTERVALS, hours)"""
+    intervals = getattr(settings, "OPTERY_SYNC_INTERVALS", {})
+    hours = intervals.get((plan or "").lower(), getattr(settings, "OPTERY_SYNC_DEFAULT_INTERVAL", 24))
+    return timedelta(hours=hours)
+
+
+def next_sync_time(plan, now=None):
+    """Next sync one interval from now, +/-10% so members synced together drift apart"""
+    now = now or timezone.now()
+    interval = sync_interval(plan)
+    return now + interval * random.uniform(0.9, 1.1)
+
+
+def first_sync_time(created_at, postpone_scan, plan, now=None):
+    """
+    First sync for a member that has no next_sync_at yet. A new member waits
+    for its postponed first scan (postpone_scan minutes after creation);
+    older members are spread over one interval so a backlog doesn't sync at once.
+    """
+    now = now or timezone.now()
+    scan_ready_at = created_at + timedelta(minutes=postpone_scan or 0)
+    if scan_ready_at >= now - timedelta(seconds=getattr(settings, "OPTERY_SYNC_TICK_SECONDS", 300)):
+        return max(scan_ready_at, now)
+    return now + sync_interval(plan) * random.random()
+
+
+def _parse_hours(value):
+    try:
+        start, end = (int(part) for part in value.split("-"))
+        return start % 24, end % 24
+    except (AttributeError, ValueError):
+        logger.warning(f"Invalid OPTERY_SYNC_ACTIVE_HOURS '{value}', syncing around the clock")
+        return None
+
+
+def in_sync_window(now=None):
+    """
+    True if scheduled syncs may run now. OPTERY_SYNC_ACTIVE_HOURS is an
+    'start-end' hour range in local time (e.g. '22-6'); empty means always.
+    """
+    value = getattr(settings, "OPTERY_SYNC_ACTIVE_HOURS", "")
+    if not value:
+        return True
+    hours = _parse_hours(value)
+    if hours is None:
+        return True
+    start, end = hours
+    hour = timezone.localtime(now or timezone.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def enqueue_jitter():
+    """Countdown for one scheduled fetch, spreading a tick's jobs across the tick"""
+    return random.uniform(0, getattr(settings, "OPTERY_SYNC_TICK_SECONDS", 300))
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .members import invalidate_member
+from .models import OpteryMember
+
+
+@receiver(post_init, sender=OpteryMember)
+def remember_member_keys(sender, instance, **kwargs):
+    """Keep the loaded uuid/email so a change also drops the old directory entries"""
+    # __dict__ so deferred fields are not loaded
+    instance._directory_keys = (instance.__dict__.get("uuid"), instance.__dict__.get("email"))
+
+
+@receiver(post_save, sender=OpteryMember)
+def invalidate_member_on_save(sender, instance, **kwargs):
+    old_uuid, old_email = getattr(instance, "_directory_keys", (None, None))
+    invalidate_member(instance.uuid, instance.email)
+    if (old_uuid, old_email) != (instance.uuid, instance.email):
+        invalidate_member(old_uuid, old_email)
+    instance._directory_keys = (instance.uuid, instance.email)
+
+
+@receiver(post_delete, sender=OpteryMember)
+def invalidate_member_on_delete(sender, instance, **kwargs):
+    invalidate_member(instance.uuid, instance.email)
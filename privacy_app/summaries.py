@@ -0,0 +1,100 @@
+from django.conf import settings
+
+from .models import OpteryExposureSummary
+
+# Exposure status (lowercase) -> bucket; anything else counts as still exposed ("found").
+# Extended / overridden by settings.OPTERY_EXPOSURE_STATUSES.
+DEFAULT_EXPOSURE_STATUSES = {
+    "removed": "removed",
+    "completed": "removed",
+    "opted_out": "removed",
+    "deleted": "removed",
+    "pending": "pending",
+    "submitted": "pending",
+    "requested": "pending",
+    "removal_requested": "pending",
+    "in_progress": "pending",
+    "processing": "pending",
+}
+
+SUMMARY_FIELDS = [
+    "member_uuid", "scan_id", "scan_status", "brokers_total", "exposures_total",
+    "exposures_found", "exposures_pending", "exposures_removed", "updated_at",
+]
+
+BROKER_KEYS = ("broker", "broker_name", "data_broker", "site", "source")
+STATUS_KEYS = ("status", "removal_status", "optout_status")
+
+
+def first_value(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def exposure_items(screenshot_data):
+    """Exposure records of a screenshots payload (a list, or wrapped in a dict)"""
+    if isinstance(screenshot_data, list):
+        return [item for item in screenshot_data if isinstance(item, dict)]
+    if isinstance(screenshot_data, dict):
+        for key in ("screenshots", "data", "results", "items"):
+            if isinstance(screenshot_data.get(key), list):
+                return [item for item in screenshot_data[key] if isinstance(item, dict)]
+    return []
+
+
+def _scan_status(scan_data, scan_id):
+    for item in scan_data if isinstance(scan_data, list) else []:
+        if isinstance(item, dict) and str(item.get("scan_id")) == str(scan_id):
+            return str(item.get("status") or "")[:50]
+    return ""
+
+
+def build_exposure_summary(row, scan_data, screenshot_data):
+    """Unsaved OpteryExposureSummary for an OpteryScanHistory row and its decoded payloads"""
+    statuses = dict(DEFAULT_EXPOSURE_STATUSES)
+    statuses.update(getattr(settings, "OPTERY_EXPOSURE_STATUSES", {}))
+
+    counts = {"found": 0, "pending": 0, "removed": 0}
+    brokers = set()
+    items = exposure_items(screenshot_data)
+    for item in items:
+        broker = first_value(item, BROKER_KEYS)
+        if broker is not None:
+            brokers.add(str(broker).lower())
+        status = str(first_value(item, STATUS_KEYS) or "").lower()
+        counts[statuses.get(status, "found")] += 1
+
+    return OpteryExposureSummary(
+        member_uuid=row.member_uuid,
+        member_id=row.member_id,
+        scan_id=row.scan_id,
+        scan_status=_scan_status(scan_data, row.scan_id),
+        brokers_total=len(brokers),
+        exposures_total=len(items),
+        exposures_found=counts["found"],
+        exposures_pending=counts["pending"],
+        exposures_removed=counts["removed"],
+    )
+
+
+def save_exposure_summaries(summaries, batch_size=None):
+    """Upsert summaries on (member_uuid, scan_id); runs inside the caller's transaction"""
+    if not summaries:
+        return []
+    return OpteryExposureSummary.objects.bulk_create(
+        summaries,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["member_uuid", "scan_id"],
+        update_fields=[
+            "member", "scan_status", "brokers_total", "exposures_total",
+            "exposures_found", "exposures_pending", "exposures_removed", "updated_at",
+        ],
+    )
+
+
+def serialize_summary(summary):
+    return {field: getattr(summary, field) for field in SUMMARY_FIELDS}
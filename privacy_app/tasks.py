@@ -1,28 +1,38 @@
 import logging
 import requests
-from celery import shared_task
+from celery import Task, chord, group, shared_task
+from celery.exceptions import Ignore, Retry
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from .models import OpteryScanHistory, OpteryMember  # ✅ NEW: OpteryMember import করুন
+from .history import (
+    build_history_fallback, build_result_pointer, expand_result, is_fetch_error, load_stored_scans, save_scan_history,
+    scan_fingerprint
+)
+from .checkpoints import ScanCheckpoint, backoff_delay
+from . import custom_removals
+from .leases import LeaseHeartbeat, claim_fetch, release_lease, renew_lease
+from .members import get_member_by_uuid
+from .diffs import latest_scan_id, record_exposure_changes
+from .metrics import incr_metric
+from .idempotency import release_idempotency_key, store_idempotent_response
+from .onboarding import create_member
+from .result_cache import cache_result
+from .circuit import OpteryCircuitOpen, circuit_is_open
+from .optery_client import get_optery_config, get_connection_stats, optery_get
+from .ratelimit import OpteryRateLimited
+from .progress import incr_completed, publish_progress, push_partial, start_partial
+from .redis_client import get_redis
+from .retention import RETENTION_LOCK_KEY, archive_batch, load_archived_scans
+from .scheduler import enqueue_jitter, first_sync_time, in_sync_window, next_sync_time
+from .uploads import post_custom_removal
 import concurrent.futures
+import threading
 
 logger = logging.getLogger(__name__)
 
 
-def get_optery_config():
-    """Get Optery configuration"""
-    base_url = settings.OPTERY_BASE_URL
-    api_token = settings.OPTERY_API_KEY
-    
-    if not base_url or not api_token:
-        logger.error("Optery configuration missing")
-        raise ValueError("Optery API configuration not found")
-    
-    if not base_url.endswith('/'):
-        base_url += '/'
-    
-    return base_url, api_token
-
-
 def safe_json_parse(text, default=None):
     """Safely parse JSON"""
     if not text or not text.strip():
@@ -36,104 +46,248 @@ def safe_json_parse(text, default=None):
         return default
 
 
-@shared_task(bind=True, max_retries=2, default_retry_delay=60)
+def screenshot_error(status_code):
+    """Error marker for a non-200 screenshot response (5xx / 429 are retryable)"""
+    error = {"error": f"API returned {status_code}"}
+    if status_code >= 500 or status_code == 429:
+        error["retryable"] = True
+    return error
+
+
+def is_retryable_error(ss_res):
+    return is_fetch_error(ss_res) and bool(ss_res.get("retryable"))
+
+
+def fetch_screenshot(member_uuid, scan_id):
+    """Fetch screenshot for single scan"""
+    try:
+        ss_response = optery_get(
+            "screenshots",
+            f"v1/optouts/{member_uuid}/get-screenshots-by-scan/{scan_id}"
+        )
+        if ss_response.status_code == 200:
+            return safe_json_parse(ss_response.text, {})
+        return screenshot_error(ss_response.status_code)
+    except OpteryRateLimited as e:
+        # Limiter wait exceeded OPTERY_RATE_LIMIT_MAX_WAIT, retried with the other transient failures
+        logger.warning(f"Screenshot fetch deferred for scan {scan_id}: {str(e)}")
+        return {"error": "Rate limited", "retryable": True}
+    except OpteryCircuitOpen as e:
+        logger.warning(f"Screenshot fetch skipped for scan {scan_id}: {str(e)}")
+        return {"error": "Optery temporarily unavailable", "retryable": True}
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Screenshot fetch failed for scan {scan_id}: {str(e)}")
+        return {"error": "Failed to fetch screenshots", "retryable": True}
+
+
+def fetch_screenshots(member_uuid, scan_ids, on_result=None):
+    """
+    Fetch screenshots for all scans, results in the same order as scan_ids.
+    on_result(scan_id, ss_res) is called as each scan completes.
+    """
+    if getattr(settings, "OPTERY_FETCH_MODE", "threads") == "async":
+        from .optery_async import fetch_screenshots_async
+        return fetch_screenshots_async(member_uuid, scan_ids, on_result=on_result)
+
+    def fetch_one(scan_id):
+        ss_res = fetch_screenshot(member_uuid, scan_id)
+        if on_result:
+            on_result(scan_id, ss_res)
+        return ss_res
+
+    # reduced worker count to limit parallel outbound requests
+    max_workers = getattr(settings, "OPTERY_FETCH_THREADS", 3)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch_one, scan_ids))
+
+
+class ProgressReporter:
+    """
+    Thread-safe per-scan reporter for one task run: appends the finished entry
+    to the partial-result log and publishes 'screenshots fetched x/N'.
+    shared=True counts in Redis, for chunk subtasks reporting on one parent task.
+    """
+
+    def __init__(self, task_id, total, shared=False):
+        self.task_id = task_id
+        self.total = total
+        self.shared = shared
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, scan_id, ss_res):
+        push_partial(self.task_id, {"scan_id": scan_id, "screenshots": ss_res})
+        with self._lock:
+            self.completed += 1
+            completed = self.completed
+        if self.shared:
+            completed = incr_completed(self.task_id) or completed
+        publish_progress(
+            self.task_id, "screenshot_fetched",
+            scan_id=scan_id, completed=completed, total=self.total, ok=not is_fetch_error(ss_res)
+        )
+
+
+def get_scan_list(member_uuid, email):
+    """
+    Call get-scans for a member.
+    Returns (scan_res, None) on success or (None, error_result) for final errors;
+    raises on 5xx so the task retries.
+    """
+    try:
+        scan_response = optery_get("get-scans", f"v1/optouts/{member_uuid}/get-scans")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Scan API request failed: {str(e)}")
+        return None, {
+            "error": "Failed to connect to scan service",
+            "member_uuid": member_uuid,
+            "email": email if email else "Not provided"
+        }
+
+    if scan_response.status_code != 200:
+        logger.warning(f"Scan API returned status {scan_response.status_code}")
+        details = scan_response.text[:200]
+        # Retry on server errors (5xx), treat client errors (4xx) as final
+        if 500 <= scan_response.status_code < 600:
+            raise Exception(f"Scan service error {scan_response.status_code}: {details}")
+        return None, {
+            "error": f"Scan service returned error: {scan_response.status_code}",
+            "details": details,
+            "member_uuid": member_uuid,
+            "email": email
+        }
+
+    scan_res = safe_json_parse(scan_response.text, {})
+
+    # Handle API error responses
+    if isinstance(scan_res, dict) and scan_res.get("error"):
+        return None, {
+            "scan_api_error": scan_res.get("error"),
+            "raw": scan_res,
+            "member_uuid": member_uuid,
+            "email": email if email else "Not provided"
+        }
+
+    if not isinstance(scan_res, list):
+        return None, {
+            "scan_api_error": "Invalid scan response format",
+            "received_type": type(scan_res).__name__,
+            "member_uuid": member_uuid,
+            "email": email if email else "Not provided"
+        }
+
+    return scan_res, None
+
+
+def is_successful_result(result):
+    """True for task results that are safe to serve from the result cache"""
+    return isinstance(result, dict) and not ("error" in result or "scan_api_error" in result or result.get("stale"))
+
+
+class OpteryFetchTask(Task):
+    """
+    Holds the member's single-flight lease while running (heartbeat), caches
+    successful results and releases the lease once the task is done.
+    """
+    # Keyed by (task name, task_id): a chord callback runs under its parent's task_id
+    _heartbeats = {}
+
+    @staticmethod
+    def _member_uuid(args, kwargs):
+        return kwargs["member_uuid"] if "member_uuid" in kwargs else args[0]
+
+    def _stop_heartbeat(self, task_id):
+        heartbeat = self._heartbeats.pop((self.name, task_id), None)
+        if heartbeat:
+            heartbeat.stop()
+
+    def _keep_queued_lease(self, member_uuid, task_id):
+        # Keep the lease while the task waits in the queue so new submits still coalesce
+        renew_lease(member_uuid, task_id, getattr(settings, "OPTERY_LEASE_QUEUED_TTL", 600), takeover=False)
+
+    def before_start(self, task_id, args, kwargs):
+        member_uuid = self._member_uuid(args, kwargs)
+        self._stop_heartbeat(task_id)
+        self._heartbeats[(self.name, task_id)] = LeaseHeartbeat(member_uuid, task_id).start()
+
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        # after_return is not called for retries, stop the heartbeat here
+        self._stop_heartbeat(task_id)
+        self._keep_queued_lease(self._member_uuid(args, kwargs), task_id)
+        publish_progress(task_id, "retrying")
+
+    def on_replace(self, sig):
+        # Replaced by a chunk chord (Ignore, no after_return); its callback runs under this task_id and finishes up
+        self._stop_heartbeat(self.request.id)
+        self._keep_queued_lease(self._member_uuid(self.request.args, self.request.kwargs), self.request.id)
+        return super().on_replace(sig)
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        member_uuid = self._member_uuid(args, kwargs)
+        self._stop_heartbeat(task_id)
+
+        ScanCheckpoint(task_id).clear()
+        if status == "SUCCESS" and is_successful_result(retval):
+            cache_result(member_uuid, retval)
+            publish_progress(task_id, "done", status="success")
+        elif status == "SUCCESS" and isinstance(retval, dict) and retval.get("stale"):
+            # Served from stored history while Optery is down, not cached
+            publish_progress(task_id, "done", status="stale")
+        else:
+            if isinstance(retval, dict):
+                error = retval.get("error") or retval.get("scan_api_error")
+            else:
+                error = str(retval)
+            publish_progress(task_id, "failed", error=error)
+        release_lease(member_uuid, task_id)
+
+
+@shared_task(bind=True, base=OpteryFetchTask, max_retries=2, default_retry_delay=60)
 def fetch_optery_scans_background(self, member_uuid, email=None):
     """
     Background task to fetch Optery scans and screenshots
     Response structure same as before - frontend compatible
     """
     try:
-        optery_base, optery_token = get_optery_config()
+        get_optery_config()
         
-        # ✅ FIXED: Fetch email from OpteryMember with proper UUID handling
-        if not email or email == 'Not provided':
-            try:
-                # Try multiple approaches to find the member
-                member = None
-                
-                # Approach 1: Direct filter (works if types match)
-                member = OpteryMember.objects.filter(uuid=member_uuid).first()
-                
-                # Approach 2: If not found, try converting to UUID object
-                if not member:
-                    try:
-                        from uuid import UUID
-                        uuid_obj = UUID(member_uuid) if isinstance(member_uuid, str) else member_uuid
-                        member = OpteryMember.objects.filter(uuid=uuid_obj).first()
-                    except (ValueError, AttributeError) as e:
-                        logger.warning(f"UUID conversion failed: {str(e)}")
-                
-                # Approach 3: Search by string representation
-                if not member:
-                    member = OpteryMember.objects.filter(uuid__iexact=str(member_uuid)).first()
-                
-                if member and member.email:
-                    email = member.email
-                    logger.info(f"✅ Email found from OpteryMember: {email} for UUID: {member_uuid}")
-                else:
-                    logger.warning(f"❌ No OpteryMember found for UUID: {member_uuid}")
-                    # Debug: Show what's in database
-                    total_members = OpteryMember.objects.count()
-                    logger.info(f"Total OpteryMember records in DB: {total_members}")
-                    if total_members > 0:
-                        sample = OpteryMember.objects.first()
-                        logger.info(f"Sample record - UUID: {sample.uuid}, Email: {sample.email}")
-                    email = 'Not provided'
-                    
-            except Exception as e:
-                logger.error(f"❌ Error fetching email from OpteryMember: {str(e)}", exc_info=True)
-                email = 'Not provided'
-        
-        # ⚪ UNCHANGED: Rest of the code remains same
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"Bearer {optery_token}"
-        }
-
-        # STEP 1: Get scans with reasonable timeout for production
-        scan_url = f"{optery_base}v1/optouts/{member_uuid}/get-scans"
+        # Resolve the member (and email) through the member directory (cached, one indexed query on a miss)
+        member = None
         try:
-            scan_response = requests.get(scan_url, headers=headers, timeout=30)
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Scan API request failed: {str(e)}")
-            return {
-                "error": "Failed to connect to scan service",
-                "member_uuid": member_uuid,
-                "email": email if email else "Not provided"
-            }
+            member = get_member_by_uuid(member_uuid)
+        except Exception as e:
+            logger.error(f"❌ Error fetching OpteryMember: {str(e)}", exc_info=True)
+        member_id = member["id"] if member else None
 
-        if scan_response.status_code != 200:
-            logger.warning(f"Scan API returned status {scan_response.status_code}")
-            details = scan_response.text[:200]
-            # Retry on server errors (5xx), treat client errors (4xx) as final
-            if 500 <= scan_response.status_code < 600:
-                raise Exception(f"Scan service error {scan_response.status_code}: {details}")
-            return {
-                "error": f"Scan service returned error: {scan_response.status_code}",
-                "details": details,
-                "member_uuid": member_uuid,
-                "email": email
-            }
+        if not email or email == 'Not provided':
+            if member and member.get("email"):
+                email = member["email"]
+                logger.info(f"✅ Email found from OpteryMember: {email} for UUID: {member_uuid}")
+            else:
+                logger.warning(f"❌ No OpteryMember found for UUID: {member_uuid}")
+                email = 'Not provided'
         
-        scan_res = safe_json_parse(scan_response.text, {})
+        checkpoint = ScanCheckpoint(self.request.id).load()
 
-        # Handle API error responses
-        if isinstance(scan_res, dict) and scan_res.get("error"):
-            return {
-                "scan_api_error": scan_res.get("error"),
-                "raw": scan_res,
-                "member_uuid": member_uuid,
-                "email": email if email else "Not provided"
-            }
-        
-        if not isinstance(scan_res, list):
-            return {
-                "scan_api_error": "Invalid scan response format",
-                "received_type": type(scan_res).__name__,
-                "member_uuid": member_uuid,
-                "email": email if email else "Not provided"
-            }
+        # STEP 1: Get scans (a retry resumes from the checkpointed scan list)
+        scan_res = checkpoint.scans
+        if scan_res is not None:
+            logger.info(f"Resuming {member_uuid} from checkpoint ({len(checkpoint.done)} scans already saved)")
+        else:
+            try:
+                scan_res, error_result = get_scan_list(member_uuid, email)
+            except OpteryCircuitOpen as e:
+                # Optery is down: answer from stored history instead of burning retries
+                logger.warning(f"Serving stored history for {member_uuid}: {str(e)}")
+                return build_history_fallback(member_uuid, email if email != 'Not provided' else None) or {
+                    "error": "Optery is temporarily unavailable",
+                    "retry_after": round(e.retry_after, 1),
+                    "member_uuid": member_uuid,
+                    "email": email if email else "Not provided"
+                }
+            if error_result:
+                return error_result
+            checkpoint.save_scans(scan_res)
 
         # Collect scan IDs
         scan_ids = []
@@ -149,49 +303,121 @@ def fetch_optery_scans_background(self, member_uuid, email=None):
                 "scans": scan_res
             }
 
-        # STEP 2: Parallel fetch screenshots
-        def fetch_single_screenshot(scan_id):
-            """Fetch screenshot for single scan"""
-            ss_url = f"{optery_base}v1/optouts/{member_uuid}/get-screenshots-by-scan/{scan_id}"
-            try:
-                # shorter per-request timeout to keep task runtime bounded
-                ss_response = requests.get(ss_url, headers=headers, timeout=30)
-                if ss_response.status_code == 200:
-                    ss_res = safe_json_parse(ss_response.text, {})
-                else:
-                    ss_res = {"error": f"API returned {ss_response.status_code}"}
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Screenshot fetch failed for scan {scan_id}: {str(e)}")
-                ss_res = {"error": "Failed to fetch screenshots"}
-
-            # ✅ UPDATED: Save with proper email from OpteryMember
-            try:
-                OpteryScanHistory.objects.create(
-                    member_uuid=member_uuid,
-                    email=email,  # Now this will be actual email from OpteryMember
-                    scan_id=scan_id,
-                    raw_scan_data=scan_res,
-                    raw_screenshot_data=ss_res
-                )
-                logger.info(f"Saved scan history for {email} - scan_id: {scan_id}")  # ✅ NEW: Log success
-            except Exception as e:
-                logger.error(f"DB save failed for scan {scan_id}: {str(e)}", exc_info=True)
-                # Raising here will surface the exception to the ThreadPoolExecutor
-                # and cause the main task to hit the outer except and retry/fail.
-                raise
+        # STEP 2: Incremental sync - only fetch screenshots for new/changed scans
+        fingerprints = {}
+        for item in scan_res:
+            if isinstance(item, dict) and item.get("scan_id"):
+                fingerprints[str(item.get("scan_id"))] = scan_fingerprint(item)
 
-            return {
+        stored = {}
+        if getattr(settings, "OPTERY_INCREMENTAL_SYNC", True):
+            stored = load_stored_scans(member_uuid, scan_ids)
+            # Unchanged scans the retention job archived are read back from their archive files
+            stored.update(load_archived_scans(member_uuid, [s for s in scan_ids if s not in stored], fingerprints))
+        elif checkpoint.done:
+            # Full sync retry: scans saved by an earlier attempt are not fetched again
+            stored = load_stored_scans(member_uuid, list(checkpoint.done))
+
+        to_fetch = [
+            scan_id for scan_id in dict.fromkeys(scan_ids)
+            if scan_id not in stored
+            or stored[scan_id][0] != fingerprints[scan_id]
+            or is_fetch_error(stored[scan_id][1])
+        ]
+
+        # Scans that failed in an earlier attempt wait for their own backoff
+        final_attempt = self.request.retries >= self.max_retries
+        deferred = [] if final_attempt else [s for s in to_fetch if not checkpoint.is_due(s)]
+        to_fetch = [s for s in to_fetch if s not in deferred]
+
+        logger.info(f"Sync for {member_uuid}: {len(to_fetch)}/{len(scan_ids)} scans need screenshots ({len(deferred)} deferred)")
+        publish_progress(self.request.id, "scans_listed", scans=len(scan_ids), to_fetch=len(to_fetch))
+        # Unchanged scans are available right away for progressive status polls
+        start_partial(self.request.id, scan_res, len(set(scan_ids)), [
+            {"scan_id": scan_id, "screenshots": stored[scan_id][1]}
+            for scan_id in dict.fromkeys(scan_ids)
+            if scan_id in stored and scan_id not in to_fetch and scan_id not in deferred
+        ])
+
+        # Very large members: fan out chunk subtasks across workers, the chord
+        # callback (same task_id) builds the result
+        threshold = getattr(settings, "OPTERY_CHORD_THRESHOLD", 100)
+        if threshold and len(to_fetch) + len(deferred) >= threshold:
+            chunk_size = getattr(settings, "OPTERY_CHORD_CHUNK_SIZE", 25)
+            fan_out = to_fetch + deferred
+            chunks = [fan_out[i:i + chunk_size] for i in range(0, len(fan_out), chunk_size)]
+            logger.info(f"Fanning out {len(fan_out)} scans for {member_uuid} in {len(chunks)} chunks")
+            publish_progress(self.request.id, "fanned_out", chunks=len(chunks))
+            return self.replace(chord(
+                group(
+                    fetch_screenshot_chunk.s(member_uuid, email, chunk, self.request.id, len(fan_out))
+                    for chunk in chunks
+                ),
+                assemble_optery_fetch.s(member_uuid=member_uuid, email=email, scan_ids=scan_ids)
+            ))
+
+        # Parallel fetch screenshots (thread pool or asyncio, see OPTERY_FETCH_MODE)
+        fetched = {}
+        if to_fetch:
+            reporter = ProgressReporter(self.request.id, len(to_fetch))
+            fetched = dict(zip(to_fetch, fetch_screenshots(member_uuid, to_fetch, on_result=reporter)))
+
+        # Transient failures (5xx / connection) are retried per scan_id with backoff
+        pending = list(deferred)
+        max_attempts = getattr(settings, "OPTERY_SCAN_MAX_ATTEMPTS", 3)
+        for scan_id in to_fetch:
+            if is_retryable_error(fetched[scan_id]):
+                attempts = checkpoint.mark_failed(scan_id)
+                if not final_attempt and attempts < max_attempts:
+                    pending.append(scan_id)
+
+        # STEP 3: Upsert history rows for fetched scans in one transaction
+        rows = [
+            OpteryScanHistory(
+                member_uuid=member_uuid,
+                member_id=member_id,
+                email=email,  # Now this will be actual email from OpteryMember
+                scan_id=scan_id,
+                raw_scan_data=scan_res,
+                raw_screenshot_data=fetched[scan_id],
+                scan_fingerprint=fingerprints[scan_id]
+            )
+            for scan_id in to_fetch if scan_id not in pending
+        ]
+        saved_rows, save_errors = save_scan_history(rows)
+        logger.info(f"Saved {len(saved_rows)}/{len(rows)} scan history rows for {email}")
+        checkpoint.mark_done(row.scan_id for row in rows if row.scan_id not in save_errors)
+
+        if pending:
+            countdown = checkpoint.retry_delay(pending)
+            logger.info(f"Retrying {len(pending)} scans for {member_uuid} in {countdown}s")
+            raise self.retry(countdown=countdown)
+
+        ss_results = [
+            fetched[scan_id] if scan_id in fetched else stored[scan_id][1]
+            for scan_id in scan_ids
+        ]
+
+        # STEP 4: Diff the newest scan against the member's previous one
+        latest = latest_scan_id(scan_res)
+        if latest is not None and latest not in save_errors:
+            ingest_exposure_changes(member_uuid, member_id, latest, ss_results[scan_ids.index(latest)])
+
+        screenshots = []
+        for scan_id, ss_res in zip(scan_ids, ss_results):
+            entry = {
                 "scan_id": scan_id,
                 "screenshots": ss_res
             }
+            if scan_id in save_errors:
+                entry["save_error"] = "Failed to save scan history"
+            screenshots.append(entry)
 
-        # Parallel processing with ThreadPoolExecutor
-        screenshots = []
-        # reduced worker count to limit parallel outbound requests
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            screenshot_results = list(executor.map(fetch_single_screenshot, scan_ids))
-        
-        screenshots = screenshot_results
+        logger.info(f"Optery connection stats: {get_connection_stats()}")
+
+        if getattr(settings, "OPTERY_TASK_RESULT_MODE", "pointer") == "pointer":
+            # Result backend only keeps a small pointer, the status endpoint rebuilds the response
+            return build_result_pointer(member_uuid, email if email else "Not provided", scan_res, scan_ids, screenshots)
 
         # Return exact same structure as before
         return {
@@ -202,14 +428,349 @@ def fetch_optery_scans_background(self, member_uuid, email=None):
             "message": "Data fetched successfully"
         }
 
+    except (Retry, Ignore):
+        raise
+    except OpteryRateLimited as e:
+        logger.warning(f"Rate limited while syncing {member_uuid}: {str(e)}")
+        try:
+            raise self.retry(exc=e, countdown=max(1, int(e.retry_after)))
+        except self.MaxRetriesExceededError:
+            return {
+                "error": "Maximum retries exceeded",
+                "details": str(e),
+                "member_uuid": member_uuid
+            }
     except Exception as e:
         logger.error(f"Task failed for {member_uuid}: {str(e)}", exc_info=True)
-        # Retry the task
+        # Retry the task, resuming from its checkpoint
         try:
-            raise self.retry(exc=e, countdown=60)
+            raise self.retry(exc=e, countdown=int(backoff_delay(self.request.retries + 1)))
         except self.MaxRetriesExceededError:
             return {
                 "error": "Maximum retries exceeded",
                 "details": str(e),
                 "member_uuid": member_uuid
-            }
\ No newline at end of file
+            }
+
+
+def ingest_exposure_changes(member_uuid, member_id, scan_id, screenshot_data):
+    """Store the scan-to-scan delta; a failure is logged and caught up by the next sync"""
+    try:
+        changes = record_exposure_changes(member_uuid, member_id, scan_id, screenshot_data)
+        if changes:
+            incr_metric("diff.changes", changes)
+    except Exception as e:
+        logger.error(f"Exposure diff failed for {member_uuid} scan {scan_id}: {str(e)}", exc_info=True)
+
+
+@shared_task(bind=True, max_retries=2)
+def fetch_screenshot_chunk(self, member_uuid, email, scan_ids, parent_id, total):
+    """
+    Chord header task: fetch and save screenshots for one chunk of a large
+    member's scans. The scan list comes from the parent's checkpoint; failed
+    scans are retried per chunk with backoff. Returns only the entries that
+    could not be saved, the callback reads everything else from history.
+    """
+    queued_ttl = getattr(settings, "OPTERY_LEASE_QUEUED_TTL", 600)
+    # The parent's lease must outlive the whole fan-out
+    renew_lease(member_uuid, parent_id, queued_ttl)
+
+    checkpoint = ScanCheckpoint(parent_id).load()
+    scan_res = checkpoint.scans or []
+    fingerprints = {
+        str(item.get("scan_id")): scan_fingerprint(item)
+        for item in scan_res if isinstance(item, dict) and item.get("scan_id")
+    }
+    todo = [scan_id for scan_id in scan_ids if scan_id not in checkpoint.done]
+
+    try:
+        member = get_member_by_uuid(member_uuid)
+        reporter = ProgressReporter(parent_id, total, shared=True)
+        fetched = dict(zip(todo, fetch_screenshots(member_uuid, todo, on_result=reporter)))
+
+        final_attempt = self.request.retries >= self.max_retries
+        max_attempts = getattr(settings, "OPTERY_SCAN_MAX_ATTEMPTS", 3)
+        pending = []
+        for scan_id in todo:
+            if is_retryable_error(fetched[scan_id]):
+                attempts = checkpoint.mark_failed(scan_id)
+                if not final_attempt and attempts < max_attempts:
+                    pending.append(scan_id)
+
+        rows = [
+            OpteryScanHistory(
+                member_uuid=member_uuid,
+                member_id=member["id"] if member else None,
+                email=email,
+                scan_id=scan_id,
+                raw_scan_data=scan_res,
+                raw_screenshot_data=fetched[scan_id],
+                scan_fingerprint=fingerprints.get(scan_id, "")
+            )
+            for scan_id in todo if scan_id not in pending
+        ]
+        saved_rows, save_errors = save_scan_history(rows)
+        checkpoint.mark_done(row.scan_id for row in rows if row.scan_id not in save_errors)
+        renew_lease(member_uuid, parent_id, queued_ttl)
+
+        if pending:
+            raise self.retry(countdown=checkpoint.retry_delay(pending))
+
+        return {"unsaved": [
+            {"scan_id": scan_id, "screenshots": fetched[scan_id], "save_error": "Failed to save scan history"}
+            for scan_id in save_errors
+        ]}
+
+    except Retry:
+        raise
+    except Exception as e:
+        logger.error(f"Screenshot chunk failed for {member_uuid}: {str(e)}", exc_info=True)
+        try:
+            raise self.retry(exc=e, countdown=int(backoff_delay(self.request.retries + 1)))
+        except self.MaxRetriesExceededError:
+            # Never fail the chord: report the chunk's scans as unsaved errors
+            return {"unsaved": [
+                {
+                    "scan_id": scan_id,
+                    "screenshots": {"error": "Failed to fetch screenshots"},
+                    "save_error": "Failed to save scan history"
+                }
+                for scan_id in todo
+            ]}
+
+
+@shared_task(bind=True, base=OpteryFetchTask)
+def assemble_optery_fetch(self, chunk_results, member_uuid, email, scan_ids):
+    """
+    Chord callback for a fanned-out fetch. Runs under the original task_id,
+    so status polls, the lease and the result cache work as for a single task.
+    """
+    checkpoint = ScanCheckpoint(self.request.id).load()
+    unsaved = [entry for result in chunk_results or [] for entry in result.get("unsaved", [])]
+    email = email if email else "Not provided"
+
+    latest = latest_scan_id(checkpoint.scans or [])
+    if latest is not None and latest not in {entry["scan_id"] for entry in unsaved}:
+        stored = load_stored_scans(member_uuid, [latest])
+        if latest in stored:
+            member = get_member_by_uuid(member_uuid)
+            ingest_exposure_changes(member_uuid, member["id"] if member else None, latest, stored[latest][1])
+    pointer = build_result_pointer(member_uuid, email, checkpoint.scans or [], scan_ids, unsaved)
+
+    logger.info(f"Assembled fanned-out fetch for {member_uuid}: {len(scan_ids)} scans, {len(unsaved)} unsaved")
+    if getattr(settings, "OPTERY_TASK_RESULT_MODE", "pointer") == "pointer":
+        return pointer
+    return expand_result(pointer)
+
+
+@shared_task(ignore_result=True)
+def schedule_optery_syncs():
+    """
+    Beat task: enqueue background syncs for members whose next_sync_at is due.
+    At most OPTERY_SYNC_MAX_PER_TICK members per run, oldest first, with each
+    enqueue delayed by a random countdown so the jobs spread across the tick.
+    """
+    if not in_sync_window():
+        return {"enqueued": 0, "skipped": "outside OPTERY_SYNC_ACTIVE_HOURS"}
+    if circuit_is_open():
+        logger.warning("Optery circuit is open, postponing scheduled syncs")
+        return {"enqueued": 0, "skipped": "circuit open"}
+
+    now = timezone.now()
+    batch_size = getattr(settings, "OPTERY_SYNC_BATCH_SIZE", 200)
+    max_per_tick = getattr(settings, "OPTERY_SYNC_MAX_PER_TICK", 100)
+    members = OpteryMember.objects.filter(is_success=True, uuid__isnull=False)
+
+    # Members without a schedule yet (new, or created before the scheduler existed)
+    unscheduled = list(
+        members.filter(next_sync_at__isnull=True).only("id", "created_at", "postpone_scan", "plan")[:batch_size]
+    )
+    for member in unscheduled:
+        member.next_sync_at = first_sync_time(member.created_at, member.postpone_scan, member.plan, now)
+    OpteryMember.objects.bulk_update(unscheduled, ["next_sync_at"], batch_size=batch_size)
+
+    due = list(
+        members.filter(next_sync_at__lte=now).order_by("next_sync_at").only("id", "uuid", "email", "plan")[:max_per_tick]
+    )
+    enqueued = coalesced = failed = 0
+    for start in range(0, len(due), batch_size):
+        rescheduled = []
+        for member in due[start:start + batch_size]:
+            member_uuid = str(member.uuid)
+            task_id, is_new = claim_fetch(member_uuid)
+            if is_new:
+                try:
+                    fetch_optery_scans_background.apply_async(
+                        args=(member_uuid, member.email), task_id=task_id, countdown=enqueue_jitter()
+                    )
+                    enqueued += 1
+                except Exception as e:
+                    # Stays due, picked up again next tick
+                    logger.error(f"Scheduled sync enqueue failed for {member_uuid}: {str(e)}")
+                    release_lease(member_uuid, task_id)
+                    failed += 1
+                    continue
+            else:
+                coalesced += 1
+            member.next_sync_at = next_sync_time(member.plan, now)
+            rescheduled.append(member)
+        OpteryMember.objects.bulk_update(rescheduled, ["next_sync_at"])
+
+    incr_metric("scheduler.enqueued", enqueued)
+    incr_metric("scheduler.coalesced", coalesced)
+    logger.info(
+        f"Scheduled syncs: {enqueued} enqueued, {coalesced} already running, {failed} failed, "
+        f"{len(unscheduled)} newly scheduled"
+    )
+    return {"enqueued": enqueued, "coalesced": coalesced, "failed": failed, "initialized": len(unscheduled)}
+
+
+@shared_task(bind=True, max_retries=3)
+def submit_custom_removal(self, member_uuid, data, storage_path, filename, content_type):
+    """
+    Async hand-off for CustomRemovalCreateView: stream a stashed proof file to
+    Optery, retrying on 5xx / 429 / connection errors, then delete the stash.
+    Returns {"status_code", "response"} as the view would have answered.
+    """
+    try:
+        with default_storage.open(storage_path, "rb") as fileobj:
+            api_res = post_custom_removal(member_uuid, data, filename, fileobj, content_type)
+        if api_res.status_code >= 500 or api_res.status_code == 429:
+            raise Exception(f"Custom removal API returned {api_res.status_code}")
+        result = {"status_code": api_res.status_code, "response": safe_json_parse(api_res.text, {})}
+        if api_res.status_code in (200, 201):
+            custom_removals.invalidate(member_uuid)
+    except Exception as e:
+        if isinstance(e, (OpteryCircuitOpen, OpteryRateLimited)):
+            countdown = e.retry_after
+        else:
+            countdown = backoff_delay(self.request.retries + 1)
+        logger.error(f"Custom removal upload failed for {member_uuid}: {str(e)}")
+        try:
+            raise self.retry(exc=e, countdown=max(1, int(countdown)))
+        except self.MaxRetriesExceededError:
+            result = {"status_code": 503, "response": {"error": "Failed to create custom removal"}}
+
+    try:
+        default_storage.delete(storage_path)
+    except Exception as e:
+        logger.warning(f"Could not delete stashed upload {storage_path}: {str(e)}")
+    return result
+
+
+@shared_task(bind=True, max_retries=3)
+def create_optery_member(self, validated_data, idempotency_scope=None):
+    """
+    Async hand-off for CreateOpteryMember. Only failures where Optery cannot
+    have created the member (limiter / breaker rejections, connection errors,
+    429 / 503) are retried, so a retry never adds a duplicate upstream.
+    Returns {"status_code", "response"} as the view would have answered; with
+    an Idempotency-Key the same response is stored for repeated submissions,
+    or the key is released when retries ran out and nothing was created.
+    """
+    countdown = None
+    try:
+        status_code, response = create_member(validated_data)
+        if status_code in (429, 503):
+            countdown = backoff_delay(self.request.retries + 1)
+    except (OpteryCircuitOpen, OpteryRateLimited) as e:
+        status_code, response = 503, {"success": False, "error": "Optery temporarily unavailable"}
+        countdown = e.retry_after
+    except requests.exceptions.ConnectionError as e:
+        logger.error(f"Create member: Optery unreachable: {str(e)}")
+        status_code, response = 503, {"success": False, "error": "Failed to reach Optery"}
+        countdown = backoff_delay(self.request.retries + 1)
+    except requests.exceptions.Timeout:
+        # Optery may still have created the member, so this is final
+        status_code, response = 504, {"success": False, "error": "Request timeout"}
+    except Exception as e:
+        logger.error(f"Create member error: {str(e)}", exc_info=True)
+        status_code, response = 500, {"success": False, "error": str(e)}
+
+    if countdown is not None:
+        try:
+            raise self.retry(countdown=max(1, int(countdown)))
+        except self.MaxRetriesExceededError:
+            logger.error(f"Create member gave up after {self.request.retries} retries ({status_code})")
+
+    if idempotency_scope:
+        if countdown is not None:
+            # Nothing was created, let the client retry with the same key
+            release_idempotency_key(idempotency_scope, self.request.id)
+        else:
+            store_idempotent_response(idempotency_scope, self.request.id, status_code, response)
+    return {"status_code": status_code, "response": response}
+
+
+@shared_task(ignore_result=True)
+def refresh_custom_removals(member_uuid):
+    """Background revalidation of a member's cached custom-removals list"""
+    try:
+        response, _, entry = custom_removals.fetch_custom_removals(member_uuid)
+        if entry is None:
+            logger.warning(f"Custom removals refresh for {member_uuid} returned {response.status_code}")
+    except Exception as e:
+        # The cached copy keeps being served
+        logger.warning(f"Custom removals refresh failed for {member_uuid}: {str(e)}")
+    finally:
+        custom_removals.release_refresh(member_uuid)
+
+
+@shared_task(ignore_result=True)
+def refresh_hot_custom_removals():
+    """
+    Beat task: keep the most-read members' custom-removals lists warm, so their
+    reads stay cache hits. Only entries past half their freshness are refreshed.
+    """
+    limit = getattr(settings, "OPTERY_CUSTOM_REMOVALS_HOT_MEMBERS", 50)
+    fresh_ttl = getattr(settings, "OPTERY_CUSTOM_REMOVALS_FRESH_TTL", 300)
+    queued = 0
+    for member_uuid in custom_removals.pop_hot_members(limit):
+        entry = custom_removals.get_entry(member_uuid)
+        if entry is not None and custom_removals.entry_age(entry) < fresh_ttl / 2:
+            continue
+        if custom_removals.claim_refresh(member_uuid):
+            refresh_custom_removals.delay(member_uuid)
+            queued += 1
+    logger.info(f"Queued custom removals refresh for {queued} hot members")
+    return queued
+
+
+@shared_task(ignore_result=True)
+def archive_scan_history():
+    """
+    Beat task: keep the newest OPTERY_HISTORY_RETENTION_KEEP history rows per
+    member and move older ones to compressed archives, at most
+    OPTERY_HISTORY_RETENTION_MAX_BATCHES batches per run.
+    """
+    if not getattr(settings, "OPTERY_HISTORY_RETENTION_ENABLED", True):
+        return {"archived": 0, "skipped": "disabled"}
+
+    keep = getattr(settings, "OPTERY_HISTORY_RETENTION_KEEP", 20)
+    batch_size = getattr(settings, "OPTERY_HISTORY_RETENTION_BATCH_SIZE", 500)
+    max_batches = getattr(settings, "OPTERY_HISTORY_RETENTION_MAX_BATCHES", 20)
+
+    # One run at a time, even if a run outlasts the beat interval
+    try:
+        if not get_redis().set(RETENTION_LOCK_KEY, 1, nx=True, ex=getattr(settings, "CELERY_TASK_TIME_LIMIT", 18 * 60)):
+            return {"archived": 0, "skipped": "already running"}
+    except Exception as e:
+        logger.warning(f"Retention lock unavailable, running anyway: {str(e)}")
+
+    archived = 0
+    try:
+        for _ in range(max_batches):
+            count = archive_batch(keep, batch_size)
+            archived += count
+            if count < batch_size:
+                break
+    finally:
+        try:
+            get_redis().delete(RETENTION_LOCK_KEY)
+        except Exception as e:
+            logger.warning(f"Retention lock release failed: {str(e)}")
+
+    if archived:
+        incr_metric("retention.archived", archived)
+    logger.info(f"Retention: archived {archived} scan history rows (keeping {keep} per member)")
+    return {"archived": archived}
@@ -1,3 +1,455 @@
-from django.test import TestCase
+import asyncio
+import concurrent.futures
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from celery.backends.cache import CacheBackend
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.db import DataError, OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+import requests
+from rest_framework.test import APIClient, APIRequestFactory
+
+from AJAXX_Privacy_web.celery import app as celery_app
+
+from .history import build_history_fallback, build_result_pointer, expand_result, load_stored_scans, save_scan_history
+from .idempotency import claim_idempotency_key, request_fingerprint
+from .inflight import OpteryBusy, acquire_slot, release_slot
+from .leases import LeaseHeartbeat, claim_fetch
+from .progress import get_partial, push_partial, start_partial
+from .management.commands.benchmark_optery_fetch import FakeOpteryHandler, FakeOpteryServer
+from .models import OpteryArchivedScan, OpteryExposureSummary, OpteryMember, OpteryPayloadBlob, OpteryScanHistory
+from .retention import archive_batch, load_archived_scans, read_archive, restore_rows
+from .onboarding import onboard_members
+from .optery_async import gather_screenshots
+from .tasks import OpteryFetchTask, create_optery_member, fetch_optery_scans_background
+from .views import CreateOpteryMember, CustomRemovalCreateView
+
+
+class FakeRedisTestCase(TestCase):
+    """Points get_redis() at an in-process fakeredis"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        patcher = mock.patch("privacy_app.redis_client._client", self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    OPTERY_LEASE_TTL=3,
+)
+class LeaseRetryTests(FakeRedisTestCase):
+
+    def test_retry_stops_heartbeat_and_releases_lease(self):
+        member_uuid = "member-1"
+        task_id, is_new = claim_fetch(member_uuid)
+        self.assertTrue(is_new)
+
+        heartbeats = []
+
+        def track(*args):
+            heartbeats.append(LeaseHeartbeat(*args))
+            return heartbeats[-1]
+
+        scans = [{"scan_id": "1", "status": "completed"}]
+        with mock.patch("privacy_app.tasks.LeaseHeartbeat", side_effect=track), \
+                mock.patch("privacy_app.tasks.get_member_by_uuid", return_value=None), \
+                mock.patch("privacy_app.tasks.get_scan_list", return_value=(scans, None)), \
+                mock.patch("privacy_app.tasks.fetch_screenshots", side_effect=[Exception("boom"), [[]]]):
+            result = fetch_optery_scans_background.apply(
+                args=(member_uuid, "member@example.com"), task_id=task_id
+            ).get()
+
+        self.assertNotIn("error", result)
+        self.assertEqual(len(heartbeats), 2)
+        self.assertFalse(any(heartbeat._thread.is_alive() for heartbeat in heartbeats))
+        self.assertEqual(OpteryFetchTask._heartbeats, {})
+        self.assertIsNone(self.redis.get(f"optery:lease:{member_uuid}"))
+        self.assertEqual(claim_fetch(member_uuid)[1], True)
+
+
+class SaveScanHistoryTests(TestCase):
+    def test_bad_row_falls_back_to_per_row_saves(self):
+        rows = [
+            OpteryScanHistory(
+                member_uuid="member-1", email="member@example.com", scan_id=scan_id,
+                raw_scan_data=[{"scan_id": scan_id}], raw_screenshot_data=[{"broker": "b", "scan": scan_id}],
+            )
+            for scan_id in ("1", "2", "3")
+        ]
+        # NOT NULL violation: sinks the bulk upsert, then only its own savepoint
+        rows[1].email = None
+
+        saved, errors = save_scan_history(rows)
+
+        self.assertEqual([row.scan_id for row in saved], ["1", "3"])
+        self.assertEqual(list(errors), ["2"])
+        stored = load_stored_scans("member-1", ["1", "2", "3"])
+        self.assertEqual(sorted(stored), ["1", "3"])
+        self.assertEqual(stored["3"][1], [{"broker": "b", "scan": "3"}])
+        # Blobs of the failed row were rolled back with it
+        self.assertEqual(OpteryPayloadBlob.objects.count(), 4)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name)
+
+    def _sync(self, listed, scan_ids):
+        scan_res = [{"scan_id": scan_id} for scan_id in listed]
+        save_scan_history([
+            OpteryScanHistory(
+                member_uuid="member-1", email="member@example.com", scan_id=scan_id,
+                raw_scan_data=scan_res, raw_screenshot_data=[{"broker": "b", "scan": scan_id}],
+            )
+            for scan_id in scan_ids
+        ])
+
+    def test_archives_rows_beyond_keep(self):
+        scan_ids = ["1", "2", "3", "4", "5"]
+        self._sync(scan_ids, scan_ids)
+        self.assertEqual(archive_batch(2, 2, self.storage), 2)
+        self.assertEqual(archive_batch(2, 100, self.storage), 1)
+        self.assertEqual(archive_batch(2, 100, self.storage), 0)
+        self.assertEqual(set(OpteryScanHistory.objects.values_list("scan_id", flat=True)), {"4", "5"})
+
+    def test_archived_scans_are_served_from_the_archive(self):
+        scan_ids = ["1", "2", "3"]
+        self._sync(scan_ids, scan_ids)
+        fingerprints = dict(OpteryScanHistory.objects.values_list("scan_id", "scan_fingerprint"))
+        pointer = build_result_pointer("member-1", "member@example.com", [], scan_ids, [])
+        archive_batch(1, 100, self.storage)
+
+        with override_settings(OPTERY_HISTORY_ARCHIVE_DIR=self.storage.location):
+            archived = load_archived_scans("member-1", ["1", "2"], {"1": fingerprints["1"], "2": "changed"})
+            result = expand_result(pointer)
+        self.assertEqual(archived, {"1": (fingerprints["1"], [{"broker": "b", "scan": "1"}])})
+        self.assertEqual(
+            [entry["screenshots"] for entry in result["screenshots"]],
+            [[{"broker": "b", "scan": scan_id}] for scan_id in scan_ids]
+        )
+
+    def test_restore_keeps_timestamps_and_latest_scan_list(self):
+        self._sync(["1", "2", "3", "4", "5"], ["1", "2", "3", "4", "5"])
+        self._sync(["4", "5"], ["4", "5"])
+        original = dict(OpteryScanHistory.objects.values_list("scan_id", "updated_at"))
+        self.assertEqual(archive_batch(2, 100, self.storage), 3)
+
+        names = set(OpteryArchivedScan.objects.values_list("archive_path", flat=True))
+        entries = [entry for name in names for entry in read_archive(name, self.storage)]
+        self.assertEqual(restore_rows(entries), (3, 0))
+
+        restored = dict(OpteryScanHistory.objects.values_list("scan_id", "updated_at"))
+        self.assertEqual(restored, original)
+        fallback = build_history_fallback("member-1")
+        self.assertEqual([scan["scan_id"] for scan in fallback["scans"]], ["4", "5"])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    OPTERY_TASK_RESULT_MODE="full",
+)
+class ArchivedScanSyncTests(FakeRedisTestCase):
+    def test_sync_serves_unchanged_archived_scans(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        scans = [{"scan_id": scan_id} for scan_id in ("1", "2", "3")]
+        screenshots = [[{"broker": "b", "scan": scan["scan_id"]}] for scan in scans]
+
+        with override_settings(OPTERY_HISTORY_ARCHIVE_DIR=directory.name), \
+                mock.patch("privacy_app.tasks.get_member_by_uuid", return_value=None), \
+                mock.patch("privacy_app.tasks.get_scan_list", return_value=(scans, None)), \
+                mock.patch("privacy_app.tasks.fetch_screenshots", return_value=screenshots) as fetch:
+            fetch_optery_scans_background.apply(args=("member-1", "member@example.com")).get()
+            self.assertEqual(archive_batch(1, 100), 2)
+            result = fetch_optery_scans_background.apply(args=("member-1", "member@example.com")).get()
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual([entry["screenshots"] for entry in result["screenshots"]], screenshots)
+
+
+class ExposureSummaryViewTests(TestCase):
+    def test_latest_is_newest_scan_not_last_updated(self):
+        older = OpteryExposureSummary.objects.create(member_uuid="member-1", scan_id="1")
+        OpteryExposureSummary.objects.create(member_uuid="member-1", scan_id="2")
+        # An incremental sync re-upserts the old scan after its fingerprint changed
+        older.exposures_total = 3
+        older.save()
+
+        response = APIClient().get(reverse("optery-exposure-summary"), {"member_uuid": "member-1"})
+        self.assertEqual(response.data["latest"]["scan_id"], "2")
+        self.assertEqual([scan["scan_id"] for scan in response.data["scans"]], ["2", "1"])
+
+
+class BulkCreateOpteryMembersTests(TestCase):
+    def test_requires_admin(self):
+        client = APIClient()
+        url = reverse("bulk_create_optery_members")
+        self.assertIn(client.post(url, [], format="json").status_code, (401, 403))
+
+        user = get_user_model().objects.create_user(email="member@example.com", password="x")
+        client.force_authenticate(user)
+        self.assertEqual(client.post(url, [], format="json").status_code, 403)
+
+    @override_settings(OPTERY_BULK_MEMBER_MAX_ROWS=2)
+    def test_row_cap(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(email="admin@example.com", password="x", is_staff=True))
+        response = client.post(reverse("bulk_create_optery_members"), [{}, {}, {}], format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class OnboardMembersTests(TestCase):
+    rows = [
+        {"email": f"member{i}@example.com", "first_name": "A", "last_name": "B", "plan": "basic"}
+        for i in range(3)
+    ]
+
+    def _created(self, *args, **kwargs):
+        email = kwargs["json"]["email"]
+        return mock.Mock(status_code=201, json=lambda: {"uuid": f"00000000-0000-0000-0000-00000000000{email[6]}"})
+
+    def test_timeout_is_not_retryable(self):
+        outcomes = [requests.exceptions.ReadTimeout(), requests.exceptions.ConnectionError(), None]
+
+        def post(*args, **kwargs):
+            outcome = outcomes[int(kwargs["json"]["email"][6])]
+            if outcome:
+                raise outcome
+            return self._created(*args, **kwargs)
+
+        with mock.patch("privacy_app.onboarding.optery_post", side_effect=post):
+            reports = list(onboard_members(self.rows, concurrency=1))
+
+        self.assertEqual(reports[0]["status"], "failed")
+        self.assertFalse(reports[0]["retryable"])
+        self.assertIn("outcome unknown", reports[0]["error"])
+        self.assertTrue(reports[1]["retryable"])
+        self.assertEqual(reports[2]["status"], "created")
+
+    def test_database_error_fails_only_its_row(self):
+        save = OpteryMember.save
+
+        def save_row(member, *args, **kwargs):
+            if member.email == "member1@example.com":
+                raise DataError("value too long")
+            return save(member, *args, **kwargs)
+
+        with mock.patch("privacy_app.onboarding.optery_post", side_effect=self._created), \
+                mock.patch.object(OpteryMember.objects, "bulk_create", side_effect=OperationalError("bulk insert failed")), \
+                mock.patch.object(OpteryMember, "save", autospec=True, side_effect=save_row):
+            reports = list(onboard_members(self.rows, concurrency=1))
+
+        self.assertEqual([r.get("status") for r in reports[:3]], ["created", "failed", "created"])
+        self.assertEqual(reports[1]["uuid"], "00000000-0000-0000-0000-000000000001")
+        self.assertFalse(reports[1]["retryable"])
+        self.assertEqual(reports[3]["summary"]["created"], 2)
+        self.assertEqual(OpteryMember.objects.count(), 2)
+
+
+class AsyncJobResultTests(TestCase):
+    def _get(self, view, params, result):
+        job = mock.Mock(result=result, **{"ready.return_value": True, "successful.return_value": True})
+        with mock.patch("privacy_app.views.AsyncResult", return_value=job):
+            return view.as_view()(APIRequestFactory().get("/", params))
+
+    def test_stored_response_is_returned(self):
+        response = self._get(CreateOpteryMember, {"job_id": "job-1"}, {"status_code": 201, "response": {"uuid": "u"}})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {"uuid": "u"})
+
+    def test_other_task_ids_are_not_found(self):
+        # e.g. the id of a scan fetch, whose result is a pointer dict
+        pointer = {"member_uuid": "member-1", "scan_ids": ["1"]}
+        for view, params in ((CreateOpteryMember, {"job_id": "job-1"}), (CustomRemovalCreateView, {"task_id": "task-1"})):
+            for result in (pointer, ["1"], None):
+                self.assertEqual(self._get(view, params, result).status_code, 404)
+
+
+class CreateMemberIdempotencyTests(FakeRedisTestCase):
+    member = {"email": "member@example.com", "first_name": "A", "last_name": "B", "plan": "basic"}
+
+    def test_sync_timeout_is_stored(self):
+        client = APIClient()
+        url = reverse("create_optery_member")
+        with mock.patch("privacy_app.views.create_member", side_effect=requests.exceptions.Timeout) as create:
+            first = client.post(url, self.member, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+            second = client.post(url, self.member, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+        self.assertEqual(first.status_code, 504)
+        self.assertEqual(second.status_code, 504)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(create.call_count, 1)
+
+    def test_sync_connection_error_releases_key(self):
+        client = APIClient()
+        url = reverse("create_optery_member")
+        with mock.patch("privacy_app.views.create_member", side_effect=requests.exceptions.ConnectTimeout) as create:
+            first = client.post(url, self.member, format="json", HTTP_IDEMPOTENCY_KEY="k2")
+            second = client.post(url, self.member, format="json", HTTP_IDEMPOTENCY_KEY="k2")
+        self.assertEqual((first.status_code, second.status_code), (503, 503))
+        self.assertEqual(create.call_count, 2)
+
+    def test_task_releases_key_when_retries_run_out(self):
+        scope = "members:anon:k3"
+        fingerprint = request_fingerprint(self.member)
+        self.assertIsNone(claim_idempotency_key(scope, "job-1", fingerprint))
+        unavailable = (503, {"success": False})
+        with mock.patch("privacy_app.tasks.create_member", return_value=unavailable) as create, \
+                mock.patch("privacy_app.tasks.backoff_delay", return_value=0):
+            result = create_optery_member.apply(args=(self.member, scope), task_id="job-1").get()
+        self.assertEqual(result["status_code"], 503)
+        self.assertEqual(create.call_count, create_optery_member.max_retries + 1)
+        self.assertIsNone(claim_idempotency_key(scope, "job-2", fingerprint))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    OPTERY_TASK_RESULT_MODE="full",
+    OPTERY_INCREMENTAL_SYNC=False,
+)
+class CheckpointResumeTests(FakeRedisTestCase):
+    def test_retry_refetches_only_failed_scans(self):
+        scans = [{"scan_id": scan_id} for scan_id in ("1", "2", "3")]
+        outcomes = {"2": [{"error": "API returned 502", "retryable": True}]}
+
+        def fetch(member_uuid, scan_ids, on_result=None):
+            return [
+                outcomes[scan_id].pop() if outcomes.get(scan_id) else [{"broker": "b", "scan": scan_id}]
+                for scan_id in scan_ids
+            ]
+
+        with mock.patch("privacy_app.tasks.get_member_by_uuid", return_value=None), \
+                mock.patch("privacy_app.tasks.get_scan_list", return_value=(scans, None)) as get_scans, \
+                mock.patch("privacy_app.tasks.fetch_screenshots", side_effect=fetch) as fetch_mock, \
+                mock.patch("privacy_app.checkpoints.backoff_delay", return_value=0):
+            result = fetch_optery_scans_background.apply(args=("member-1", "member@example.com")).get()
+
+        # The retry reused the checkpointed scan list and skipped the scans it had saved
+        self.assertEqual(get_scans.call_count, 1)
+        self.assertEqual([call.args[1] for call in fetch_mock.call_args_list], [["1", "2", "3"], ["2"]])
+        self.assertEqual(
+            [entry["screenshots"] for entry in result["screenshots"]],
+            [[{"broker": "b", "scan": scan_id}] for scan_id in ("1", "2", "3")]
+        )
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    OPTERY_TASK_RESULT_MODE="full",
+    OPTERY_CHORD_THRESHOLD=4,
+    OPTERY_CHORD_CHUNK_SIZE=2,
+)
+class ChordAssemblyTests(FakeRedisTestCase):
+    def test_fanned_out_fetch_is_assembled_in_scan_order(self):
+        scan_ids = ["1", "2", "3", "4", "5"]
+        scans = [{"scan_id": scan_id} for scan_id in scan_ids]
+        save = save_scan_history
+
+        def save_history(rows):
+            # Scan 4 cannot be saved: the callback must report it with its screenshots
+            saved, errors = save([row for row in rows if row.scan_id != "4"])
+            if any(row.scan_id == "4" for row in rows):
+                errors["4"] = "value too long"
+            return saved, errors
+
+        def fetch(member_uuid, chunk, on_result=None):
+            return [[{"broker": "b", "scan": scan_id}] for scan_id in chunk]
+
+        # Eager chords still go through a result backend, keep it in memory
+        backend = CacheBackend(app=celery_app, backend="memory")
+        with mock.patch.object(celery_app, "_backend_cache", backend), \
+                mock.patch("privacy_app.tasks.get_member_by_uuid", return_value=None), \
+                mock.patch("privacy_app.tasks.get_scan_list", return_value=(scans, None)), \
+                mock.patch("privacy_app.tasks.fetch_screenshots", side_effect=fetch) as fetch_mock, \
+                mock.patch("privacy_app.tasks.save_scan_history", side_effect=save_history):
+            result = fetch_optery_scans_background.apply(args=("member-1", "member@example.com")).get()
+
+        self.assertEqual([call.args[1] for call in fetch_mock.call_args_list], [["1", "2"], ["3", "4"], ["5"]])
+        self.assertEqual(result["scans"], scans)
+        self.assertEqual([entry["scan_id"] for entry in result["screenshots"]], scan_ids)
+        self.assertEqual(
+            [entry["screenshots"] for entry in result["screenshots"]],
+            [[{"broker": "b", "scan": scan_id}] for scan_id in scan_ids]
+        )
+        self.assertEqual([entry["scan_id"] for entry in result["screenshots"] if "save_error" in entry], ["4"])
+
+
+class PartialResultsTests(FakeRedisTestCase):
+    def test_retry_keeps_partial_log(self):
+        scans = [{"scan_id": scan_id} for scan_id in ("1", "2", "3")]
+        start_partial("task-1", scans, 3, [{"scan_id": "1", "screenshots": []}])
+        push_partial("task-1", {"scan_id": "2", "screenshots": {"error": "API returned 502", "retryable": True}})
+        cursor = get_partial("task-1")["next_cursor"]
+        self.assertEqual(cursor, 2)
+
+        # The retry fetches scans 2 and 3; the client's cursor still points past what it has
+        start_partial("task-1", scans, 3, [{"scan_id": "1", "screenshots": []}])
+        push_partial("task-1", {"scan_id": "2", "screenshots": []})
+        push_partial("task-1", {"scan_id": "3", "screenshots": []})
+
+        partial = get_partial("task-1", cursor)
+        self.assertEqual([entry["scan_id"] for entry in partial["screenshots"]], ["2", "3"])
+        self.assertEqual(partial["completed"], 3)
+        self.assertEqual(partial["next_cursor"], 4)
+
+
+class CountingHandler(FakeOpteryHandler):
+    latency = 0.05
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        with self.lock:
+            CountingHandler.active += 1
+            CountingHandler.peak = max(CountingHandler.peak, CountingHandler.active)
+        try:
+            super().do_GET()
+        finally:
+            with self.lock:
+                CountingHandler.active -= 1
+
+
+@override_settings(OPTERY_INFLIGHT_LIMITS={"screenshots": 3}, OPTERY_RATE_LIMIT_ENABLED=False, OPTERY_CIRCUIT_ENABLED=False)
+class InflightLimitTests(FakeRedisTestCase):
+    def test_slots_are_shared_and_released(self):
+        slots = [acquire_slot("screenshots") for _ in range(3)]
+        with self.assertRaises(OpteryBusy):
+            acquire_slot("screenshots", wait=False)
+        release_slot("screenshots", slots.pop())
+        self.assertIsNotNone(acquire_slot("screenshots", wait=False))
+
+    def test_crashed_holder_slot_expires(self):
+        with override_settings(OPTERY_INFLIGHT_SLOT_TTL=0.01):
+            for _ in range(3):
+                acquire_slot("screenshots")
+            time.sleep(0.02)
+            self.assertIsNotNone(acquire_slot("screenshots", wait=False))
+
+    def test_cap_holds_across_concurrent_runs(self):
+        server = FakeOpteryServer(("127.0.0.1", 0), CountingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        CountingHandler.peak = 0
+
+        def run(member_uuid):
+            return asyncio.run(gather_screenshots([(member_uuid, [str(i) for i in range(6)])], member_limit=6))
+
+        with override_settings(OPTERY_BASE_URL=f"http://127.0.0.1:{server.server_port}/"):
+            # Two tasks fetching at once, each with its own event loop
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(run, ["member-1", "member-2"]))
+
+        self.assertTrue(all(len(result[0]) == 6 and "error" not in result[0][0] for result in results))
+        self.assertLessEqual(CountingHandler.peak, 3)
+        self.assertEqual(self.redis.zcard("optery:inflight:screenshots"), 0)
@@ -0,0 +1,108 @@
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .optery_client import optery_post
+
+logger = logging.getLogger(__name__)
+
+
+class MultipartStream:
+    """
+    File-like multipart/form-data body. File parts are read in chunks only
+    as the HTTP client pulls them, so an upload is never held in memory;
+    the total length is known up front and sent as Content-Length.
+    """
+
+    def __init__(self, fields, files, chunk_size=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size or getattr(settings, "OPTERY_UPLOAD_CHUNK_SIZE", 64 * 1024)
+
+        parts = []
+        for name, value in fields.items():
+            # Same as requests: fields without a value are left out
+            if value is None:
+                continue
+            parts.append(self._part_header(name) + str(value).encode() + b"\r\n")
+        for name, (filename, fileobj, content_type) in files.items():
+            parts.append(self._part_header(name, filename, content_type))
+            parts.append((fileobj, self._file_size(fileobj)))
+            parts.append(b"\r\n")
+        parts.append(f"--{self.boundary}--\r\n".encode())
+
+        self._parts = parts
+        self.len = sum(part[1] if isinstance(part, tuple) else len(part) for part in parts)
+        self._chunks = self._iter_chunks()
+        self._buffer = b""
+
+    def _part_header(self, name, filename=None, content_type=None):
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            safe_name = os.path.basename(filename).replace('"', "%22").replace("\r", "").replace("\n", "")
+            disposition += f'; filename="{safe_name}"'
+        header = f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+        if content_type:
+            header += f"Content-Type: {content_type}\r\n"
+        return (header + "\r\n").encode()
+
+    @staticmethod
+    def _file_size(fileobj):
+        size = getattr(fileobj, "size", None)
+        if size is None:
+            fileobj.seek(0, os.SEEK_END)
+            size = fileobj.tell()
+        return size
+
+    def _iter_chunks(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            fileobj, _ = part
+            fileobj.seek(0)
+            while True:
+                chunk = fileobj.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def __len__(self):
+        return self.len
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def post_custom_removal(member_uuid, data, filename, fileobj, content_type, wait_for_token=True):
+    """Create a custom removal on Optery, streaming the proof file from disk"""
+    body = MultipartStream(data, {"proof_of_exposure": (filename, fileobj, content_type)})
+    return optery_post(
+        "custom-removals-create",
+        f"v1/optouts/{member_uuid}/custom-removals",
+        data=body,
+        headers={"Content-Type": body.content_type},
+        wait_for_token=wait_for_token
+    )
+
+
+def stash_upload(uploaded_file):
+    """
+    Save an uploaded proof file to default storage (MEDIA_ROOT or the configured
+    backend) so a Celery worker can pick it up after the request is gone.
+    Returns the storage path.
+    """
+    name = os.path.basename(uploaded_file.name) or "proof"
+    return default_storage.save(f"custom_removals/pending/{uuid.uuid4().hex}_{name}", uploaded_file)
@@ -3,11 +3,16 @@ from . import views
 
 urlpatterns = [
     path('optery/members/', views.CreateOpteryMember.as_view(), name='create_optery_member'),
+    path('optery/members/bulk/', views.BulkCreateOpteryMembers.as_view(), name='bulk_create_optery_members'),
     # path('api/optery/members/cbv/', views.OpteryMemberView.as_view(), name='optery_member_cbv'),
     path('optery/data-scans/', views.OpteryCombinedView.as_view(), name='optery-combined'),
+    path('optery/data-scans/events/', views.optery_task_events, name='optery-task-events'),
     path("optery/history/<str:email_str>/", views.OpteryHistoryListView.as_view()),
+    path("optery/exposure-summary/", views.OpteryExposureSummaryView.as_view(), name='optery-exposure-summary'),
+    path("optery/exposure-changes/", views.OpteryExposureChangesView.as_view(), name='optery-exposure-changes'),
 
     path("optery/custom-removals/", views.CustomRemovalListView.as_view()),
     path("custom-removal/", views.CustomRemovalCreateView.as_view()),
     path('api/optery-members/<str:email_str>/', views.get_optery_member_by_email, name='get_optery_member_by_email'),
+    path('optery/metrics/', views.optery_metrics, name='optery-metrics'),
 ]
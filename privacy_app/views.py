@@ -1,40 +1,57 @@
 import os
 import json
+import math
+import uuid
 import logging
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.utils.encoders import JSONEncoder
 import requests
 from celery.result import AsyncResult
-from .models import OpteryScanHistory, OpteryMember
+from .models import OpteryExposureChange, OpteryExposureSummary
 from .serializers import OpteryMemberSerializer
-from .tasks import fetch_optery_scans_background
+from .tasks import (
+    create_optery_member, fetch_optery_scans_background, refresh_custom_removals, submit_custom_removal
+)
+from .uploads import post_custom_removal, stash_upload
+from .leases import claim_fetch, release_lease
+from .members import get_member_by_email
+from .idempotency import (
+    IdempotencyKeyReused, claim_idempotency_key, release_idempotency_key, request_fingerprint,
+    store_idempotent_response
+)
+from .metrics import get_metrics
+from .onboarding import create_member, onboard_members, parse_member_rows
+from .progress import get_partial, progress_event_stream
+from .result_cache import get_cached_result
+from .summaries import SUMMARY_FIELDS, serialize_summary
+from . import custom_removals
+from .history import (
+    HISTORY_FIELDS, MEMBER_FIELDS, build_history_fallback, encode_cursor, expand_result, history_page_queryset, serialize_history
+)
+from .circuit import OpteryCircuitOpen, circuit_is_open, get_circuit_state
+from .diffs import CHANGE_FIELDS, serialize_change
+from .optery_client import get_connection_stats, get_optery_config, optery_post
+from .ratelimit import OpteryRateLimited
 
 logger = logging.getLogger(__name__)
 
 
 """--------------------Utility functions--------------------"""
 
-def get_optery_config():
-    """Safely get Optery configuration from environment with validation"""
-    base_url = settings.OPTERY_BASE_URL
-    api_token = settings.OPTERY_API_KEY
-    
-    if not base_url or not api_token:
-        logger.error("Optery configuration missing. Check environment variables.")
-        raise ValueError("Optery API configuration not found")
-    
-    # Ensure base URL ends with slash
-    if not base_url.endswith('/'):
-        base_url += '/'
-    
-    return base_url, api_token
-
-
 def safe_json_parse(text, default=None):
     """Safely parse JSON with comprehensive error handling"""
     if not text or not text.strip():
@@ -50,6 +67,72 @@ def safe_json_parse(text, default=None):
         return default
 
 
+def start_optery_fetch(member_uuid, email):
+    """
+    Enqueue fetch_optery_scans_background unless one is already in flight for
+    this member. Returns (task_id, is_new).
+    """
+    task_id, is_new = claim_fetch(member_uuid)
+    if is_new:
+        try:
+            fetch_optery_scans_background.apply_async(args=(member_uuid, email), task_id=task_id)
+        except Exception:
+            release_lease(member_uuid, task_id)
+            raise
+    else:
+        logger.info(f"Coalesced fetch for {member_uuid} onto in-flight task {task_id}")
+    return task_id, is_new
+
+
+def rate_limited_response(e, extra=None):
+    """429 with Retry-After for a fail-fast OpteryRateLimited"""
+    retry_after = max(1, math.ceil(e.retry_after))
+    response = Response({
+        **(extra or {}),
+        "error": "Optery rate limit reached, try again shortly",
+        "retry_after": retry_after
+    }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def circuit_open_response(e, extra=None):
+    """503 with Retry-After while the Optery circuit breaker is open"""
+    retry_after = max(1, math.ceil(e.retry_after))
+    response = Response({
+        **(extra or {}),
+        "error": "Optery is temporarily unavailable, try again shortly",
+        "retry_after": retry_after
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def stored_scans_response(member_uuid, email):
+    """
+    While the circuit is open, answer scan requests from OpteryScanHistory
+    instead of queueing a task that would fail fast anyway.
+    """
+    fallback = build_history_fallback(member_uuid, email)
+    if fallback is not None:
+        return Response(fallback, status=200)
+    retry_after = getattr(settings, "OPTERY_CIRCUIT_RESET_TIMEOUT", 30)
+    return circuit_open_response(OpteryCircuitOpen(retry_after), {"member_uuid": member_uuid})
+
+
+def job_result_response(result, extra=None):
+    """
+    Stored Optery response of a finished async job ({"status_code", "response"}).
+    404 when the id belongs to some other task, whose result has another shape.
+    """
+    if isinstance(result, dict) and "response" in result and isinstance(result.get("status_code"), int):
+        return Response(result["response"], status=result["status_code"])
+    return Response({
+        **(extra or {}),
+        "error": "No job found with this id"
+    }, status=status.HTTP_404_NOT_FOUND)
+
+
 def validate_required_fields(data, required_fields):
     """Validate required fields in request data"""
     missing_fields = [field for field in required_fields if not data.get(field)]
@@ -58,10 +141,48 @@ def validate_required_fields(data, required_fields):
     return True
 
 
+def idempotent_replay(previous, run_async):
+    """Answer a repeated Idempotency-Key: the stored response, or where the first request is at"""
+    if previous["status_code"] is not None:
+        response = Response(previous["response"], status=previous["status_code"])
+        response["Idempotent-Replayed"] = "true"
+        return response
+    if run_async:
+        return Response({
+            "status": "processing",
+            "job_id": previous["job_id"],
+            "message": "Member creation queued. Use GET with job_id to check status."
+        }, status=202)
+    return Response({
+        "success": False,
+        "error": "A request with this Idempotency-Key is still in progress"
+    }, status=status.HTTP_409_CONFLICT)
+
+
 """--------------------Create Optery Member--------------------"""
 
 @method_decorator(csrf_exempt, name='dispatch')
 class CreateOpteryMember(APIView):
+    """
+    POST: create a member. OPTERY_CREATE_MEMBER_MODE 'sync' calls Optery in the
+    request; 'async' (or a "Prefer: respond-async" header) queues the call to
+    Celery and answers 202 + job_id. An Idempotency-Key header maps repeated
+    submissions to the first job and its stored response.
+    GET with job_id: result of an async create.
+    """
+
+    def get(self, request):
+        job_id = request.query_params.get("job_id")
+        if not job_id:
+            return Response({"error": "job_id is required"}, status=400)
+
+        job = AsyncResult(job_id)
+        if not job.ready():
+            return Response({"status": "processing", "job_id": job_id}, status=202)
+        if not job.successful():
+            return Response({"success": False, "job_id": job_id, "error": str(job.result)}, status=500)
+        return job_result_response(job.result, {"job_id": job_id})
+
     def post(self, request):
         # Validate input data
         serializer = OpteryMemberSerializer(data=request.data)
@@ -73,87 +194,169 @@ class CreateOpteryMember(APIView):
 
         # Check API configuration
         try:
-            optery_base, optery_token = get_optery_config()
+            get_optery_config()
         except ValueError:
             return Response({
                 "success": False,
                 "error": "Service configuration error"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Prepare Optery API request
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"Bearer {optery_token}"
-        }
-
-        api_url = optery_base.rstrip('/') + '/v1/members'
-
-        try:
-            # Call Optery API
-            optery_response = requests.post(
-                api_url,
-                headers=headers,
-                json=serializer.validated_data,
-                timeout=30
-            )
-
-            response_data = optery_response.json()
-            is_success = optery_response.status_code in [200, 201]
-
-            # Only save to database if API call was successful
-            if is_success:
-                OpteryMember.objects.create(
-                    uuid=response_data.get("uuid"),
-                    email=serializer.validated_data["email"],
-                    first_name=serializer.validated_data["first_name"],
-                    last_name=serializer.validated_data["last_name"],
-                    middle_name=serializer.validated_data.get("middle_name"),
-                    city=serializer.validated_data.get("city"),
-                    country=serializer.validated_data.get("country", "US"),
-                    state=serializer.validated_data.get("state"),
-                    birthday_day=serializer.validated_data.get("birthday_day"),
-                    birthday_month=serializer.validated_data.get("birthday_month"),
-                    birthday_year=serializer.validated_data.get("birthday_year"),
-                    plan=serializer.validated_data["plan"],
-                    postpone_scan=serializer.validated_data.get("postpone_scan", 45),
-                    group_tag=serializer.validated_data.get("group_tag"),
-                    address_line1=serializer.validated_data.get("address_line1"),
-                    address_line2=serializer.validated_data.get("address_line2"),
-                    zipcode=serializer.validated_data.get("zipcode"),
-                    optery_response=response_data,
-                    status_code=optery_response.status_code,
-                    is_success=True
+        run_async = (
+            getattr(settings, "OPTERY_CREATE_MEMBER_MODE", "sync") == "async"
+            or "respond-async" in request.headers.get("Prefer", "")
+        )
+        job_id = str(uuid.uuid4())
+
+        idempotency_scope = None
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key:
+            if len(idempotency_key) > 255:
+                return Response({"success": False, "error": "Idempotency-Key is too long"}, status=400)
+            user = request.user.pk if request.user.is_authenticated else "anon"
+            idempotency_scope = f"members:{user}:{idempotency_key}"
+            try:
+                previous = claim_idempotency_key(
+                    idempotency_scope, job_id, request_fingerprint(serializer.validated_data)
                 )
+            except IdempotencyKeyReused:
+                return Response({
+                    "success": False,
+                    "error": "Idempotency-Key was already used with a different request body"
+                }, status=422)
+            if previous is not None:
+                return idempotent_replay(previous, run_async)
 
+        if run_async:
+            try:
+                # Through JSON so Celery can carry UUIDs / dates
+                payload = json.loads(JSONEncoder().encode(serializer.validated_data))
+                create_optery_member.apply_async(args=(payload, idempotency_scope), task_id=job_id)
+            except Exception as e:
+                if idempotency_scope:
+                    release_idempotency_key(idempotency_scope, job_id)
+                logger.error(f"Create member enqueue error: {str(e)}", exc_info=True)
+                return Response({
+                    "success": False,
+                    "error": "Failed to queue member creation"
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             return Response({
-                "success": is_success,
-                "status_code": optery_response.status_code,
-                "optery_response": response_data,
-                "data": response_data
-            }, status=optery_response.status_code)
+                "status": "processing",
+                "job_id": job_id,
+                "message": "Member creation queued. Use GET with job_id to check status."
+            }, status=202)
 
+        try:
+            status_code, response_data = create_member(serializer.validated_data, wait_for_token=False)
+        except OpteryRateLimited as e:
+            if idempotency_scope:
+                release_idempotency_key(idempotency_scope, job_id)
+            return rate_limited_response(e, {"success": False})
+        except OpteryCircuitOpen as e:
+            if idempotency_scope:
+                release_idempotency_key(idempotency_scope, job_id)
+            return circuit_open_response(e, {"success": False})
+        except requests.exceptions.ConnectionError as e:
+            # Includes ConnectTimeout: the request never reached Optery
+            if idempotency_scope:
+                release_idempotency_key(idempotency_scope, job_id)
+            logger.error(f"Create member: Optery unreachable: {str(e)}")
+            return Response({
+                "success": False,
+                "error": "Failed to reach Optery"
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except requests.exceptions.Timeout:
+            # Optery may still have created the member, so the key keeps this answer
+            status_code, response_data = 504, {"success": False, "error": "Request timeout"}
         except Exception as e:
             logger.error(f"Create member error: {str(e)}", exc_info=True)
+            status_code, response_data = 500, {"success": False, "error": str(e)}
+
+        if idempotency_scope:
+            # Same rule as the create_optery_member task: release the key when nothing was created
+            if status_code in (429, 503):
+                release_idempotency_key(idempotency_scope, job_id)
+            else:
+                store_idempotent_response(idempotency_scope, job_id, status_code, response_data)
+        return Response(response_data, status=status_code)
+
+
+class BulkCreateOpteryMembers(APIView):
+    """
+    POST: onboard many members at once. Body is a JSON list (or {"members": [...]})
+    or a multipart "file" (CSV with a header row, or JSON); optional group_tag is
+    applied to rows without one. Streams one NDJSON report line per row, then a summary.
+    Admin only; large imports go through the onboard_optery_members command.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        try:
+            get_optery_config()
+        except ValueError:
             return Response({
                 "success": False,
-                "error": str(e)
+                "error": "Service configuration error"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        try:
+            upload = request.FILES.get("file")
+            if upload is not None:
+                fmt = request.data.get("format")
+                if not fmt and upload.name.lower().endswith((".csv", ".json")):
+                    fmt = upload.name.lower().rsplit(".", 1)[1]
+                rows = parse_member_rows(upload.read().decode("utf-8-sig"), fmt)
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get("members")
+                if not isinstance(rows, list):
+                    return Response({
+                        "success": False,
+                        "error": "Send a JSON list of members, {\"members\": [...]} or a CSV/JSON file"
+                    }, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"success": False, "error": f"Could not parse input: {str(e)}"}, status=400)
+
+        max_rows = getattr(settings, "OPTERY_BULK_MEMBER_MAX_ROWS", 500)
+        if not rows:
+            return Response({"success": False, "error": "No members to create"}, status=400)
+        if len(rows) > max_rows:
+            return Response({
+                "success": False,
+                "error": f"At most {max_rows} members per request, use the onboard_optery_members command for more"
+            }, status=400)
+
+        if circuit_is_open():
+            return Response({"success": False, "error": "Optery temporarily unavailable"}, status=503)
+
+        group_tag = request.query_params.get("group_tag")
+        if not group_tag and not isinstance(request.data, list):
+            group_tag = request.data.get("group_tag")
+
+        def lines():
+            encoder = JSONEncoder()
+            for report in onboard_members(rows, group_tag=group_tag):
+                yield encoder.encode(report) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
 
 """--------------------Optery Combined View with Background Task--------------------"""
 
 class OpteryCombinedView(APIView):
     """
     GET with task_id: Check task status and get result
+        (while processing, returns screenshots finished so far; pass cursor=next_cursor
+        to only get new ones)
     POST: Start background task to fetch scans
     """
     
     def post(self, request):
-        """Start background task - Returns task_id immediately"""
+        """Start background task - Returns task_id immediately (or a fresh cached result)"""
         try:
             member_uuid = request.data.get("member_uuid")
             email = request.data.get("email")
+            refresh = str(request.data.get("refresh", "")).lower() in ("1", "true")
             
             if not member_uuid:
                 return Response({"error": "member_uuid is required"}, status=400)
@@ -162,12 +365,21 @@ class OpteryCombinedView(APIView):
             if email and ("@" not in email or "." not in email):
                 return Response({"error": "Invalid email format"}, status=400)
 
-            # Start background task
-            task = fetch_optery_scans_background.delay(member_uuid, email)
+            # Serve a recent result directly
+            if not refresh:
+                cached = get_cached_result(member_uuid)
+                if cached is not None:
+                    return Response(expand_result(cached), status=200)
+
+            if circuit_is_open():
+                return stored_scans_response(member_uuid, email)
+
+            # Start background task (or join the one already running)
+            task_id, _ = start_optery_fetch(member_uuid, email)
             
             return Response({
                 "status": "processing",
-                "task_id": task.id,
+                "task_id": task_id,
                 "message": "Request submitted successfully. Use GET with task_id to check status.",
                 "member_uuid": member_uuid,
                 "email": email if email else "Not provided"
@@ -196,9 +408,8 @@ class OpteryCombinedView(APIView):
                 
                 if task_result.ready():
                     if task_result.successful():
-                        result = task_result.result
                         # Return exact same structure as old API
-                        return Response(result, status=200)
+                        return Response(expand_result(task_result.result), status=200)
                     else:
                         return Response({
                             "status": "failed",
@@ -206,11 +417,16 @@ class OpteryCombinedView(APIView):
                             "task_id": task_id
                         }, status=500)
                 else:
-                    # Task still processing
+                    # Task still processing - include screenshots finished since `cursor`
+                    try:
+                        cursor = max(int(request.query_params.get("cursor", 0)), 0)
+                    except ValueError:
+                        return Response({"error": "cursor must be an integer"}, status=400)
                     return Response({
                         "status": "processing",
                         "task_id": task_id,
-                        "message": "Task is still running. Please check again in a few seconds."
+                        "message": "Task is still running. Please check again in a few seconds.",
+                        **get_partial(task_id, cursor)
                     }, status=202)
 
             except Exception as e:
@@ -223,10 +439,16 @@ class OpteryCombinedView(APIView):
         # Backwards compatibility: If no task_id, start task immediately (old behavior)
         elif member_uuid:
             logger.warning("Using deprecated direct GET call. Please use POST to start task.")
-            task = fetch_optery_scans_background.delay(member_uuid, email)
+            cached = get_cached_result(member_uuid)
+            if cached is not None:
+                return Response(expand_result(cached), status=200)
+            if circuit_is_open():
+                return stored_scans_response(member_uuid, email)
+
+            task_id, _ = start_optery_fetch(member_uuid, email)
             return Response({
                 "status": "processing",
-                "task_id": task.id,
+                "task_id": task_id,
                 "message": "Task started. Use task_id to check status.",
                 "member_uuid": member_uuid
             }, status=202)
@@ -237,48 +459,226 @@ class OpteryCombinedView(APIView):
             }, status=400)
 
 
+"""--------------------Optery Task Progress (SSE)--------------------"""
+
+@require_GET
+async def optery_task_events(request):
+    """
+    Server-sent events for a fetch task: scans_listed, screenshot_fetched (x/N),
+    done / failed. Async view - serve it through the ASGI app (asgi.py) so a
+    waiting client doesn't hold a sync worker.
+    """
+    task_id = request.GET.get("task_id")
+    if not task_id:
+        return JsonResponse({"error": "task_id is required"}, status=400)
+
+    response = StreamingHttpResponse(progress_event_stream(task_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx)
+    return response
+
+
 """--------------------Optery History List View--------------------"""
 
 class OpteryHistoryListView(APIView):
+    """
+    Keyset-paginated scan history for an email.
+    Query params: limit, cursor (next_cursor from the previous page),
+    fields (comma separated projection, e.g. fields=id,scan_id,created_at; plan and
+    group_tag come from the linked member),
+    stream=true (stream the full history as one JSON document)
+    """
+
     def get(self, request, email_str):
         try:
             if not email_str:
                 return Response({"error": "email is required"}, status=400)
 
-            histories = OpteryScanHistory.objects.filter(
-                email=email_str
-            ).order_by("-created_at")
-
-            data = [
-                {
-                    "id": h.id,
-                    "member_uuid": h.member_uuid,
-                    "email": h.email,
-                    "scan_id": h.scan_id,
-                    "raw_scan_data": h.raw_scan_data,
-                    "raw_screenshot_data": h.raw_screenshot_data,
-                    "created_at": h.created_at,
-                }
-                for h in histories
-            ]
+            fields = HISTORY_FIELDS
+            if request.query_params.get("fields"):
+                fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+                unknown = [f for f in fields if f not in HISTORY_FIELDS and f not in MEMBER_FIELDS]
+                if unknown:
+                    return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+            if request.query_params.get("stream", "").lower() in ("1", "true"):
+                return self.stream(email_str, fields)
+
+            page_size = getattr(settings, "OPTERY_HISTORY_PAGE_SIZE", 50)
+            try:
+                limit = int(request.query_params.get("limit", page_size))
+            except ValueError:
+                return Response({"error": "limit must be an integer"}, status=400)
+            limit = max(1, min(limit, getattr(settings, "OPTERY_HISTORY_MAX_PAGE_SIZE", 500)))
+
+            try:
+                histories = history_page_queryset(email_str, fields, request.query_params.get("cursor"))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+
+            # One extra row tells us whether there is a next page
+            rows = list(histories[:limit + 1])
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            data = list(serialize_history(rows, fields))
 
             return Response({
                 "success": True,
                 "total": len(data),
-                "history": data
+                "history": data,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1]) if has_more else None
             })
 
         except Exception as e:
             logger.error(f"Error in OpteryHistoryListView: {str(e)}", exc_info=True)
             return Response({"error": "Internal server error"}, status=500)
 
+    def stream(self, email_str, fields):
+        """Full export, streamed in chunks so memory stays bounded"""
+        chunk_size = getattr(settings, "OPTERY_HISTORY_STREAM_CHUNK_SIZE", 200)
+        histories = history_page_queryset(email_str, fields)
+
+        def chunks():
+            encoder = JSONEncoder()
+            total = 0
+            yield '{"success": true, "history": ['
+            batch = []
+            for h in histories.iterator(chunk_size=chunk_size):
+                batch.append(h)
+                if len(batch) == chunk_size:
+                    for item in serialize_history(batch, fields):
+                        yield ("," if total else "") + encoder.encode(item)
+                        total += 1
+                    batch = []
+            for item in serialize_history(batch, fields):
+                yield ("," if total else "") + encoder.encode(item)
+                total += 1
+            yield f'], "total": {total}}}'
+
+        return StreamingHttpResponse(chunks(), content_type="application/json")
+
+
+"""--------------------Exposure Summary--------------------"""
+
+class OpteryExposureSummaryView(APIView):
+    """
+    GET: per-scan exposure counts for a member (member_uuid, or email via the
+    member directory), newest first, from OpteryExposureSummary instead of the
+    raw scan JSON. Ordered by scan recency (created_at, id) like the history
+    list, so "latest" is the newest scan; limit caps "scans".
+    """
+
+    def get(self, request):
+        try:
+            member_uuid = request.query_params.get("member_uuid")
+            email = request.query_params.get("email")
+            if not member_uuid and email:
+                member = get_member_by_email(email)
+                member_uuid = str(member["uuid"]) if member and member.get("uuid") else None
+                if not member_uuid:
+                    return Response({"error": "No member found for this email"}, status=404)
+            if not member_uuid:
+                return Response({"error": "member_uuid or email is required"}, status=400)
+
+            page_size = getattr(settings, "OPTERY_HISTORY_PAGE_SIZE", 50)
+            try:
+                limit = int(request.query_params.get("limit", page_size))
+            except ValueError:
+                return Response({"error": "limit must be an integer"}, status=400)
+            limit = max(1, min(limit, getattr(settings, "OPTERY_HISTORY_MAX_PAGE_SIZE", 500)))
+
+            summaries = OpteryExposureSummary.objects.filter(member_uuid=member_uuid).order_by(
+                "-created_at", "-id"
+            ).only(*SUMMARY_FIELDS)
+            rows = list(summaries[:limit + 1])
+            scans = [serialize_summary(summary) for summary in rows[:limit]]
+
+            return Response({
+                "success": True,
+                "member_uuid": member_uuid,
+                "latest": scans[0] if scans else None,
+                "scans": scans,
+                "has_more": len(rows) > limit
+            })
+
+        except Exception as e:
+            logger.error(f"Error in OpteryExposureSummaryView: {str(e)}", exc_info=True)
+            return Response({"error": "Internal server error"}, status=500)
+
+
+"""--------------------Exposure Changes--------------------"""
+
+class OpteryExposureChangesView(APIView):
+    """
+    GET: new / removed / changed exposures for a member (member_uuid, or email
+    via the member directory), oldest first. since= is the next_since of an
+    earlier response (a change id) or an ISO datetime; limit caps the page.
+    """
+
+    def get(self, request):
+        try:
+            member_uuid = request.query_params.get("member_uuid")
+            email = request.query_params.get("email")
+            if not member_uuid and email:
+                member = get_member_by_email(email)
+                member_uuid = str(member["uuid"]) if member and member.get("uuid") else None
+                if not member_uuid:
+                    return Response({"error": "No member found for this email"}, status=404)
+            if not member_uuid:
+                return Response({"error": "member_uuid or email is required"}, status=400)
+
+            page_size = getattr(settings, "OPTERY_HISTORY_PAGE_SIZE", 50)
+            try:
+                limit = int(request.query_params.get("limit", page_size))
+            except ValueError:
+                return Response({"error": "limit must be an integer"}, status=400)
+            limit = max(1, min(limit, getattr(settings, "OPTERY_HISTORY_MAX_PAGE_SIZE", 500)))
+
+            changes = OpteryExposureChange.objects.filter(member_uuid=member_uuid).order_by("id")
+            since = request.query_params.get("since")
+            if since:
+                if since.isdigit():
+                    changes = changes.filter(id__gt=int(since))
+                else:
+                    since_dt = parse_datetime(since)
+                    if since_dt is None:
+                        return Response({"error": "since must be a change id or an ISO datetime"}, status=400)
+                    if timezone.is_naive(since_dt):
+                        since_dt = timezone.make_aware(since_dt)
+                    changes = changes.filter(created_at__gt=since_dt)
+
+            rows = list(changes.only(*CHANGE_FIELDS)[:limit + 1])
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            return Response({
+                "success": True,
+                "member_uuid": member_uuid,
+                "changes": [serialize_change(change) for change in rows],
+                "has_more": has_more,
+                # Pass back as since= for the next page / next poll
+                "next_since": str(rows[-1].id) if rows else since
+            })
+
+        except Exception as e:
+            logger.error(f"Error in OpteryExposureChangesView: {str(e)}", exc_info=True)
+            return Response({"error": "Internal server error"}, status=500)
+
 
 """--------------------Custom Removal List View--------------------"""
 
 class CustomRemovalListView(APIView):
+    """
+    Custom removals for a member, served from a per-member cache:
+    fresh entries directly, stale ones while a background refresh runs
+    (stale-while-revalidate), and older or invalidated ones after a fetch.
+    Supports If-None-Match / If-Modified-Since (304).
+    """
+
     def get(self, request):
         try:
-            optery_base, optery_token = get_optery_config()
+            get_optery_config()
             
             member_uuid = request.query_params.get("member_uuid")
             
@@ -292,20 +692,36 @@ class CustomRemovalListView(APIView):
                     "error": "Invalid member_uuid format"
                 }, status=400)
 
-            url = f"{optery_base}v1/optouts/{member_uuid}/custom-removals"
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Bearer {optery_token}"
-            }
+            custom_removals.mark_hot(member_uuid)
+            entry = custom_removals.get_entry(member_uuid)
+            if entry is not None and custom_removals.is_fresh(entry):
+                return self.cached_response(request, entry, "HIT")
+            if entry is not None and custom_removals.is_revalidatable(entry):
+                if custom_removals.claim_refresh(member_uuid):
+                    try:
+                        refresh_custom_removals.delay(member_uuid)
+                    except Exception as e:
+                        logger.warning(f"Could not queue custom removals refresh: {str(e)}")
+                        custom_removals.release_refresh(member_uuid)
+                return self.cached_response(request, entry, "STALE")
 
             try:
-                response = requests.get(url, headers=headers, timeout=30)
-                response_data = safe_json_parse(response.text, {})
+                response, response_data, fresh_entry = custom_removals.fetch_custom_removals(
+                    member_uuid, wait_for_token=False
+                )
+                if fresh_entry is not None:
+                    return self.cached_response(request, fresh_entry, "MISS")
+                if response.status_code >= 500 and entry is not None:
+                    return self.stale_response(entry)
                 return Response(response_data, status=response.status_code)
+            except OpteryRateLimited as e:
+                return self.stale_response(entry) if entry is not None else rate_limited_response(e)
+            except OpteryCircuitOpen as e:
+                return self.stale_response(entry) if entry is not None else circuit_open_response(e)
             except requests.exceptions.RequestException as e:
                 logger.error(f"Custom removal list API failed: {str(e)}")
+                if entry is not None:
+                    return self.stale_response(entry)
                 return Response({"error": "Failed to fetch custom removals"}, status=503)
 
         except ValueError as e:
@@ -316,13 +732,64 @@ class CustomRemovalListView(APIView):
             logger.error(f"Unexpected error in CustomRemovalListView: {str(e)}", exc_info=True)
             return Response({"error": "Internal server error"}, status=500)
 
+    def cached_response(self, request, entry, cache_status):
+        """200 with the cached list, or 304 if the client's copy is current"""
+        last_modified = int(entry["last_modified"])
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            not_modified = entry["etag"] in parse_etags(if_none_match) or if_none_match.strip() == "*"
+        else:
+            since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+            not_modified = since is not None and last_modified <= since
+
+        response = Response(status=304) if not_modified else Response(entry["data"], status=200)
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        response["X-Cache"] = cache_status
+        return response
+
+    def stale_response(self, entry):
+        """Last good list while Optery is failing"""
+        response = Response(entry["data"], status=200)
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(int(entry["last_modified"]))
+        response["Warning"] = '110 - "Response is stale"'
+        response["X-Optery-Stale"] = "true"
+        return response
+
 
 """--------------------Custom Removal Create View--------------------"""
 
 class CustomRemovalCreateView(APIView):
+    """
+    POST: create a custom removal. OPTERY_CUSTOM_REMOVAL_UPLOAD_MODE picks how
+    the proof file reaches Optery: 'stream' (spooled to disk, streamed out),
+    'async' (queued to a Celery task, 202 + task_id) or 'memory' (old behaviour).
+    GET with task_id: result of an async upload.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        if getattr(settings, "OPTERY_CUSTOM_REMOVAL_UPLOAD_MODE", "stream") != "memory":
+            # Spool proof files to a temp file whatever their size
+            request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get(self, request):
+        task_id = request.query_params.get("task_id")
+        if not task_id:
+            return Response({"error": "task_id is required"}, status=400)
+
+        task_result = AsyncResult(task_id)
+        if not task_result.ready():
+            return Response({"status": "processing", "task_id": task_id}, status=202)
+        if not task_result.successful():
+            return Response({"status": "failed", "task_id": task_id, "error": str(task_result.result)}, status=500)
+        return job_result_response(task_result.result, {"task_id": task_id})
+
     def post(self, request):
         try:
-            optery_base, optery_token = get_optery_config()
+            get_optery_config()
             member_uuid = request.GET.get("member_uuid")
 
             if not member_uuid:
@@ -331,8 +798,6 @@ class CustomRemovalCreateView(APIView):
             if len(member_uuid) < 10:
                 return Response({"error": "Invalid member_uuid format"}, status=400)
 
-            url = f"{optery_base}v1/optouts/{member_uuid}/custom-removals"
-
             exposed_url = request.data.get("exposed_url")
             search_engine_url = request.data.get("search_engine_url")
             search_keywords = request.data.get("search_keywords")
@@ -355,6 +820,47 @@ class CustomRemovalCreateView(APIView):
                 "additional_information": additional_information,
             }
 
+            upload_mode = getattr(settings, "OPTERY_CUSTOM_REMOVAL_UPLOAD_MODE", "stream")
+            if upload_mode == "async":
+                # Hand the upload to a worker so this request returns right away
+                try:
+                    storage_path = stash_upload(proof_file)
+                except Exception as e:
+                    logger.error(f"File processing error: {str(e)}")
+                    return Response({"error": "Failed to process file"}, status=400)
+                try:
+                    task = submit_custom_removal.delay(
+                        member_uuid, data, storage_path, proof_file.name, proof_file.content_type
+                    )
+                except Exception:
+                    default_storage.delete(storage_path)
+                    raise
+                return Response({
+                    "status": "processing",
+                    "task_id": task.id,
+                    "message": "Upload queued. Use GET with task_id to check status."
+                }, status=202)
+
+            if upload_mode != "memory":
+                try:
+                    api_res = post_custom_removal(
+                        member_uuid, data, proof_file.name, proof_file, proof_file.content_type,
+                        wait_for_token=False
+                    )
+                    response_data = safe_json_parse(api_res.text, {})
+                    if api_res.status_code in (200, 201):
+                        custom_removals.invalidate(member_uuid)
+                    return Response(response_data, status=api_res.status_code)
+                except OpteryRateLimited as e:
+                    return rate_limited_response(e)
+                except OpteryCircuitOpen as e:
+                    return circuit_open_response(e)
+                except requests.exceptions.Timeout:
+                    return Response({"error": "Request timeout"}, status=504)
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Custom removal create API failed: {str(e)}")
+                    return Response({"error": "Failed to create custom removal"}, status=503)
+
             try:
                 files = {
                     "proof_of_exposure": (
@@ -367,14 +873,22 @@ class CustomRemovalCreateView(APIView):
                 logger.error(f"File processing error: {str(e)}")
                 return Response({"error": "Failed to process file"}, status=400)
 
-            headers = {
-                "Authorization": f"Bearer {optery_token}",
-            }
-
             try:
-                api_res = requests.post(url, data=data, files=files, headers=headers, timeout=60)
+                api_res = optery_post(
+                    "custom-removals-create",
+                    f"v1/optouts/{member_uuid}/custom-removals",
+                    data=data,
+                    files=files,
+                    wait_for_token=False
+                )
                 response_data = safe_json_parse(api_res.text, {})
+                if api_res.status_code in (200, 201):
+                    custom_removals.invalidate(member_uuid)
                 return Response(response_data, status=api_res.status_code)
+            except OpteryRateLimited as e:
+                return rate_limited_response(e)
+            except OpteryCircuitOpen as e:
+                return circuit_open_response(e)
             except requests.exceptions.Timeout:
                 return Response({"error": "Request timeout"}, status=504)
             except requests.exceptions.RequestException as e:
@@ -394,18 +908,34 @@ class CustomRemovalCreateView(APIView):
 
 @api_view(['GET'])
 def get_optery_member_by_email(request, email_str):
-    members_queryset = OpteryMember.objects.filter(email__exact=email_str)
+    member = get_member_by_email(email_str)
 
-    if not members_queryset.exists():
+    if member is None:
         return Response(
             {"error": f"No OpteryMember found with email: {email_str}"},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    member = members_queryset.first()
-    serializer = OpteryMemberSerializer(member)
+    data = {field: value for field, value in member.items() if field != "id"}
+    return Response({
+        "success": True,
+        "data": data
+    }, status=status.HTTP_200_OK)
+
 
+"""--------------------Optery Metrics--------------------"""
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def optery_metrics(request):
+    """Shared Optery counters (single-flight, rate limiter, ...), circuit state and this process's HTTP pool stats"""
+    try:
+        circuit = get_circuit_state()
+    except Exception as e:
+        circuit = {"error": str(e)}
     return Response({
         "success": True,
-        "data": serializer.data
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+        "metrics": get_metrics(),
+        "circuit": circuit,
+        "http_pool": get_connection_stats()
+    }, status=status.HTTP_200_OK)